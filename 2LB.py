@@ -26,7 +26,7 @@ class Library:
         self.address = address
         self.books = []
         self.readers = []
-        self.loans = []
+        self.loans = LoanLedger()
 
     def add_book(self, book):
         self.books.append(book)
@@ -72,13 +72,12 @@ class Library:
             print("Невозможно выдать книгу.")
 
     def return_book(self, book, reader):
-        for loan in self.loans:
-            if loan.book == book and loan.reader == reader:
-                book.quantity += 1
-                self.loans.remove(loan)
-                print(f"Книга '{book.title}' возвращена читателем '{reader.first_name} {reader.last_name}'.")
-                return
-        print("Данная книга не была выдана этому читателю.")
+        loan = self.loans.pop(book, reader)
+        if loan is None:
+            print("Данная книга не была выдана этому читателю.")
+            return
+        book.quantity += 1
+        print(f"Книга '{book.title}' возвращена читателем '{reader.first_name} {reader.last_name}'.")
 
 
 class Reader:
@@ -103,6 +102,33 @@ class Loan:
     def __str__(self):
         return f"Книга: {self.book.title}, Читатель: {self.reader.first_name} {self.reader.last_name}, Дата выдачи: {self.loan_date}, Дата возврата: {self.due_date}"
 
+class LoanLedger:
+    def __init__(self):
+        self._loans = {}  # Все выдачи в порядке добавления
+        self._index = {}  # Key: (ISBN, reader_id), Value: выдачи в порядке выдачи
+
+    def append(self, loan):
+        self._loans[loan] = None
+        self._index.setdefault((loan.book.isbn, loan.reader.reader_id), {})[loan] = None
+
+    def pop(self, book, reader):
+        key = (book.isbn, reader.reader_id)
+        group = self._index.get(key)
+        if not group:
+            return None
+        loan = next(iter(group))
+        del group[loan]
+        if not group:
+            del self._index[key]
+        del self._loans[loan]
+        return loan
+
+    def __iter__(self):
+        return iter(self._loans)
+
+    def __len__(self):
+        return len(self._loans)
+
 # Основная функция
 if __name__ == "__main__":
     # Создание авторов
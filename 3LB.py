@@ -85,8 +85,8 @@ class Library(LibraryAsset):
         self.books = set()
         # Словарь читателей в библиотеке (ключ - reader_id, значение - объект Reader)
         self.readers = {}
-        # Список выданных книг (объекты Loan)
-        self.loans = []
+        # Журнал выданных книг (объекты Loan) с индексом по (ISBN, reader_id)
+        self.loans = LoanLedger()
         # Увеличиваем счетчик библиотек при создании новой библиотеки
         Library.total_libraries += 1
 
@@ -138,19 +138,23 @@ class Library(LibraryAsset):
             book.quantity -= 1
             loan = Loan(book, reader, datetime.date.today(), due_date)
             self.loans.append(loan)
+            reader.borrowed_books.setdefault(book, loan.loan_date)
             print(f"Книга '{book.title}' выдана читателю '{reader.first_name} {reader.last_name}'.")
         else:
             print("Невозможно выдать книгу.")
 
     def return_book(self, book, reader):
         # Возвращает книгу в библиотеку
-        for loan in self.loans:
-            if loan.book == book and loan.reader == reader:
-                book.quantity += 1
-                self.loans.remove(loan)
-                print(f"Книга '{book.title}' возвращена читателем '{reader.first_name} {reader.last_name}'.")
-                return
-        print("Данная книга не была выдана этому читателю.")
+        # Запись о выдаче ищется и удаляется по индексу (ISBN, reader_id)
+        loan = self.loans.pop(book, reader)
+        if loan is None:
+            print("Данная книга не была выдана этому читателю.")
+            return
+        book.quantity += 1
+        if self.loans.count(book, reader) == 0:
+            # Читатель вернул последний экземпляр этой книги
+            reader.borrowed_books.pop(book, None)
+        print(f"Книга '{book.title}' возвращена читателем '{reader.first_name} {reader.last_name}'.")
 
     @staticmethod
     def get_library_count():
@@ -201,6 +205,44 @@ class Loan:
         # Проверяет, просрочена ли книга
         return self.due_date < datetime.date.today()
 
+# Журнал выдач с индексом по (ISBN, reader_id)
+class LoanLedger:
+    def __init__(self):
+        # Все выдачи в порядке добавления (dict используется как упорядоченное множество)
+        self._loans = {}
+        # Индекс: (ISBN, reader_id) -> выдачи этой книги этому читателю в порядке выдачи
+        self._index = {}
+
+    def append(self, loan):
+        # Добавляет запись о выдаче в журнал
+        self._loans[loan] = None
+        self._index.setdefault((loan.book.isbn, loan.reader.reader_id), {})[loan] = None
+
+    def pop(self, book, reader):
+        # Удаляет и возвращает самую раннюю выдачу книги читателю (или None)
+        key = (book.isbn, reader.reader_id)
+        group = self._index.get(key)
+        if not group:
+            return None
+        loan = next(iter(group))
+        del group[loan]
+        if not group:
+            del self._index[key]
+        del self._loans[loan]
+        return loan
+
+    def count(self, book, reader):
+        # Возвращает количество экземпляров книги, выданных читателю
+        return len(self._index.get((book.isbn, reader.reader_id), ()))
+
+    def __iter__(self):
+        # Перебирает выдачи в порядке добавления
+        return iter(self._loans)
+
+    def __len__(self):
+        # Возвращает количество открытых выдач
+        return len(self._loans)
+
 # Основная функция
 if __name__ == "__main__":
 
@@ -1,10 +1,162 @@
 
+import atexit
+import bisect
+import collections
+import contextlib
+import csv
 import datetime
+import enum
+import functools
+import gc
+import hashlib
+import heapq
+import itertools
+import json
 import logging
+import logging.handlers
+import math
+import mmap
+import operator
+import os
+import pickle
+import queue
+import random
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
 from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Mapping, MutableMapping, Set
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него колонки хранятся в array.array
+    np = None
+
+# Логгер библиотеки: сообщения форматируются лениво, поля событий передаются отдельно (record.event, record.fields)
+logger = logging.getLogger("library")
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Выводить ли ошибки операций в консоль (print) помимо журнала
+_echo_errors = True
+_log_listener = None
+
+
+def _log_event(level, event, message, *args, **fields):
+    """
+    Записывает событие в журнал, если уровень включен.
+
+    Args:
+        level: Уровень логирования.
+        event: Имя события (например, "book_lent").
+        message: Шаблон сообщения в стиле %; форматируется только обработчиком.
+        args: Аргументы шаблона.
+        fields: Поля события для структурированного вывода.
+    """
+    logger.log(level, message, *args, extra={"event": event, "fields": fields})
+
+
+def _report_error(event, message, *args, **fields):
+    """Записывает ошибку операции в журнал и, если включено, выводит ее в консоль."""
+    _log_event(logging.ERROR, event, message, *args, **fields)
+    if _echo_errors:
+        print(message % args)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Форматирует запись как JSON-объект: время, уровень, событие, поля и сообщение."""
+    def format(self, record):
+        """Возвращает строку JSON для записи."""
+        entry = {"time": self.formatTime(record), "level": record.levelname,
+                 "event": getattr(record, "event", None), "message": record.getMessage()}
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает лишь долю rate записей уровня INFO и ниже; предупреждения и ошибки проходят всегда."""
+    def __init__(self, rate):
+        """
+        Инициализирует фильтр.
+
+        Args:
+            rate: Доля пропускаемых записей (от 0 до 1).
+        """
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        """Решает, пропустить ли запись."""
+        return record.levelno > logging.INFO or random.random() < self.rate
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который кладет запись в очередь без форматирования.
+
+    Стандартный QueueHandler.prepare форматирует сообщение в вызывающем
+    потоке; здесь форматирование выполняет поток QueueListener.
+    """
+    def prepare(self, record):
+        """Возвращает запись без изменений."""
+        return record
+
+
+def configure_logging(mode="sync", level=logging.INFO, sample_rate=1.0, handlers=None, echo_errors=None):
+    """
+    Настраивает логирование операций библиотеки.
+
+    Args:
+        mode: "sync" - обычный вывод через корневой логгер (как раньше);
+            "queue" - записи передаются через очередь в фоновый поток QueueListener,
+            который форматирует их как JSON и передает обработчикам.
+        level: Уровень логгера библиотеки.
+        sample_rate: Доля сохраняемых записей уровня INFO (только для "queue").
+        handlers: Обработчики для режима "queue" (по умолчанию - вывод в stderr).
+        echo_errors: Выводить ли ошибки операций в консоль; по умолчанию - только в режиме "sync".
+
+    Returns:
+        Запущенный QueueListener (режим "queue") или None.
+    """
+    global _echo_errors, _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(level)
+    _echo_errors = (mode == "sync") if echo_errors is None else echo_errors
+    if mode == "sync":
+        logger.propagate = True
+        logging.basicConfig(level=level, format=LOG_FORMAT)
+        return None
+    if handlers is None:
+        handlers = [logging.StreamHandler()]
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(StructuredFormatter())
+    queue_handler = _LazyQueueHandler(queue.SimpleQueue())
+    if sample_rate < 1.0:
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    _log_listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    return _log_listener
+
+
+@atexit.register
+def _stop_log_listener():
+    """Дописывает оставшиеся в очереди записи при завершении процесса."""
+    if _log_listener is not None:
+        _log_listener.stop()
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Задание 1: Иерархия пользовательских исключений
 class BaseLibraryException(Exception):
@@ -44,9 +196,106 @@ class ReaderNotFound(ReaderError):
     """Читатель не найден."""
     pass
 
+class LoanLimitExceeded(ReaderError):
+    """Читатель достиг предела одновременно взятых книг."""
+    pass
+
+class HoldNotFound(ReaderError):
+    """Читатель не стоит в очереди на книгу."""
+    pass
+
+
+class OpStatus(enum.Enum):
+    """Результат операции библиотеки без исключений (методы try_*)."""
+    OK = "ok"
+    INVALID_DATA = "invalid_data"          # Некорректные данные книги
+    DUPLICATE = "duplicate"                # Книга или читатель уже есть в библиотеке
+    BOOK_NOT_FOUND = "book_not_found"
+    READER_NOT_FOUND = "reader_not_found"
+    UNAVAILABLE = "unavailable"            # Нет свободных экземпляров
+    NOT_LENT = "not_lent"                  # Книга не выдавалась этому читателю
+    LIMIT_REACHED = "limit_reached"        # Читатель достиг предела одновременно взятых книг
+    NO_HOLD = "no_hold"                    # Читатель не стоит в очереди на книгу
+
+
+class OpResult:
+    """
+    Итог операции try_*: статус и результат (Loan, Book или Reader при успехе).
+
+    Истинен, если операция выполнена. Неудачные результаты без подробностей
+    общие для всех вызовов (_FAILED_RESULTS), поэтому отказ ничего не выделяет.
+    """
+    __slots__ = ("status", "value", "detail")
+
+    def __init__(self, status, value=None, detail=None):
+        """
+        Инициализирует результат.
+
+        Args:
+            status: Значение OpStatus.
+            value: Результат успешной операции.
+            detail: Пояснение к отказу (например, текст ошибки проверки данных).
+        """
+        self.status = status
+        self.value = value
+        self.detail = detail
+
+    def __bool__(self):
+        return self.status is OpStatus.OK
+
+    def __repr__(self):
+        return f"OpResult({self.status.name}, {self.value!r})"
+
+
+# Общие неудачные результаты по статусам
+_FAILED_RESULTS = {status: OpResult(status) for status in OpStatus if status is not OpStatus.OK}
+
+def _book_data_error(book):
+    """
+    Проверяет данные книги.
+
+    Args:
+        book: Объект Book.
+
+    Returns:
+        Текст ошибки или None, если данные корректны.
+    """
+    if not isinstance(book.quantity, int) or book.quantity < 0:
+        return "Количество экземпляров книги должно быть целым числом больше или равно 0."
+    if not isinstance(book.isbn, str) or len(book.isbn) == 0:
+        return "ISBN должен быть строкой."
+    return None
+
+# Таблица интернирования авторов: объект живет, пока на него ссылается хотя бы одна книга
+_author_table = weakref.WeakValueDictionary()
+
+def intern_author(first_name, last_name, biography=""):
+    """
+    Возвращает общий объект Author с данными полями, создавая его при первом обращении.
+
+    Используется при загрузке книг из хранилищ: одинаковые авторы разных
+    записей становятся одним объектом. Авторы с разной биографией не смешиваются.
+
+    Args:
+        first_name: Имя автора.
+        last_name: Фамилия автора.
+        biography: Биография автора.
+    """
+    key = (first_name, last_name, biography)
+    author = _author_table.get(key)
+    if author is None:
+        author = _author_table[key] = Author(first_name, last_name, biography)
+    return author
+
+def intern_genre(genre):
+    """Возвращает общий экземпляр строки жанра."""
+    return sys.intern(genre) if type(genre) is str else genre
+
 # Класс, представляющий автора
 class Author:
     """Представляет автора книги."""
+    __slots__ = ("first_name", "last_name", "biography", "__weakref__")
+
     def __init__(self, first_name, last_name, biography=""):
         """
         Инициализирует объект Author.
@@ -77,7 +326,15 @@ class Author:
 
 # Класс, представляющий книгу
 class Book:
-    """Представляет книгу."""
+    """
+    Представляет книгу.
+
+    Автор и жанр интернируются: книги с равными авторами ссылаются на один объект Author.
+    У книги каталога quantity - число экземпляров в наличии по учету экземпляров
+    (CopyTracker); его меняет только Library.
+    """
+    __slots__ = ("title", "author", "isbn", "genre", "quantity", "__weakref__")
+
     def __init__(self, title, author, isbn, genre, quantity):
         """
         Инициализирует объект Book.
@@ -92,7 +349,7 @@ class Book:
         self.title = title
         self.author = author
         self.isbn = isbn
-        self.genre = genre
+        self.genre = intern_genre(genre)
         self.quantity = quantity
 
     def __str__(self):
@@ -161,7 +418,8 @@ class Library(BaseLibrary):
     # Статическое поле для хранения общего количества библиотек
     total_libraries = 0
 
-    def __init__(self, name, address, library_type="Public"): # Задание 5: Конструкторы и наследование
+    def __init__(self, name, address, library_type="Public", storage=None, lock_stripes=64,
+                 loan_limit=None): # Задание 5: Конструкторы и наследование
         """
         Инициализирует объект Library.
 
@@ -169,16 +427,86 @@ class Library(BaseLibrary):
             name: Название библиотеки.
             address: Адрес библиотеки.
             library_type: Тип библиотеки (по умолчанию "Public").
+            storage: Постоянное хранилище, например SQLiteStorage (по умолчанию данные хранятся в памяти).
+            lock_stripes: Количество блокировок, между которыми распределяются ISBN (и читатели).
+            loan_limit: Сколько книг читатель может держать одновременно (None - без ограничения).
         """
         super().__init__(name, address) # Вызов конструктора базового класса
         self.library_type = library_type # Дополнительный атрибут для производного класса
-        # Множество книг в библиотеке (используется set для уникальности)
-        self.books = set()
-        # Список выданных книг (объекты Loan)
-        self.loans = []
+        self._storage = storage
+        # Блокировки выдачи и возврата: книга с данным ISBN всегда защищена одной и той же блокировкой
+        self._isbn_locks = [threading.Lock() for _ in range(lock_stripes)]
+        # Блокировки проверки предела выдач: захватываются после блокировки ISBN
+        self._reader_locks = [threading.Lock() for _ in range(lock_stripes)]
+        # Предел выдач по умолчанию и индивидуальные пределы (reader_id -> предел или None)
+        self.loan_limit = loan_limit
+        self._loan_limits = {}
+        # Блокировка изменений каталога (добавление и удаление книг, общие индексы)
+        self._catalog_lock = threading.RLock()
+        if storage is not None:
+            self._catalog = storage.catalog
+            self._reader_database = storage.readers
+        # Множество книг в библиотеке (представление каталога, уникальность по ISBN)
+        self.books = CatalogBookView(self._catalog)
+        # Журнал выданных книг (объекты Loan) с индексом по (ISBN, reader_id)
+        self.loans = LoanLedger()
+        # Индекс открытых выдач по дате возврата
+        self._due_index = DueDateIndex()
+        # Колоночное хранилище остатков (создается при первом обращении к inventory)
+        self._inventory = None
+        # Полнотекстовый индекс (создается при первом обращении к search_index)
+        self._search_index = None
+        # Индекс книг по названию (создается при первом обращении к title_index)
+        self._title_index = None
+        # Индексы книг по автору и жанру (создаются при первом обращении к author_index/genre_index)
+        self._author_index = None
+        self._genre_index = None
+        # Журнал операций (подключается через attach_journal или recover)
+        self._journal = None
+        # Метрики операций (включаются через enable_metrics)
+        self._metrics = None
+        # Экземпляры книг (создаются для ISBN при первой выдаче или обращении к copies_of)
+        self._copies = CopyTracker()
+        # Очереди резервирования (ISBN -> HoldQueue) и отложенные для читателей экземпляры
+        # (ISBN -> {reader_id: номер экземпляра}); защищены блокировкой ISBN
+        self._holds = {}
+        self._ready_holds = {}
+        if storage is not None:
+            self._copies.set_shelves(storage.load_shelves())
+            for isbn, state in storage.load_copies():
+                self._copies.restore(isbn, state)
+            for loan in storage.load_loans():
+                self._add_loan(loan)
+            for isbn, reader_id, ready, copy in storage.load_holds():
+                if ready:
+                    self._ready_holds.setdefault(isbn, {})[reader_id] = copy
+                else:
+                    self._holds.setdefault(isbn, HoldQueue()).place(reader_id)
         # Увеличиваем счетчик библиотек при создании новой библиотеки
         Library.total_libraries += 1
 
+    def try_add_book(self, book):
+        """
+        Добавляет книгу в библиотеку без исключений на ожидаемых отказах.
+
+        Args:
+            book: Объект Book, который нужно добавить.
+
+        Returns:
+            OpResult: OK (value - книга), INVALID_DATA (detail - текст ошибки) или DUPLICATE.
+        """
+        error = _book_data_error(book)
+        if error is not None:
+            return OpResult(OpStatus.INVALID_DATA, detail=error)
+        with self._catalog_lock, self._lock_for(book.isbn):
+            if book.isbn in self._catalog:
+                return _FAILED_RESULTS[OpStatus.DUPLICATE]
+            self._register_book(book)
+            self._record_book(book)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "book_added", "Книга '%s' добавлена в библиотеку.", book.title, isbn=book.isbn)
+        return OpResult(OpStatus.OK, book)
+
     def add_book(self, book):
         """
         Добавляет книгу в библиотеку.
@@ -187,254 +515,4463 @@ class Library(BaseLibrary):
             book: Объект Book, который нужно добавить.
         """
         try:
-            if not isinstance(book.quantity, int) or book.quantity < 0:
-                raise InvalidBookData("Количество экземпляров книги должно быть целым числом больше или равно 0.")
-            if not isinstance(book.isbn, str) or len(book.isbn) == 0:
-                raise InvalidBookData("ISBN должен быть строкой.")
-
-            if book.isbn in self._catalog:
-                raise BookError(f"Книга с ISBN {book.isbn} уже есть в каталоге.")  # Использовать BookError
-            self._catalog[book.isbn] = book
-            self.books.add(book)
-            logging.info(f"Книга '{book.title}' добавлена в библиотеку.")
-        except BookError as e:  # Ловить BookError
-            logging.error(f"Ошибка при добавлении книги: {e}")
-            print(f"Ошибка при добавлении книги: {e}")  # Вывод в консоль
-        except InvalidBookData as e:
-            logging.error(f"Ошибка при добавлении книги: {e}")
-            print(f"Ошибка при добавлении книги: {e}")
+            result = self.try_add_book(book)
+            if result.status is OpStatus.INVALID_DATA:
+                error = InvalidBookData(result.detail)
+            elif result.status is OpStatus.DUPLICATE:
+                error = BookError(f"Книга с ISBN {book.isbn} уже есть в каталоге.")  # Использовать BookError
+            else:
+                return
+            _report_error("add_book_failed", "Ошибка при добавлении книги: %s", error, isbn=book.isbn)  # Журнал и консоль
         except Exception as e:
-            logging.exception(f"Неожиданная ошибка при добавлении книги: {e}")
+            logger.exception("Неожиданная ошибка при добавлении книги: %s", e)
         finally:
-            logging.debug("Завершение операции добавления книги.")
+            logger.debug("Завершение операции добавления книги.")
 
-    def remove_book(self, book):
+    def try_remove_book(self, book):
         """
-        Удаляет книгу из библиотеки.
+        Удаляет книгу из библиотеки без исключений на ожидаемых отказах.
 
         Args:
             book: Объект Book, который нужно удалить.
+
+        Returns:
+            OpResult: OK (value - книга) или BOOK_NOT_FOUND.
         """
-        try:
+        with self._catalog_lock, self._lock_for(book.isbn):
             if book.isbn not in self._catalog:
-                raise BookNotFound(f"Книга '{book.title}' не найдена в каталоге.")
-            del self._catalog[book.isbn]
-            self.books.remove(book)
-            logging.info(f"Книга '{book.title}' удалена из библиотеки.")
-        except BookNotFound as e:
-            logging.error(f"Ошибка при удалении книги: {e}")
-            print(f"Ошибка при удалении книги: {e}")  # Вывод в консоль
-        except KeyError:
-            logging.error(f"Книга '{book.title}' не найдена в библиотеке.")
-            print(f"Книга '{book.title}' не найдена в библиотеке.") # Вывод в консоль
-        except Exception as e:
-            logging.exception(f"Неожиданная ошибка при удалении книги: {e}")
-        finally:
-            logging.debug("Завершение операции удаления книги.")
+                return _FAILED_RESULTS[OpStatus.BOOK_NOT_FOUND]
+            self._unregister_book(book)
+            self._record(CirculationJournal.REMOVE_BOOK, book.isbn)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "book_removed", "Книга '%s' удалена из библиотеки.", book.title, isbn=book.isbn)
+        return OpResult(OpStatus.OK, book)
 
-    def add_reader(self, reader):
+    def remove_book(self, book):
         """
-        Добавляет читателя в библиотеку.
+        Удаляет книгу из библиотеки.
 
         Args:
-            reader: Объект Reader, который нужно добавить.
+            book: Объект Book, который нужно удалить.
         """
         try:
-            if reader.reader_id in self._reader_database:
-                raise ReaderError(f"Читатель с ID {reader.reader_id} уже зарегистрирован.") # Использовать ReaderError
-            self._reader_database[reader.reader_id] = reader
-            logging.info(f"Читатель '{reader.first_name} {reader.last_name}' добавлен в библиотеку.")
-        except ReaderError as e: # Ловить ReaderError
-            logging.error(f"Ошибка при добавлении читателя: {e}")
-            print(f"Ошибка при добавлении читателя: {e}") # Вывод в консоль
+            if not self.try_remove_book(book):
+                error = BookNotFound(f"Книга '{book.title}' не найдена в каталоге.")
+                _report_error("remove_book_failed", "Ошибка при удалении книги: %s", error,
+                              isbn=book.isbn)  # Журнал и консоль
         except Exception as e:
-            logging.exception(f"Неожиданная ошибка при добавлении читателя: {e}")
+            logger.exception("Неожиданная ошибка при удалении книги: %s", e)
         finally:
-            logging.debug("Завершение операции добавления читателя.")
+            logger.debug("Завершение операции удаления книги.")
 
-    def remove_reader(self, reader):
+    def _lock_for(self, isbn):
+        """Возвращает блокировку, защищающую выдачу и возврат книги с данным ISBN."""
+        return self._isbn_locks[hash(isbn) % len(self._isbn_locks)]
+
+    def _reader_lock_for(self, reader_id):
+        """Возвращает блокировку, под которой проверяется и меняется число выдач читателя."""
+        return self._reader_locks[hash(reader_id) % len(self._reader_locks)]
+
+    def set_loan_limit(self, reader, limit):
         """
-        Удаляет читателя из библиотеки.
+        Задает читателю индивидуальный предел одновременно взятых книг.
 
         Args:
-            reader: Объект Reader, который нужно удалить.
+            reader: Объект Reader.
+            limit: Предел (None - без ограничения).
         """
-        try:
-            if reader.reader_id not in self._reader_database:
-                raise ReaderNotFound(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.")
-            del self._reader_database[reader.reader_id]
-            logging.info(f"Читатель '{reader.first_name} {reader.last_name}' удален из библиотеки.")
-        except ReaderNotFound as e:
-            logging.error(f"Ошибка при удалении читателя: {e}")
-            print(f"Ошибка при удалении читателя: {e}")  # Вывод в консоль
-        except KeyError:
-            logging.error(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.")
-            print(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.") # Вывод в консоль
-        except Exception as e:
-            logging.exception(f"Неожиданная ошибка при удалении читателя: {e}")
-        finally:
-            logging.debug("Завершение операции удаления читателя.")
+        self._loan_limits[reader.reader_id] = limit
 
-    def display_books(self):
-        """Выводит список книг в библиотеке."""
-        if not self.books:
-            print("В библиотеке нет книг.")
-        else:
-            print("Книги в библиотеке:")
-            for book in sorted(self.books): # Сортировка книг по названию
-                print(book)
+    def loan_limit_for(self, reader):
+        """Возвращает предел выдач читателя (None - без ограничения)."""
+        return self._loan_limits.get(reader.reader_id, self.loan_limit)
 
-    def display_readers(self):
-        """Выводит список читателей в библиотеке."""
-        if not self._reader_database: # Используем защищенный атрибут
-            print("В библиотеке нет читателей.")
-        else:
-            print("Читатели в библиотеке:")
-            for reader_id, reader in self._reader_database.items():
-                print(reader)
+    def can_borrow(self, reader, count=1):
+        """Проверяет за O(1), может ли читатель взять еще count книг, не превысив предел."""
+        limit = self._loan_limits.get(reader.reader_id, self.loan_limit)
+        return limit is None or self.loans.reader_count(reader.reader_id) + count <= limit
 
-    def lend_book(self, book, reader, due_date):
+    def reader_loans(self, reader):
+        """Возвращает открытые выдачи читателя в порядке выдачи."""
+        return self.loans.reader_loans(reader.reader_id)
+
+    def reader_overdue(self, reader, as_of=None):
         """
-        Выдает книгу читателю.
+        Возвращает просроченные выдачи читателя, начиная с самых старых.
+
+        Стоимость пропорциональна числу книг на руках у читателя, а не числу всех выдач.
 
         Args:
-            book: Объект Book, который нужно выдать.
-            reader: Объект Reader, которому выдается книга.
-            due_date: Дата возврата книги.
+            reader: Объект Reader.
+            as_of: Дата, на которую выполняется проверка (по умолчанию сегодня).
         """
-        try:
-            if book not in self.books:
-                raise BookNotFound(f"Книга '{book.title}' не найдена в библиотеке.")
+        if as_of is None:
+            as_of = datetime.date.today()
+        return sorted((loan for loan in self.loans.reader_loans(reader.reader_id) if loan.due_date < as_of),
+                      key=lambda loan: loan.due_date)
+
+    def try_place_hold(self, book, reader):
+        """
+        Ставит читателя в очередь резервирования книги без исключений на ожидаемых отказах.
+
+        Возвращенный экземпляр сразу откладывается для первого читателя очереди
+        и выдается ему через lend_book, даже если других экземпляров нет.
+
+        Args:
+            book: Объект Book, который резервируется.
+            reader: Объект Reader, который встает в очередь.
+
+        Returns:
+            OpResult: OK (value - место в очереди, с 1), BOOK_NOT_FOUND, READER_NOT_FOUND
+            или DUPLICATE (читатель уже в очереди или книга для него уже отложена).
+        """
+        with self._lock_for(book.isbn):
+            book = self._catalog_book(book)
+            if book is None:
+                return _FAILED_RESULTS[OpStatus.BOOK_NOT_FOUND]
             if reader.reader_id not in self._reader_database:
-                raise ReaderNotFound(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.")
-            if book.quantity <= 0:
-                raise BookUnavailable(f"Книга '{book.title}' недоступна для выдачи.")
+                return _FAILED_RESULTS[OpStatus.READER_NOT_FOUND]
+            position = self._place_hold(book.isbn, reader.reader_id)
+            if position is None:
+                return _FAILED_RESULTS[OpStatus.DUPLICATE]
+            if self._storage is not None:
+                self._storage.record_hold(book.isbn, reader.reader_id)
+            self._record(CirculationJournal.HOLD, book.isbn, reader.reader_id)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "hold_placed", "Читатель '%s %s' встал в очередь на книгу '%s' (место %d).",
+                   reader.first_name, reader.last_name, book.title, position,
+                   isbn=book.isbn, reader_id=reader.reader_id, position=position)
+        return OpResult(OpStatus.OK, position)
 
-            book.quantity -= 1
-            loan = Loan(book, reader, datetime.date.today(), due_date)
-            self.loans.append(loan)
-            logging.info(f"Книга '{book.title}' выдана читателю '{reader.first_name} {reader.last_name}'.")
-        except BookNotFound as e:
-            logging.error(f"Ошибка: {e}")
-            print(f"Ошибка: {e}") # Вывод в консоль
-        except ReaderNotFound as e:
-            logging.error(f"Ошибка: {e}")
-            print(f"Ошибка: {e}") # Вывод в консоль
-        except BookUnavailable as e:
-            logging.error(f"Ошибка: {e}")
-            print(f"Ошибка: {e}") # Вывод в консоль
+    def place_hold(self, book, reader):
+        """
+        Ставит читателя в очередь резервирования книги.
+
+        Returns:
+            Место в очереди (с 1) или None, если поставить в очередь не удалось.
+        """
+        try:
+            result = self.try_place_hold(book, reader)
+            if result:
+                return result.value
+            if result.status is OpStatus.BOOK_NOT_FOUND:
+                error = BookNotFound(f"Книга '{book.title}' не найдена в библиотеке.")
+            elif result.status is OpStatus.READER_NOT_FOUND:
+                error = ReaderNotFound(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.")
+            else:
+                error = ReaderError(f"Читатель '{reader.first_name} {reader.last_name}' "
+                                    f"уже ожидает книгу '{book.title}'.")
+            _report_error("place_hold_failed", "Ошибка резервирования: %s", error,
+                          isbn=book.isbn, reader_id=reader.reader_id)  # Журнал и консоль
         except Exception as e:
-            logging.exception(f"Неожиданная ошибка: {e}")
-        finally:
-             logging.debug("Завершение операции выдачи книги.")
+            logger.exception("Неожиданная ошибка при резервировании книги: %s", e)
 
-    def return_book(self, book, reader):
+    def try_cancel_hold(self, book, reader):
         """
-        Возвращает книгу в библиотеку.
+        Снимает резервирование книги без исключений на ожидаемых отказах.
 
-        Args:
-            book: Объект Book, который возвращается.
-            reader: Объект Reader, который возвращает книгу.
+        Если экземпляр уже был отложен для читателя, он переходит следующему
+        читателю очереди или возвращается в наличие.
+
+        Returns:
+            OpResult: OK или NO_HOLD.
+        """
+        with self._lock_for(book.isbn):
+            book = self._catalog_book(book)
+            if book is None or not self._cancel_hold(book, reader.reader_id):
+                return _FAILED_RESULTS[OpStatus.NO_HOLD]
+            if self._storage is not None:
+                self._storage.record_hold_removed(book.isbn, reader.reader_id, book.quantity,
+                                                  [self._copies.get(book)])
+            self._record(CirculationJournal.CANCEL_HOLD, book.isbn, reader.reader_id)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "hold_cancelled", "Читатель '%s %s' снял резервирование книги '%s'.",
+                   reader.first_name, reader.last_name, book.title, isbn=book.isbn, reader_id=reader.reader_id)
+        return OpResult(OpStatus.OK)
+
+    def cancel_hold(self, book, reader):
+        """
+        Снимает резервирование книги.
+
+        Returns:
+            True, если резервирование снято, иначе None.
         """
         try:
-            # Ищем запись о выдаче, соответствующую книге и читателю
-            for i, loan in enumerate(self.loans):
-                if loan.book == book and loan.reader == reader:
-                    book.quantity += 1
-                    del self.loans[i]  # Удаляем запись о выдаче по индексу
-                    logging.info(f"Книга '{book.title}' возвращена читателем '{reader.first_name} {reader.last_name}'.")
-                    return
-
-            # Если запись о выдаче не найдена, выбрасываем исключение
-            raise ValueError("Данная книга не была выдана этому читателю.")
-
-        except ValueError as e:
-            logging.error(f"Ошибка при возврате книги: {e}")
-            print(f"Ошибка при возврате книги: {e}") # Вывод в консоль
+            if self.try_cancel_hold(book, reader):
+                return True
+            error = HoldNotFound(f"Читатель '{reader.first_name} {reader.last_name}' "
+                                 f"не ожидает книгу '{book.title}'.")
+            _report_error("cancel_hold_failed", "Ошибка снятия резервирования: %s", error,
+                          isbn=book.isbn, reader_id=reader.reader_id)  # Журнал и консоль
         except Exception as e:
-            logging.exception(f"Неожиданная ошибка при возврате книги: {e}")
-        finally:
-            logging.debug("Завершение операции возврата книги.")
+            logger.exception("Неожиданная ошибка при снятии резервирования: %s", e)
 
-    @staticmethod
-    def get_library_count():
-        """Возвращает общее количество библиотек."""
-        return Library.total_libraries
+    def hold_position(self, book, reader):
+        """
+        Возвращает за O(log n) место читателя в очереди на книгу.
 
-    def display_asset_info(self):
-        """Выводит информацию о библиотеке (название, адрес, тип, количество книг)."""
-        print(f"Название библиотеки: {self.name}, Адрес: {self.address}, Тип: {self.library_type}")
-        # Задание 4: Доступ к защищенным атрибутам
-        print(f"Количество книг в каталоге: {len(self._catalog)}")
+        Returns:
+            0 - экземпляр отложен и ждет выдачи, n - место в очереди (с 1), None - читатель не ожидает книгу.
+        """
+        with self._lock_for(book.isbn):
+            if self._has_ready_hold(book, reader):
+                return 0
+            queue = self._holds.get(book.isbn)
+            return queue.position(reader.reader_id) if queue is not None else None
 
-    # Задание 3: Переопределение и вызов метода базового класса
-    def display_library_info(self):
-        """Выводит информацию о библиотеке, используя метод базового класса."""
-        super().display_asset_info()  # Вызов метода базового класса
-        print(f"Тип библиотеки: {self.library_type}")
+    def holds_for(self, book):
+        """Возвращает reader_id читателей очереди на книгу в порядке очереди (без тех, кому книга отложена)."""
+        with self._lock_for(book.isbn):
+            return list(self._holds.get(book.isbn, ()))
 
-    def combined_method(self, condition): # Дополнительный метод для наследования.
-        """Пример комбинированного метода для демонстрации наследования."""
-        if condition:
-            print("Производный метод сначала:")
-            self.display_library_info() # Вызываем переопределенный метод
-            print(self._base_method()) # Вызываем метод базового класса
-        else:
-            print("Базовый метод сначала:")
-            print(self._base_method()) # Вызываем метод базового класса
-            self.display_library_info() # Вызываем переопределенный метод
+    def _place_hold(self, isbn, reader_id):
+        """Ставит читателя в очередь без проверок; возвращает место или None, если он уже ожидает книгу."""
+        ready = self._ready_holds.get(isbn)
+        if ready and reader_id in ready:
+            return None
+        queue = self._holds.get(isbn)
+        if queue is None:
+            queue = self._holds[isbn] = HoldQueue()
+        return queue.place(reader_id)
 
-# Класс, представляющий читателя
-class Reader:
-    """Представляет читателя."""
-    def __init__(self, first_name, last_name, reader_id):
+    def _cancel_hold(self, book, reader_id):
+        """Снимает резервирование без проверок; возвращает False, если читатель не ожидает книгу."""
+        ready = self._ready_holds.get(book.isbn)
+        if ready and reader_id in ready:
+            copy = ready.pop(reader_id)
+            if not ready:
+                del self._ready_holds[book.isbn]
+            if self._release_copy(book, copy):
+                self._quantity_changed(book)
+            return True
+        queue = self._holds.get(book.isbn)
+        if queue is None or not queue.cancel(reader_id):
+            return False
+        if not queue:
+            del self._holds[book.isbn]
+        return True
+
+    def _cancel_reader_holds(self, reader_id):
         """
-        Инициализирует объект Reader.
+        Снимает все резервирования читателя без проверок и записи в журнал.
+
+        Returns:
+            Книги каталога, с которых сняты резервирования.
+        """
+        isbns = [isbn for isbn, ready in self._ready_holds.items() if reader_id in ready]
+        isbns += [isbn for isbn, queue in self._holds.items() if queue.position(reader_id) is not None]
+        books = []
+        for isbn in isbns:
+            book = self._catalog.get(isbn)
+            if book is not None and self._cancel_hold(book, reader_id):
+                books.append(book)
+        return books
+
+    def _export_books(self, books):
+        """
+        Собирает книги каталога для переноса в другой филиал вместе с их открытыми
+        выдачами, учетом экземпляров и очередями резервирования, ничего не изменяя.
+        Вызывающий код останавливает изменения (_paused), а когда приемник занес
+        книги (_attach_books), изымает их вызовом _drop_books.
+
+        Returns:
+            Кортеж для _attach_books: (книги, выдачи, {ISBN: BookCopies}, названия полок
+            в порядке кодов, {ISBN: (reader_id очереди по порядку, {reader_id: отложенный экземпляр})}).
+        """
+        books = {book.isbn: book for book in books}
+        loans = [loan for loan in self.loans if books.get(loan.book.isbn) is loan.book]
+        copies, holds = {}, {}
+        for isbn in books:
+            tracked = self._copies.find(isbn)
+            if tracked is not None:
+                copies[isbn] = tracked
+            queue = self._holds.get(isbn)
+            ready = self._ready_holds.get(isbn)
+            if queue or ready:
+                holds[isbn] = (list(queue or ()), dict(ready or {}))
+        return list(books.values()), loans, copies, list(self._copies.shelves), holds
+
+    def _drop_books(self, books):
+        """
+        Изымает книги каталога, перенесенные в другой филиал (см. _export_books),
+        вместе с их открытыми выдачами, учетом экземпляров и очередями резервирования
+        (количества не меняются) и записывает изъятие в журнал. Вызывающий код
+        останавливает изменения (_paused).
+        """
+        books = {book.isbn: book for book in books}
+        loans = [loan for loan in self.loans if books.get(loan.book.isbn) is loan.book]
+        for loan in loans:
+            self.loans.remove(loan)
+        self._due_index.discard_many(loans)
+        cleared = []
+        for isbn, book in books.items():
+            queue = self._holds.pop(isbn, None)
+            ready = self._ready_holds.pop(isbn, None)
+            if queue or ready:
+                cleared.append(isbn)
+            self._unregister_book(book)
+        if self._storage is not None:
+            self._storage.record_returns(loans)
+            for isbn in cleared:
+                self._storage.record_holds_cleared(isbn)
+        if books:
+            self._record(CirculationJournal.MOVE_OUT, CirculationJournal.BATCH_SEPARATOR.join(books))
+
+    def _attach_books(self, transfer):
+        """
+        Заносит книги, собранные _export_books в другом филиале, вместе с их выдачами,
+        экземплярами и очередями резервирования и записывает их в журнал.
+
+        Книги, ISBN которых уже есть в каталоге, не заносятся; их выдачи остаются
+        выдачами удаленных книг.
+        """
+        books, loans, copies, shelves, holds = transfer
+        with self._paused():
+            attached = {}
+            for book in books:
+                if book.isbn not in self._catalog:
+                    self._register_book(book)
+                    attached[book.isbn] = book
+            for isbn in attached.keys() & copies.keys():
+                self._copies.adopt(copies[isbn], shelves)
+            loans = [Loan(loan.book, self._reader_database.get(loan.reader.reader_id) or loan.reader,
+                          loan.loan_date, loan.due_date, loan.copy) for loan in loans]
+            for loan in loans:
+                self._add_loan(loan)
+            for isbn in attached.keys() & holds.keys():
+                queue, ready = holds[isbn]
+                if ready:
+                    self._ready_holds[isbn] = dict(ready)
+                for reader_id in queue:
+                    self._place_hold(isbn, reader_id)
+            if self._storage is not None:
+                for isbn in attached.keys() & copies.keys():
+                    book = attached[isbn]
+                    self._storage.record_copies(book.quantity, self._copies.get(book), self._copies.shelves)
+                self._storage.record_lends(loans)
+                for isbn in attached.keys() & holds.keys():
+                    queue, ready = holds[isbn]
+                    for reader_id, copy in ready.items():
+                        self._storage.record_hold(isbn, reader_id)
+                        self._storage.record_hold_ready(isbn, reader_id, copy)
+                    for reader_id in queue:
+                        self._storage.record_hold(isbn, reader_id)
+            if self._journal is not None:
+                self._journal.append_attached(self, attached.values(), loans)
+        return loans
+
+    def copies_of(self, book):
+        """Возвращает экземпляры книги (BookCopies)."""
+        with self._lock_for(book.isbn):
+            return self._copies.get(book)
+
+    def add_copies(self, book, count, shelf="", barcodes=None):
+        """
+        Добавляет книге новые экземпляры (все в наличии).
 
         Args:
-            first_name: Имя читателя.
-            last_name: Фамилия читателя.
-            reader_id: Уникальный идентификатор читателя.
+            book: Объект Book из каталога.
+            count: Количество экземпляров.
+            shelf: Полка, на которой стоят новые экземпляры.
+            barcodes: Собственные штрихкоды новых экземпляров (по одному на экземпляр);
+                None - только штрихкоды по умолчанию "<ISBN>/<номер>".
+
+        Returns:
+            Список штрихкодов новых экземпляров.
+
+        Raises:
+            BookNotFound: Если книги нет в каталоге.
+            BookError: Если штрихкоды не подходят (не count различных непустых строк или уже присвоены).
         """
-        self.first_name = first_name
-        self.last_name = last_name
-        self.reader_id = reader_id
-        # Словарь взятых книг (ключ - Book, значение - дата выдачи)
-        self.borrowed_books = {}
+        if barcodes is not None:
+            barcodes = list(barcodes)
+        with self._lock_for(book.isbn):
+            book = self._catalog_book(book)
+            if book is None:
+                raise BookNotFound("Книга не найдена в библиотеке.")
+            numbers = self._add_copies(book, count, shelf, barcodes)
+            self._record(CirculationJournal.ADD_COPIES, book.isbn, count, shelf,
+                         CirculationJournal.BATCH_SEPARATOR.join(barcodes) if barcodes else None)
+            self._save_copies(book)
+            copies = self._copies.get(book)
+        return [copies.barcode(number) for number in numbers]
 
-    def __str__(self):
-        """Возвращает строковое представление читателя."""
-        return f"{self.first_name} {self.last_name} (ID: {self.reader_id})"
+    def set_copy_damaged(self, barcode, damaged=True):
+        """
+        Отмечает экземпляр поврежденным (он перестает выдаваться) или исправным.
 
-    def __hash__(self):
-        """Возвращает хеш-значение для читателя (по ID)."""
-        return hash(self.reader_id)
+        Экземпляр, отмеченный поврежденным во время выдачи, после возврата в наличие не попадает.
 
-# Класс, представляющий информацию о выдаче книги
-class Loan:
-    """Представляет информацию о выдаче книги."""
-    def __init__(self, book, reader, loan_date, due_date):
+        Args:
+            barcode: Штрихкод экземпляра (собственный или по умолчанию).
+            damaged: True - поврежден, False - исправен.
+
+        Raises:
+            BookNotFound: Если книги или экземпляра с таким штрихкодом нет.
         """
-        Инициализирует объект Loan.
+        isbn, number = self._copies.locate(barcode)
+        with self._lock_for(isbn):
+            book = self._copy_book(isbn, number, barcode)
+            self._set_copy_damaged(book, number, damaged)
+            self._record(CirculationJournal.COPY_DAMAGED, isbn, number, int(damaged))
+            self._save_copies(book)
+
+    def set_copy_withdrawn(self, barcode, withdrawn=True):
+        """
+        Списывает экземпляр (он перестает выдаваться) или возвращает его в фонд.
+
+        Экземпляр, списанный во время выдачи, после возврата в наличие не попадает.
 
         Args:
-            book: Книга, которая была выдана.
-            reader: Читатель, которому выдали книгу.
-            loan_date: Дата выдачи книги.
-            due_date: Дата возврата книги.
+            barcode: Штрихкод экземпляра (собственный или по умолчанию).
+            withdrawn: True - списан, False - возвращен в фонд.
+
+        Raises:
+            BookNotFound: Если книги или экземпляра с таким штрихкодом нет.
         """
-        self.book = book
-        self.reader = reader
-        self.loan_date = loan_date
-        self.due_date = due_date
+        isbn, number = self._copies.locate(barcode)
+        with self._lock_for(isbn):
+            book = self._copy_book(isbn, number, barcode)
+            self._set_copy_withdrawn(book, number, withdrawn)
+            self._record(CirculationJournal.COPY_WITHDRAWN, isbn, number, int(withdrawn))
+            self._save_copies(book)
 
-    def __str__(self):
-        """Возвращает строковое представление информации о выдаче книги."""
-        return f"Книга: {self.book.title}, Читатель: {self.reader.first_name} {self.reader.last_name}, Дата выдачи: {self.loan_date}, Дата возврата: {self.due_date}"
+    def move_copy(self, barcode, shelf):
+        """Переставляет экземпляр на полку shelf."""
+        isbn, number = self._copies.locate(barcode)
+        with self._lock_for(isbn):
+            book = self._copy_book(isbn, number, barcode)
+            self._move_copy(book, number, shelf)
+            self._record(CirculationJournal.MOVE_COPY, isbn, number, shelf)
+            self._save_copies(book)
+
+    def copy_info(self, barcode):
+        """
+        Возвращает состояние экземпляра: словарь с ISBN, номером, штрихкодом, состоянием
+        ("available", "on_loan", "damaged", "withdrawn") и полкой; None, если экземпляра нет.
+        """
+        isbn, number = self._copies.locate(barcode)
+        with self._lock_for(isbn):
+            book = self._catalog.get(isbn)
+            if book is None:
+                return None
+            copies = self._copies.get(book)
+            if not 0 <= number < copies.total:
+                return None
+            return {"isbn": isbn, "copy": number, "barcode": copies.barcode(number),
+                    "status": copies.status(number), "shelf": self._copies.shelves[copies.shelf(number)]}
+
+    def _copy_book(self, isbn, number, barcode):
+        """Возвращает книгу каталога, у которой есть экземпляр number; иначе BookNotFound."""
+        book = self._catalog.get(isbn)
+        if book is None or not 0 <= number < self._copies.get(book).total:
+            raise BookNotFound(f"Экземпляр {barcode} не найден.")
+        return book
+
+    def _add_copies(self, book, count, shelf, barcodes):
+        """Добавляет экземпляры без проверок книги и записи в журнал; возвращает их номера."""
+        numbers = self._copies.add(book, count, self._copies.shelf_code(shelf), barcodes)
+        book.quantity = self._copies.get(book).available_count()
+        self._quantity_changed(book)
+        return numbers
+
+    def _set_copy_damaged(self, book, number, damaged):
+        """Отмечает экземпляр поврежденным или исправным без проверок и записи в журнал."""
+        copies = self._copies.get(book)
+        if copies.set_damaged(number, damaged):
+            book.quantity = copies.available_count()
+            self._quantity_changed(book)
+
+    def _set_copy_withdrawn(self, book, number, withdrawn):
+        """Списывает экземпляр или возвращает его в фонд без проверок и записи в журнал."""
+        copies = self._copies.get(book)
+        if copies.set_withdrawn(number, withdrawn):
+            book.quantity = copies.available_count()
+            self._quantity_changed(book)
+
+    def _move_copy(self, book, number, shelf):
+        """Переставляет экземпляр без проверок и записи в журнал."""
+        self._copies.get(book).set_shelf(number, self._copies.shelf_code(shelf))
+
+    def _save_copies(self, book):
+        """Сохраняет в хранилище учет экземпляров книги вместе с ее количеством."""
+        if self._storage is not None:
+            self._storage.record_copies(book.quantity, self._copies.get(book), self._copies.shelves)
+
+    def _tracked_copies(self, books):
+        """Возвращает учет экземпляров книг каталога из books (сохраняется в хранилище вместе с выдачами)."""
+        return [self._copies.get(book) for book in {book.isbn: book for book in books}.values()
+                if self._catalog.get(book.isbn) is book]
+
+    def _register_book(self, book):
+        """Заносит проверенную книгу в каталог и во все индексы библиотеки."""
+        self._catalog[book.isbn] = book
+        self._copies.discard(book.isbn)  # Экземпляры прежней книги с тем же ISBN не переносятся
+        if self._inventory is not None:
+            self._inventory.add(book)
+        if self._search_index is not None:
+            self._search_index.add(book)
+        if self._title_index is not None:
+            self._title_index.add(book)
+        if self._author_index is not None:
+            self._author_index.add(book)
+        if self._genre_index is not None:
+            self._genre_index.add(book)
+
+    def _unregister_book(self, book):
+        """
+        Удаляет книгу из каталога и из всех индексов библиотеки.
+
+        Очереди резервирования снимаются, а отложенные по ним экземпляры
+        возвращаются в количество книги.
+        """
+        del self._catalog[book.isbn]
+        self._copies.discard(book.isbn)  # Выдачи удаленной книги возвращаются без учета экземпляров
+        queue = self._holds.pop(book.isbn, None)
+        ready = self._ready_holds.pop(book.isbn, None)
+        if ready:
+            book.quantity += len(ready)
+        if (queue or ready) and self._storage is not None:
+            self._storage.record_holds_cleared(book.isbn)
+        if self._inventory is not None:
+            self._inventory.remove(book)
+        if self._search_index is not None:
+            self._search_index.remove(book)
+        if self._title_index is not None:
+            self._title_index.remove(book)
+        if self._author_index is not None:
+            self._author_index.remove(book)
+        if self._genre_index is not None:
+            self._genre_index.remove(book)
+
+    def _catalog_book(self, book):
+        """Возвращает объект каталога с ISBN книги или None, если книги нет в каталоге."""
+        if not isinstance(book, Book):
+            return None
+        return self._catalog.get(book.isbn)
+
+    def _quantity_changed(self, book):
+        """Обновляет индексы после изменения количества экземпляров книги (удаленные книги в индексах не учтены)."""
+        if self._catalog.get(book.isbn) is not book:
+            return
+        if self._inventory is not None:
+            self._inventory.set_quantity(book)
+        if self._author_index is not None:
+            self._author_index.set_quantity(book)
+        if self._genre_index is not None:
+            self._genre_index.set_quantity(book)
+
+    def _lazy_index(self, attribute, build):
+        """
+        Возвращает индекс из атрибута attribute, при первом обращении строя его вызовом build().
+
+        Индекс строится при остановленных изменениях, иначе книги, добавленные
+        или выданные во время обхода каталога, не попали бы в него.
+        """
+        index = getattr(self, attribute)
+        if index is None:
+            with self._paused():
+                index = getattr(self, attribute)
+                if index is None:
+                    index = build()
+                    setattr(self, attribute, index)
+        return index
+
+    @property
+    def inventory(self):
+        """Колоночное хранилище остатков (InventoryColumns), синхронизированное с каталогом."""
+        def build():
+            inventory = InventoryColumns()
+            for book in self._catalog.values():
+                inventory.add(book)
+            return inventory
+        return self._lazy_index("_inventory", build)
+
+    def import_books(self, source, batch_size=10000, file_format=None):
+        """
+        Потоково загружает книги в каталог.
+
+        Строки читаются и проверяются пакетами по batch_size, ошибки не
+        логируются по одной, а собираются в отчет ImportReport.
+
+        Args:
+            source: Путь к файлу CSV/JSONL или итерируемый объект со словарями
+                (поля см. BOOK_IMPORT_FIELDS) либо объектами Book.
+            batch_size: Размер пакета строк.
+            file_format: "csv" или "jsonl"; по умолчанию определяется по расширению файла.
+
+        Returns:
+            Объект ImportReport.
+        """
+        report = ImportReport()
+        rows = enumerate(_iter_book_rows(source, file_format), start=1)
+        with self._catalog_lock:
+            self._import_rows(rows, batch_size, report)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "books_imported", "Импорт книг в библиотеку '%s': %s", self.name, report,
+                   added=report.added, duplicates=len(report.duplicates), invalid=len(report.invalid))
+        return report
+
+    def _import_rows(self, rows, batch_size, report):
+        """Заносит в каталог пронумерованные строки импорта пакетами по batch_size."""
+        catalog = self._catalog
+        register = self._register_book
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            # Проверка пакета, затем занесение корректных книг в каталог
+            for row_number, row in batch:
+                book, error = _book_from_row(row)
+                if error is None:
+                    error = _book_data_error(book)
+                if error is not None:
+                    report.invalid.append((row_number, error))
+                elif book.isbn in catalog:
+                    report.duplicates.append((row_number, book.isbn))
+                else:
+                    register(book)
+                    self._record_book(book)
+                    report.added += 1
+
+    @property
+    def search_index(self):
+        """Полнотекстовый индекс по названиям и авторам (TitleSearchIndex), синхронизированный с каталогом."""
+        def build():
+            index = TitleSearchIndex()
+            for book in self._catalog.values():
+                index.add(book)
+            return index
+        return self._lazy_index("_search_index", build)
+
+    @property
+    def title_index(self):
+        """Индекс книг по названию (TitleIndex), синхронизированный с каталогом."""
+        return self._lazy_index("_title_index", lambda: TitleIndex(self._catalog.values()))
+
+    @property
+    def author_index(self):
+        """Индекс книг по автору (AttributeIndex), синхронизированный с каталогом."""
+        return self._lazy_index("_author_index", lambda: AttributeIndex("author", self._catalog.values()))
+
+    @property
+    def genre_index(self):
+        """Индекс книг по жанру (AttributeIndex), синхронизированный с каталогом."""
+        return self._lazy_index("_genre_index", lambda: AttributeIndex("genre", self._catalog.values()))
+
+    def books_by_author(self, author, available=False):
+        """
+        Возвращает книги автора (все - в порядке добавления в каталог).
+
+        Args:
+            author: Объект Author.
+            available: Только книги, которые есть в наличии (quantity > 0).
+
+        Returns:
+            Список объектов Book; стоимость пропорциональна размеру результата.
+        """
+        return [self._catalog[isbn] for isbn in self.author_index.isbns(author, available)]
+
+    def books_by_genre(self, genre, available=False):
+        """
+        Возвращает книги жанра (все - в порядке добавления в каталог).
+
+        Args:
+            genre: Жанр.
+            available: Только книги, которые есть в наличии (quantity > 0).
+
+        Returns:
+            Список объектов Book; стоимость пропорциональна размеру результата.
+        """
+        return [self._catalog[isbn] for isbn in self.genre_index.isbns(genre, available)]
+
+    def query(self):
+        """
+        Начинает запрос к каталогу, например
+        library.query().where(genre="Фэнтези", available=True).order_by("title").limit(50).
+
+        Returns:
+            Объект CatalogQuery.
+        """
+        return CatalogQuery(self)
+
+    def iter_books(self, start_after=None, limit=None):
+        """
+        Перебирает книги в порядке названия, начиная после курсора.
+
+        Args:
+            start_after: Последняя книга предыдущей страницы (по умолчанию - с начала каталога).
+            limit: Максимальное количество книг (по умолчанию - до конца каталога).
+
+        Returns:
+            Генератор объектов Book; стоимость O(log n + размер страницы).
+        """
+        keys = self.title_index.iter_keys(None if start_after is None else TitleIndex.key(start_after))
+        for _, isbn in itertools.islice(keys, limit):
+            yield self._catalog[isbn]
+
+    def search(self, query, limit=10, fuzzy=False):
+        """
+        Ищет книги по словам из названия и имени автора.
+
+        Args:
+            query: Строка запроса; последнее слово может быть началом слова.
+            limit: Максимальное количество результатов.
+            fuzzy: Учитывать похожие слова (совпадение по триграммам).
+
+        Returns:
+            Список объектов Book, упорядоченный по убыванию релевантности.
+        """
+        # Книги добавляются и удаляются под блокировкой каталога, поэтому на время
+        # поиска индекс не меняется и каждый найденный ISBN есть в каталоге
+        with self._catalog_lock:
+            return [self._catalog[isbn] for isbn, _ in self.search_index.search(query, limit, fuzzy=fuzzy)]
+
+    def try_add_reader(self, reader):
+        """
+        Добавляет читателя в библиотеку без исключений на ожидаемых отказах.
+
+        Args:
+            reader: Объект Reader, который нужно добавить.
+
+        Returns:
+            OpResult: OK (value - читатель) или DUPLICATE.
+        """
+        # Блокировка каталога останавливает изменение читателей на время снимка,
+        # блокировка читателя - на время проверок выдачи
+        with self._catalog_lock, self._reader_lock_for(reader.reader_id):
+            if reader.reader_id in self._reader_database:
+                return _FAILED_RESULTS[OpStatus.DUPLICATE]
+            self._reader_database[reader.reader_id] = reader
+            self._record(CirculationJournal.ADD_READER, reader.first_name, reader.last_name, reader.reader_id)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "reader_added", "Читатель '%s %s' добавлен в библиотеку.",
+                   reader.first_name, reader.last_name, reader_id=reader.reader_id)
+        return OpResult(OpStatus.OK, reader)
+
+    def add_reader(self, reader):
+        """
+        Добавляет читателя в библиотеку.
+
+        Args:
+            reader: Объект Reader, который нужно добавить.
+        """
+        try:
+            if not self.try_add_reader(reader):
+                error = ReaderError(f"Читатель с ID {reader.reader_id} уже зарегистрирован.") # Использовать ReaderError
+                _report_error("add_reader_failed", "Ошибка при добавлении читателя: %s", error,
+                              reader_id=reader.reader_id)  # Журнал и консоль
+        except Exception as e:
+            logger.exception("Неожиданная ошибка при добавлении читателя: %s", e)
+        finally:
+            logger.debug("Завершение операции добавления читателя.")
+
+    def try_remove_reader(self, reader):
+        """
+        Удаляет читателя из библиотеки без исключений на ожидаемых отказах.
+
+        Резервирования читателя снимаются: отложенные для него экземпляры
+        переходят следующим читателям очереди или возвращаются в наличие.
+
+        Args:
+            reader: Объект Reader, который нужно удалить.
+
+        Returns:
+            OpResult: OK (value - читатель) или READER_NOT_FOUND.
+        """
+        # Резервирования читателя могут быть на любых книгах, поэтому изменения останавливаются целиком
+        with self._paused(), self._reader_lock_for(reader.reader_id):
+            if reader.reader_id not in self._reader_database:
+                return _FAILED_RESULTS[OpStatus.READER_NOT_FOUND]
+            del self._reader_database[reader.reader_id]
+            released = self._cancel_reader_holds(reader.reader_id)
+            if self._storage is not None:
+                for book in released:
+                    self._storage.record_hold_removed(book.isbn, reader.reader_id, book.quantity,
+                                                      [self._copies.get(book)])
+            self._record(CirculationJournal.REMOVE_READER, reader.reader_id)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "reader_removed", "Читатель '%s %s' удален из библиотеки.",
+                   reader.first_name, reader.last_name, reader_id=reader.reader_id)
+        return OpResult(OpStatus.OK, reader)
+
+    def remove_reader(self, reader):
+        """
+        Удаляет читателя из библиотеки.
+
+        Args:
+            reader: Объект Reader, который нужно удалить.
+        """
+        try:
+            if not self.try_remove_reader(reader):
+                error = ReaderNotFound(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.")
+                _report_error("remove_reader_failed", "Ошибка при удалении читателя: %s", error,
+                              reader_id=reader.reader_id)  # Журнал и консоль
+        except Exception as e:
+            logger.exception("Неожиданная ошибка при удалении читателя: %s", e)
+        finally:
+            logger.debug("Завершение операции удаления читателя.")
+
+    def display_books(self, start_after=None, limit=None):
+        """
+        Выводит список книг в библиотеке (по названию, с буферизацией вывода).
+
+        Args:
+            start_after: Последняя выведенная книга предыдущей страницы (необязательно).
+            limit: Количество книг на странице (по умолчанию - все книги).
+        """
+        if not self.books:
+            print("В библиотеке нет книг.")
+        else:
+            print("Книги в библиотеке:")
+            lines = []
+            for book in self.iter_books(start_after, limit): # Книги уже упорядочены по названию
+                lines.append(str(book))
+                if len(lines) == 1000:
+                    lines.append("")
+                    sys.stdout.write("\n".join(lines))
+                    lines.clear()
+            if lines:
+                lines.append("")
+                sys.stdout.write("\n".join(lines))
+
+    def display_readers(self):
+        """Выводит список читателей в библиотеке."""
+        if not self._reader_database: # Используем защищенный атрибут
+            print("В библиотеке нет читателей.")
+        else:
+            print("Читатели в библиотеке:")
+            for reader_id, reader in self._reader_database.items():
+                print(reader)
+
+    def try_lend(self, book, reader, due_date):
+        """
+        Выдает книгу читателю без исключений на ожидаемых отказах.
+
+        Если для читателя отложен экземпляр по очереди резервирования, выдается
+        он, даже когда свободных экземпляров нет.
+
+        Args:
+            book: Объект Book, который нужно выдать.
+            reader: Объект Reader, которому выдается книга.
+            due_date: Дата возврата книги.
+
+        Returns:
+            OpResult: OK (value - Loan), BOOK_NOT_FOUND, READER_NOT_FOUND, UNAVAILABLE или LIMIT_REACHED.
+        """
+        # Проверки и уменьшение количества выполняются атомарно под блокировками ISBN и читателя
+        with self._lock_for(book.isbn), self._reader_lock_for(reader.reader_id):
+            # Количество меняется у объектов каталога, а не у переданных копий
+            # (с SQLiteStorage каталог может вернуть другой объект с тем же ISBN)
+            book = self._catalog_book(book)
+            if book is None:
+                return _FAILED_RESULTS[OpStatus.BOOK_NOT_FOUND]
+            reader = self._reader_database.get(reader.reader_id)
+            if reader is None:
+                return _FAILED_RESULTS[OpStatus.READER_NOT_FOUND]
+            ready = self._has_ready_hold(book, reader)
+            if not ready and self._copies.get(book).first_available() is None:
+                return _FAILED_RESULTS[OpStatus.UNAVAILABLE]
+            if not self.can_borrow(reader):
+                return _FAILED_RESULTS[OpStatus.LIMIT_REACHED]
+
+            loan = self._open_loan(book, reader, datetime.date.today(), due_date)
+            if self._storage is not None:
+                self._storage.record_lend(loan, [self._copies.get(book)])
+                if ready:
+                    self._storage.record_hold_removed(book.isbn, reader.reader_id)
+            self._record(CirculationJournal.LEND, book.isbn, reader.reader_id, loan.loan_date, due_date)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "book_lent", "Книга '%s' выдана читателю '%s %s'.",
+                   book.title, reader.first_name, reader.last_name,
+                   isbn=book.isbn, reader_id=reader.reader_id, due_date=due_date)
+        return OpResult(OpStatus.OK, loan)
+
+    def lend_book(self, book, reader, due_date):
+        """
+        Выдает книгу читателю.
+
+        Args:
+            book: Объект Book, который нужно выдать.
+            reader: Объект Reader, которому выдается книга.
+            due_date: Дата возврата книги.
+
+        Returns:
+            Объект Loan или None, если выдать книгу не удалось.
+        """
+        try:
+            result = self.try_lend(book, reader, due_date)
+            if result.status is OpStatus.OK:
+                return result.value
+            if result.status is OpStatus.BOOK_NOT_FOUND:
+                error = BookNotFound(f"Книга '{book.title}' не найдена в библиотеке.")
+            elif result.status is OpStatus.READER_NOT_FOUND:
+                error = ReaderNotFound(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.")
+            elif result.status is OpStatus.LIMIT_REACHED:
+                error = LoanLimitExceeded(f"Читатель '{reader.first_name} {reader.last_name}' "
+                                          f"достиг предела выдач ({self.loan_limit_for(reader)}).")
+            else:
+                error = BookUnavailable(f"Книга '{book.title}' недоступна для выдачи.")
+            _report_error("lend_failed", "Ошибка: %s", error, isbn=book.isbn, reader_id=reader.reader_id)  # Журнал и консоль
+        except Exception as e:
+            logger.exception("Неожиданная ошибка: %s", e)
+        finally:
+            logger.debug("Завершение операции выдачи книги.")
+
+    def try_return(self, book, reader):
+        """
+        Возвращает книгу в библиотеку без исключений на ожидаемых отказах.
+
+        Args:
+            book: Объект Book, который возвращается.
+            reader: Объект Reader, который возвращает книгу.
+
+        Returns:
+            OpResult: OK (value - закрытый Loan) или NOT_LENT.
+        """
+        with self._lock_for(book.isbn):
+            # Ищем и удаляем запись о выдаче по индексу (ISBN, reader_id)
+            loan = self._close_loan(book, reader)
+            if loan is None:
+                return _FAILED_RESULTS[OpStatus.NOT_LENT]
+
+            if self._storage is not None:
+                self._storage.record_return(loan, self._tracked_copies([loan.book]))
+            self._record(CirculationJournal.RETURN, book.isbn, reader.reader_id)
+        self._checkpoint_if_due()
+        _log_event(logging.INFO, "book_returned", "Книга '%s' возвращена читателем '%s %s'.",
+                   book.title, reader.first_name, reader.last_name, isbn=book.isbn, reader_id=reader.reader_id)
+        return OpResult(OpStatus.OK, loan)
+
+    def return_book(self, book, reader):
+        """
+        Возвращает книгу в библиотеку.
+
+        Args:
+            book: Объект Book, который возвращается.
+            reader: Объект Reader, который возвращает книгу.
+
+        Returns:
+            Закрытый объект Loan или None, если книга не была выдана этому читателю.
+        """
+        try:
+            result = self.try_return(book, reader)
+            if result:
+                return result.value
+            _report_error("return_failed", "Ошибка при возврате книги: %s", "Данная книга не была выдана этому читателю.",
+                          isbn=book.isbn, reader_id=reader.reader_id)  # Журнал и консоль
+        except Exception as e:
+            logger.exception("Неожиданная ошибка при возврате книги: %s", e)
+        finally:
+            logger.debug("Завершение операции возврата книги.")
+
+    def _add_loan(self, loan):
+        """Заносит выдачу в журнал выдач и индекс дат возврата."""
+        self.loans.append(loan)
+        self._due_index.add(loan)
+
+    def _take_copy(self, book, reader):
+        """
+        Выбирает экземпляр для выдачи без проверок: отложенный для читателя
+        по очереди резервирования или первый свободный (количество пересчитывается по учету экземпляров).
+        """
+        ready = self._ready_holds.get(book.isbn)
+        if ready and reader.reader_id in ready:
+            copy = ready.pop(reader.reader_id)
+            if not ready:
+                del self._ready_holds[book.isbn]
+            return copy
+        copies = self._copies.get(book)  # Учет экземпляров создается по количеству до выдачи
+        copy = copies.checkout()
+        book.quantity = copies.available_count()
+        return copy
+
+    def _release_copy(self, book, copy):
+        """
+        Принимает экземпляр без проверок: отдает его следующему читателю очереди
+        резервирования или возвращает в наличие. Возвращает True, если количество изменилось.
+        """
+        if self._catalog.get(book.isbn) is not book:
+            book.quantity += 1  # Книга удалена из каталога: ее экземпляры больше не учитываются
+            return True
+        queue = self._holds.get(book.isbn)
+        copies = self._copies.get(book)
+        while queue:
+            copy = copies.reserve(copy)
+            if copy is None:
+                break
+            reader_id = queue.pop()
+            if not queue:
+                del self._holds[book.isbn]
+            if reader_id not in self._reader_database:
+                continue  # Читатель удален, пока стоял в очереди
+            self._ready_holds.setdefault(book.isbn, {})[reader_id] = copy
+            if self._storage is not None:
+                self._storage.record_hold_ready(book.isbn, reader_id, copy)
+            return False
+        if copies.checkin(copy):
+            book.quantity = copies.available_count()
+            return True
+        return False
+
+    def _has_ready_hold(self, book, reader):
+        """Проверяет, отложен ли для читателя экземпляр книги."""
+        ready = self._ready_holds.get(book.isbn)
+        return bool(ready) and reader.reader_id in ready
+
+    def _open_loan(self, book, reader, loan_date, due_date):
+        """Оформляет выдачу без проверок: выдает отложенный или первый свободный экземпляр и заносит Loan в индексы."""
+        copy = self._take_copy(book, reader)
+        self._quantity_changed(book)
+        loan = Loan(book, reader, loan_date, due_date, copy)
+        self._add_loan(loan)
+        return loan
+
+    def _close_loan(self, book, reader):
+        """Закрывает самую раннюю выдачу книги читателю; возвращает Loan или None."""
+        loan = self.loans.pop(book, reader)
+        if loan is None:
+            return None
+        self._due_index.discard(loan)
+        if self._release_copy(loan.book, loan.copy):
+            self._quantity_changed(loan.book)
+        return loan
+
+    def _open_loans(self, reader, books, loan_date, due_date):
+        """Оформляет пакет выдач одному читателю без проверок; индексы обновляются один раз на пакет."""
+        loans = []
+        for book in books:
+            copy = self._take_copy(book, reader)
+            loan = Loan(book, reader, loan_date, due_date, copy)
+            self.loans.append(loan)
+            loans.append(loan)
+        for book in {id(book): book for book in books}.values():
+            self._quantity_changed(book)
+        self._due_index.add_many(loans)
+        return loans
+
+    def _close_loans(self, pairs):
+        """Закрывает выдачи для пар (книга, читатель) без проверок; возвращает закрытые Loan."""
+        loans = []
+        for book, reader in pairs:
+            loan = self.loans.pop(book, reader)
+            if loan is not None:
+                self._release_copy(loan.book, loan.copy)
+                loans.append(loan)
+        for book in {id(loan.book): loan.book for loan in loans}.values():
+            self._quantity_changed(book)
+        self._due_index.discard_many(loans)
+        return loans
+
+    @contextlib.contextmanager
+    def _locked_isbns(self, isbns):
+        """Захватывает блокировки всех ISBN пакета в порядке номеров (без взаимоблокировок)."""
+        stripes = len(self._isbn_locks)
+        with contextlib.ExitStack() as stack:
+            for index in sorted({hash(isbn) % stripes for isbn in isbns}):
+                stack.enter_context(self._isbn_locks[index])
+            yield
+
+    def lend_many(self, reader, books, due_date):
+        """
+        Выдает читателю несколько книг по принципу "все или ничего".
+
+        Все книги проверяются до изменений: при первом отказе ничего не выдается.
+        Одна книга может встречаться в пакете несколько раз (несколько экземпляров).
+
+        Args:
+            reader: Объект Reader, которому выдаются книги.
+            books: Объекты Book.
+            due_date: Дата возврата книг.
+
+        Returns:
+            OpResult: OK (value - список Loan в порядке books) или отказ
+            (BOOK_NOT_FOUND, READER_NOT_FOUND, UNAVAILABLE; detail - книга, из-за которой отказано;
+            LIMIT_REACHED - пакет не умещается в предел выдач читателя).
+        """
+        books = list(books)
+        if not books:
+            return OpResult(OpStatus.OK, [])
+        with self._locked_isbns([book.isbn for book in books]), self._reader_lock_for(reader.reader_id):
+            reader = self._reader_database.get(reader.reader_id)
+            if reader is None:
+                return _FAILED_RESULTS[OpStatus.READER_NOT_FOUND]
+            if not self.can_borrow(reader, len(books)):
+                return _FAILED_RESULTS[OpStatus.LIMIT_REACHED]
+            demand = {}
+            ready = []  # ISBN с отложенными для читателя экземплярами
+            for position, requested in enumerate(books):
+                book = books[position] = self._catalog_book(requested)
+                if book is None:
+                    return OpResult(OpStatus.BOOK_NOT_FOUND, detail=requested)
+                if book.isbn not in demand:
+                    demand[book.isbn] = 0
+                    if self._has_ready_hold(book, reader):
+                        demand[book.isbn] = -1
+                        ready.append(book.isbn)
+                demand[book.isbn] += 1
+                if self._copies.get(book).available_count() < demand[book.isbn]:
+                    return OpResult(OpStatus.UNAVAILABLE, detail=book)
+
+            loans = self._open_loans(reader, books, datetime.date.today(), due_date)
+            if self._storage is not None:
+                self._storage.record_lends(loans, self._tracked_copies(books))
+                for isbn in ready:
+                    self._storage.record_hold_removed(isbn, reader.reader_id)
+            self._record(CirculationJournal.LEND_MANY, reader.reader_id, loans[0].loan_date, due_date,
+                         CirculationJournal.BATCH_SEPARATOR.join(book.isbn for book in books))
+        self._checkpoint_if_due()
+        if logger.isEnabledFor(logging.INFO):  # Список ISBN собирается, только если запись нужна
+            _log_event(logging.INFO, "books_lent", "Читателю '%s %s' выдано книг: %d.",
+                       reader.first_name, reader.last_name, len(loans),
+                       reader_id=reader.reader_id, isbns=[book.isbn for book in books], due_date=due_date)
+        return OpResult(OpStatus.OK, loans)
+
+    def return_many(self, pairs):
+        """
+        Принимает пакет возвратов по принципу "все или ничего".
+
+        Args:
+            pairs: Пары (Book, Reader); одна пара может повторяться, если читатель
+                возвращает несколько экземпляров.
+
+        Returns:
+            OpResult: OK (value - список закрытых Loan в порядке pairs) или NOT_LENT
+            (detail - пара, для которой нет открытой выдачи).
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return OpResult(OpStatus.OK, [])
+        with self._locked_isbns([book.isbn for book, _ in pairs]):
+            demand = {}
+            for book, reader in pairs:
+                key = (book.isbn, reader.reader_id)
+                demand[key] = demand.get(key, 0) + 1
+                if self.loans.count(book, reader) < demand[key]:
+                    return OpResult(OpStatus.NOT_LENT, detail=(book, reader))
+
+            loans = self._close_loans(pairs)
+            if self._storage is not None:
+                self._storage.record_returns(loans, self._tracked_copies(loan.book for loan in loans))
+            if self._journal is not None:
+                # По записи на читателя: reader_id сохраняется типизированным полем, как в LEND_MANY
+                isbns_by_reader = {}
+                for book, reader in pairs:
+                    isbns_by_reader.setdefault(reader.reader_id, []).append(book.isbn)
+                separator = CirculationJournal.BATCH_SEPARATOR
+                for reader_id, isbns in isbns_by_reader.items():
+                    self._record(CirculationJournal.RETURN_BATCH, reader_id, separator.join(isbns))
+        self._checkpoint_if_due()
+        if logger.isEnabledFor(logging.INFO):
+            _log_event(logging.INFO, "books_returned", "Принято возвратов: %d.", len(loans),
+                       pairs=[(book.isbn, reader.reader_id) for book, reader in pairs])
+        return OpResult(OpStatus.OK, loans)
+
+    def _record(self, op, *fields):
+        """Записывает операцию в журнал, если он подключен."""
+        if self._journal is not None:
+            self._journal.append(op, *fields)
+
+    def _record_book(self, book):
+        """Записывает в журнал добавление книги."""
+        if self._journal is not None:
+            author = book.author
+            self._journal.append(CirculationJournal.ADD_BOOK, book.title, author.first_name, author.last_name,
+                                 author.biography, book.isbn, book.genre, book.quantity)
+
+    def _checkpoint_if_due(self):
+        """Делает снимок состояния, если журнал накопил достаточно операций после прошлого снимка."""
+        if self._journal is not None and self._journal.snapshot_due():
+            self.checkpoint()
+
+    def attach_journal(self, journal):
+        """
+        Подключает журнал операций; дальнейшие изменения будут записываться в него.
+
+        Args:
+            journal: Объект CirculationJournal.
+        """
+        self._journal = journal
+
+    def checkpoint(self):
+        """Сохраняет снимок состояния в журнал, после чего восстановление читает только новые записи."""
+        if self._journal is None:
+            return
+        with self._paused():
+            self._journal.write_snapshot(self)
+
+    @contextlib.contextmanager
+    def _paused(self):
+        """Останавливает изменения каталога и выдач (захватывает блокировку каталога и все блокировки ISBN)."""
+        with self._catalog_lock, contextlib.ExitStack() as stack:
+            for lock in self._isbn_locks:
+                stack.enter_context(lock)
+            yield
+
+    def save_snapshot(self, path):
+        """
+        Сохраняет состояние библиотеки в файл колоночного снимка (см. ColumnarSnapshot).
+
+        Каталог, читатели, открытые выдачи, пределы выдач, экземпляры и очереди
+        резервирования собираются при остановленных изменениях, а файл
+        записывается после их возобновления.
+
+        Args:
+            path: Путь к файлу снимка (файл заменяется атомарно).
+        """
+        with _gc_paused():
+            # Под остановкой изменений только собираются колонки; кодирование и запись - после
+            with self._paused():
+                state = ColumnarSnapshot.collect(self)
+            ColumnarSnapshot.write(state, path)
+        _log_event(logging.INFO, "snapshot_saved", "Снимок библиотеки сохранен в %s.", path, path=path)
+
+    def export_catalog(self, path):
+        """
+        Записывает каталог в файл только для чтения, который открывается через MappedCatalog
+        (например, на терминалах, где нужен только поиск по ISBN).
+
+        Args:
+            path: Путь к файлу каталога (файл заменяется атомарно).
+
+        Returns:
+            Количество записанных книг.
+        """
+        # Под остановкой изменений копируются только поля книг; кодирование и запись - после
+        with self._paused():
+            rows = list(map(MappedCatalog._row, self._catalog.values()))
+        return MappedCatalog._write_rows(path, rows)
+
+    @classmethod
+    def load_snapshot(cls, path, **options):
+        """
+        Создает библиотеку (в памяти) из файла колоночного снимка.
+
+        Args:
+            path: Путь к файлу, записанному save_snapshot.
+            options: Дополнительные параметры конструктора (например, lock_stripes).
+
+        Returns:
+            Новый объект Library.
+        """
+        return ColumnarSnapshot.load(cls, path, **options)
+
+    @classmethod
+    def recover(cls, name, address, directory, library_type="Public", **journal_options):
+        """
+        Восстанавливает библиотеку из каталога журнала: загружает последний снимок и
+        применяет записи журнала после него.
+
+        Args:
+            name: Название библиотеки.
+            address: Адрес библиотеки.
+            directory: Каталог с журналом и снимками.
+            library_type: Тип библиотеки.
+            journal_options: Параметры CirculationJournal.
+
+        Returns:
+            Объект Library с подключенным журналом.
+        """
+        library = cls(name, address, library_type)
+        journal = CirculationJournal(directory, **journal_options)
+        journal.replay(library)
+        library.attach_journal(journal)
+        return library
+
+    def overdue_loans(self, as_of=None):
+        """
+        Возвращает просроченные выдачи, начиная с самых старых.
+
+        Args:
+            as_of: Дата, на которую выполняется проверка (по умолчанию сегодня).
+
+        Returns:
+            Список объектов Loan с датой возврата раньше as_of.
+        """
+        if as_of is None:
+            as_of = datetime.date.today()
+        return self._due_index.due_before(as_of)
+
+    def loans_due_between(self, start, end):
+        """
+        Возвращает выдачи, срок возврата которых попадает в диапазон дат.
+
+        Args:
+            start: Начальная дата (включительно).
+            end: Конечная дата (включительно).
+
+        Returns:
+            Список объектов Loan, упорядоченный по дате возврата.
+        """
+        return self._due_index.due_between(start, end)
+
+    # Измеряемые методы -> имя операции в метриках. Методы lend_book, return_book и
+    # т. п. вызывают соответствующие try_*, поэтому учитываются под тем же именем
+    _INSTRUMENTED = {
+        "try_add_book": "add_book", "try_remove_book": "remove_book",
+        "try_add_reader": "add_reader", "try_remove_reader": "remove_reader",
+        "try_lend": "lend_book", "try_return": "return_book",
+        "lend_many": "lend_many", "return_many": "return_many",
+        "import_books": "import_books", "display_books": "display_books",
+        "try_place_hold": "place_hold", "try_cancel_hold": "cancel_hold",
+    }
+
+    def enable_metrics(self, metrics=None):
+        """
+        Включает учет вызовов, ошибок и задержек операций.
+
+        Измеряющие обертки устанавливаются как атрибуты экземпляра поверх
+        методов класса, поэтому при выключенных метриках вызовы не проходят
+        ни через какие проверки.
+
+        Args:
+            metrics: Объект LibraryMetrics (по умолчанию создается новый).
+
+        Returns:
+            Объект LibraryMetrics.
+        """
+        self._metrics = metrics or LibraryMetrics()
+        for method_name, op in self._INSTRUMENTED.items():
+            setattr(self, method_name, self._metrics.wrap(op, getattr(type(self), method_name).__get__(self)))
+        return self._metrics
+
+    def disable_metrics(self):
+        """Выключает учет операций; накопленные метрики остаются в возвращаемом объекте."""
+        metrics, self._metrics = self._metrics, None
+        for method_name in self._INSTRUMENTED:
+            self.__dict__.pop(method_name, None)
+        return metrics
+
+    def stats(self):
+        """
+        Возвращает сводку по библиотеке: размеры каталога, базы читателей и журнала выдач,
+        а при включенных метриках - счетчики и задержки операций ("operations").
+        """
+        stats = {"books": len(self._catalog), "readers": len(self._reader_database), "open_loans": len(self.loans)}
+        if self._metrics is not None:
+            stats["operations"] = self._metrics.snapshot()
+        return stats
+
+    def flush(self):
+        """Фиксирует накопленные изменения в постоянном хранилище (если оно подключено)."""
+        if self._storage is not None:
+            self._storage.commit()
+
+    @staticmethod
+    def get_library_count():
+        """Возвращает общее количество библиотек."""
+        return Library.total_libraries
+
+    def display_asset_info(self):
+        """Выводит информацию о библиотеке (название, адрес, тип, количество книг)."""
+        print(f"Название библиотеки: {self.name}, Адрес: {self.address}, Тип: {self.library_type}")
+        # Задание 4: Доступ к защищенным атрибутам
+        print(f"Количество книг в каталоге: {len(self._catalog)}")
+
+    # Задание 3: Переопределение и вызов метода базового класса
+    def display_library_info(self):
+        """Выводит информацию о библиотеке, используя метод базового класса."""
+        super().display_asset_info()  # Вызов метода базового класса
+        print(f"Тип библиотеки: {self.library_type}")
+
+    def combined_method(self, condition): # Дополнительный метод для наследования.
+        """Пример комбинированного метода для демонстрации наследования."""
+        if condition:
+            print("Производный метод сначала:")
+            self.display_library_info() # Вызываем переопределенный метод
+            print(self._base_method()) # Вызываем метод базового класса
+        else:
+            print("Базовый метод сначала:")
+            print(self._base_method()) # Вызываем метод базового класса
+            self.display_library_info() # Вызываем переопределенный метод
+
+# Класс, представляющий читателя
+class Reader:
+    """Представляет читателя."""
+    __slots__ = ("first_name", "last_name", "reader_id", "_borrowed_books", "__weakref__")
+
+    def __init__(self, first_name, last_name, reader_id):
+        """
+        Инициализирует объект Reader.
+
+        Args:
+            first_name: Имя читателя.
+            last_name: Фамилия читателя.
+            reader_id: Уникальный идентификатор читателя.
+        """
+        self.first_name = first_name
+        self.last_name = last_name
+        self.reader_id = reader_id
+        # Словарь взятых книг создается только при первом обращении
+        self._borrowed_books = None
+
+    @property
+    def borrowed_books(self):
+        """Словарь взятых книг (ключ - Book, значение - дата самой ранней открытой выдачи); ведется журналом выдач."""
+        if self._borrowed_books is None:
+            self._borrowed_books = {}
+        return self._borrowed_books
+
+    def __str__(self):
+        """Возвращает строковое представление читателя."""
+        return f"{self.first_name} {self.last_name} (ID: {self.reader_id})"
+
+    def __hash__(self):
+        """Возвращает хеш-значение для читателя (по ID)."""
+        return hash(self.reader_id)
+
+# Класс, представляющий информацию о выдаче книги
+class Loan:
+    """Представляет информацию о выдаче книги."""
+    __slots__ = ("book", "reader", "loan_date", "due_date", "copy")
+
+    def __init__(self, book, reader, loan_date, due_date, copy=None):
+        """
+        Инициализирует объект Loan.
+
+        Args:
+            book: Книга, которая была выдана.
+            reader: Читатель, которому выдали книгу.
+            loan_date: Дата выдачи книги.
+            due_date: Дата возврата книги.
+            copy: Номер выданного экземпляра (None - экземпляр не учитывался).
+        """
+        self.book = book
+        self.reader = reader
+        self.loan_date = loan_date
+        self.due_date = due_date
+        self.copy = copy
+
+    @property
+    def barcode(self):
+        """Штрихкод по умолчанию выданного экземпляра или None (собственный штрихкод - в Library.copy_info)."""
+        return None if self.copy is None else CopyTracker.barcode_of(self.book.isbn, self.copy)
+
+    def __str__(self):
+        """Возвращает строковое представление информации о выдаче книги."""
+        return f"Книга: {self.book.title}, Читатель: {self.reader.first_name} {self.reader.last_name}, Дата выдачи: {self.loan_date}, Дата возврата: {self.due_date}"
+
+    def is_overdue(self, as_of=None):
+        """
+        Проверяет, просрочена ли книга.
+
+        Args:
+            as_of: Дата, на которую выполняется проверка (по умолчанию сегодня).
+        """
+        if as_of is None:
+            as_of = datetime.date.today()
+        return self.due_date < as_of
+
+# Журнал выдач с индексом по (ISBN, reader_id)
+class LoanLedger:
+    """
+    Журнал выдач книг.
+
+    Хранит объекты Loan в порядке выдачи и поддерживает индекс по ключу
+    (ISBN, reader_id), поэтому поиск и удаление выдачи выполняются за O(1).
+    Один читатель может держать несколько экземпляров одной книги:
+    по ключу хранится упорядоченная группа выдач, первой возвращается самая ранняя.
+    Дополнительно поддерживается индекс открытых выдач по reader_id и
+    словарь Reader.borrowed_books (книга -> дата самой ранней открытой выдачи).
+    """
+    def __init__(self, loans=()):
+        """
+        Инициализирует объект LoanLedger.
+
+        Args:
+            loans: Начальные выдачи (необязательно).
+        """
+        # Все выдачи в порядке добавления (dict используется как упорядоченное множество)
+        self._loans = {}
+        # Индекс: (ISBN, reader_id) -> выдачи этой книги этому читателю в порядке выдачи
+        self._index = {}
+        # Индекс: reader_id -> открытые выдачи читателя в порядке выдачи. Выдачи одного
+        # читателя могут меняться под разными блокировками ISBN, поэтому у индекса своя блокировка
+        self._by_reader = {}
+        self._reader_lock = threading.Lock()
+        for loan in loans:
+            self.append(loan)
+
+    @staticmethod
+    def _key(book, reader):
+        """Возвращает ключ индекса для пары книга/читатель."""
+        return (book.isbn, reader.reader_id)
+
+    def append(self, loan):
+        """
+        Добавляет запись о выдаче в журнал.
+
+        Args:
+            loan: Объект Loan.
+        """
+        self._loans[loan] = None
+        self._index.setdefault(self._key(loan.book, loan.reader), {})[loan] = None
+        reader = loan.reader
+        with self._reader_lock:
+            self._by_reader.setdefault(reader.reader_id, {})[loan] = None
+        reader.borrowed_books.setdefault(loan.book, loan.loan_date)
+
+    def extend(self, loans):
+        """
+        Добавляет несколько записей о выдаче (блокировка индекса читателей захватывается один раз).
+
+        Args:
+            loans: Объекты Loan.
+        """
+        all_loans, index, by_reader = self._loans, self._index, self._by_reader
+        with self._reader_lock:
+            for loan in loans:
+                book, reader = loan.book, loan.reader
+                all_loans[loan] = None
+                key = (book.isbn, reader.reader_id)
+                group = index.get(key)
+                if group is None:
+                    group = index[key] = {}
+                group[loan] = None
+                group = by_reader.get(reader.reader_id)
+                if group is None:
+                    group = by_reader[reader.reader_id] = {}
+                group[loan] = None
+                reader.borrowed_books.setdefault(book, loan.loan_date)
+
+    def find(self, book, reader):
+        """
+        Находит самую раннюю выдачу книги читателю.
+
+        Args:
+            book: Объект Book.
+            reader: Объект Reader.
+
+        Returns:
+            Объект Loan или None, если такой выдачи нет.
+        """
+        group = self._index.get(self._key(book, reader))
+        if not group:
+            return None
+        return next(iter(group))
+
+    def pop(self, book, reader):
+        """
+        Удаляет из журнала самую раннюю выдачу книги читателю.
+
+        Args:
+            book: Объект Book.
+            reader: Объект Reader.
+
+        Returns:
+            Удаленный объект Loan или None, если такой выдачи нет.
+        """
+        loan = self.find(book, reader)
+        if loan is not None:
+            self.remove(loan)
+        return loan
+
+    def remove(self, loan):
+        """
+        Удаляет конкретную запись о выдаче.
+
+        Args:
+            loan: Объект Loan, который нужно удалить.
+
+        Raises:
+            KeyError: Если выдачи нет в журнале.
+        """
+        del self._loans[loan]
+        reader = loan.reader
+        key = self._key(loan.book, reader)
+        group = self._index[key]
+        del group[loan]
+        if not group:
+            del self._index[key]
+            reader.borrowed_books.pop(loan.book, None)
+        else:
+            reader.borrowed_books[loan.book] = next(iter(group)).loan_date
+        with self._reader_lock:
+            loans = self._by_reader[reader.reader_id]
+            del loans[loan]
+            if not loans:
+                del self._by_reader[reader.reader_id]
+
+    def count(self, book, reader):
+        """Возвращает количество экземпляров книги, выданных читателю."""
+        return len(self._index.get(self._key(book, reader), ()))
+
+    def reader_count(self, reader_id):
+        """Возвращает количество открытых выдач читателя (O(1))."""
+        return len(self._by_reader.get(reader_id, ()))
+
+    def reader_loans(self, reader_id):
+        """Возвращает список открытых выдач читателя в порядке выдачи."""
+        with self._reader_lock:
+            return list(self._by_reader.get(reader_id, ()))
+
+    def __contains__(self, loan):
+        """Проверяет, есть ли выдача в журнале."""
+        return loan in self._loans
+
+    def __iter__(self):
+        """Перебирает выдачи в порядке добавления."""
+        return iter(self._loans)
+
+    def __len__(self):
+        """Возвращает количество открытых выдач."""
+        return len(self._loans)
+
+    def __repr__(self):
+        """Возвращает строковое представление журнала (repr)."""
+        return f"LoanLedger({list(self._loans)!r})"
+
+# Индекс выдач по дате возврата
+class DueDateIndex:
+    """
+    Индекс открытых выдач по дате возврата.
+
+    Выдачи сгруппированы по дате возврата, а сами даты хранятся в
+    отсортированном списке. Запросы по диапазону дат выполняются за
+    O(log n + k), где k - количество найденных выдач. Индекс общий для
+    всех ISBN, поэтому защищен собственной блокировкой.
+    """
+    def __init__(self):
+        """Инициализирует пустой индекс."""
+        self._lock = threading.Lock()
+        # Отсортированный список различных дат возврата
+        self._dates = []
+        # Дата возврата -> выдачи с этой датой (в порядке добавления)
+        self._buckets = {}
+
+    def add(self, loan):
+        """
+        Добавляет выдачу в индекс.
+
+        Args:
+            loan: Объект Loan.
+        """
+        with self._lock:
+            bucket = self._buckets.get(loan.due_date)
+            if bucket is None:
+                bucket = self._buckets[loan.due_date] = {}
+                bisect.insort(self._dates, loan.due_date)
+            bucket[loan] = None
+
+    def add_many(self, loans):
+        """Добавляет несколько выдач под одной блокировкой."""
+        with self._lock:
+            for loan in loans:
+                bucket = self._buckets.get(loan.due_date)
+                if bucket is None:
+                    bucket = self._buckets[loan.due_date] = {}
+                    bisect.insort(self._dates, loan.due_date)
+                bucket[loan] = None
+
+    def discard(self, loan):
+        """
+        Удаляет выдачу из индекса, если она там есть.
+
+        Args:
+            loan: Объект Loan.
+        """
+        with self._lock:
+            bucket = self._buckets.get(loan.due_date)
+            if bucket is None or loan not in bucket:
+                return
+            del bucket[loan]
+            if not bucket:
+                del self._buckets[loan.due_date]
+                del self._dates[bisect.bisect_left(self._dates, loan.due_date)]
+
+    def discard_many(self, loans):
+        """Удаляет несколько выдач под одной блокировкой."""
+        with self._lock:
+            for loan in loans:
+                bucket = self._buckets.get(loan.due_date)
+                if bucket is None or loan not in bucket:
+                    continue
+                del bucket[loan]
+                if not bucket:
+                    del self._buckets[loan.due_date]
+                    del self._dates[bisect.bisect_left(self._dates, loan.due_date)]
+
+    def _collect(self, lo, hi):
+        """Возвращает выдачи для дат с индексами [lo, hi) в порядке возрастания даты."""
+        result = []
+        for due_date in self._dates[lo:hi]:
+            result.extend(self._buckets[due_date])
+        return result
+
+    def due_before(self, date):
+        """Возвращает выдачи с датой возврата строго раньше date."""
+        with self._lock:
+            return self._collect(0, bisect.bisect_left(self._dates, date))
+
+    def due_between(self, start, end):
+        """Возвращает выдачи с датой возврата в диапазоне [start, end]."""
+        with self._lock:
+            return self._collect(bisect.bisect_left(self._dates, start),
+                                 bisect.bisect_right(self._dates, end))
+
+    def __len__(self):
+        """Возвращает количество выдач в индексе."""
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+# Экземпляры одной книги с битовой картой наличия
+class BookCopies:
+    """
+    Экземпляры книги с одним ISBN.
+
+    Экземпляры нумеруются с 0; наличие, выдача, повреждения и списание хранятся
+    битовыми картами (целые числа Python, бит n - экземпляр n), полка - двухбайтовым
+    кодом в array("H"). Поиск первого свободного экземпляра и подсчет
+    свободных стоят O(число машинных слов карты), на экземпляр
+    приходится около двух байт. Кроме штрихкода "<ISBN>/<номер>" экземпляру
+    можно присвоить собственный (напечатанный на книге). Вызывающий код
+    защищает объект блокировкой ISBN.
+    """
+    __slots__ = ("isbn", "total", "_available", "_on_loan", "_damaged", "_withdrawn", "_shelves", "_barcodes")
+
+    def __init__(self, isbn, count=0, shelf_code=0):
+        """
+        Инициализирует объект BookCopies.
+
+        Args:
+            isbn: ISBN книги.
+            count: Количество экземпляров (все в наличии).
+            shelf_code: Код полки экземпляров.
+        """
+        self.isbn = isbn
+        self.total = 0
+        self._available = 0
+        self._on_loan = 0
+        self._damaged = 0
+        self._withdrawn = 0
+        self._shelves = array("H")
+        self._barcodes = None  # Номер экземпляра -> собственный штрихкод
+        self.add(count, shelf_code)
+
+    def add(self, count, shelf_code=0, barcodes=None):
+        """
+        Добавляет count экземпляров в наличии; возвращает их номера (range).
+
+        Args:
+            count: Количество экземпляров.
+            shelf_code: Код полки экземпляров.
+            barcodes: Собственные штрихкоды новых экземпляров (по одному на экземпляр) или None.
+        """
+        numbers = range(self.total, self.total + count)
+        self._available |= ((1 << count) - 1) << self.total
+        self._shelves.extend(array("H", [shelf_code]) * count)
+        self.total += count
+        if barcodes is not None:
+            if self._barcodes is None:
+                self._barcodes = {}
+            self._barcodes.update(zip(numbers, barcodes))
+        return numbers
+
+    def available_count(self):
+        """Возвращает количество экземпляров в наличии."""
+        return self._available.bit_count()
+
+    def first_available(self):
+        """Возвращает номер первого экземпляра в наличии или None."""
+        bits = self._available
+        return (bits & -bits).bit_length() - 1 if bits else None
+
+    def checkout(self):
+        """Выдает первый экземпляр в наличии; возвращает его номер или None, если свободных нет."""
+        bits = self._available
+        if not bits:
+            return None
+        lowest = bits & -bits
+        self._available = bits ^ lowest
+        self._on_loan |= lowest
+        return lowest.bit_length() - 1
+
+    def checkin(self, number):
+        """
+        Принимает экземпляр number обратно.
+
+        Если экземпляр неизвестен (выдача без учета экземпляров или из другого
+        филиала), заводится новый экземпляр. Поврежденный или списанный экземпляр в наличие не попадает.
+
+        Returns:
+            True, если в наличии стало на один экземпляр больше.
+        """
+        if number is None or not 0 <= number < self.total or not self._on_loan >> number & 1:
+            self.add(1, 0)
+            return True
+        bit = 1 << number
+        self._on_loan ^= bit
+        if (self._damaged | self._withdrawn) & bit:
+            return False
+        self._available |= bit
+        return True
+
+    def reserve(self, number):
+        """
+        Оставляет возвращаемый экземпляр number на руках - за следующим читателем в очереди.
+
+        Неизвестный экземпляр заводится заново, как в checkin.
+
+        Returns:
+            Номер отложенного экземпляра или None, если экземпляр поврежден или списан
+            (его нужно принять через checkin).
+        """
+        if number is None or not 0 <= number < self.total or not self._on_loan >> number & 1:
+            number = self.add(1, 0)[0]
+            bit = 1 << number
+            self._available ^= bit
+            self._on_loan |= bit
+            return number
+        if (self._damaged | self._withdrawn) >> number & 1:
+            return None
+        return number
+
+    def set_damaged(self, number, damaged):
+        """
+        Отмечает экземпляр поврежденным или исправным.
+
+        Returns:
+            Изменение количества экземпляров в наличии (-1, 0 или 1).
+        """
+        bit = 1 << number
+        if damaged:
+            self._damaged |= bit
+            if self._available & bit:
+                self._available ^= bit
+                return -1
+            return 0
+        if self._damaged & bit:
+            self._damaged ^= bit
+            # Исправленный экземпляр возвращается в наличие, только если он не на руках и не списан
+            if not (self._on_loan | self._withdrawn) & bit:
+                self._available |= bit
+                return 1
+        return 0
+
+    def set_withdrawn(self, number, withdrawn):
+        """
+        Списывает экземпляр или возвращает его в фонд.
+
+        Returns:
+            Изменение количества экземпляров в наличии (-1, 0 или 1).
+        """
+        bit = 1 << number
+        if withdrawn:
+            self._withdrawn |= bit
+            if self._available & bit:
+                self._available ^= bit
+                return -1
+            return 0
+        if self._withdrawn & bit:
+            self._withdrawn ^= bit
+            # Возвращенный в фонд экземпляр попадает в наличие, только если он не на руках и не поврежден
+            if not (self._on_loan | self._damaged) & bit:
+                self._available |= bit
+                return 1
+        return 0
+
+    def status(self, number):
+        """Возвращает состояние экземпляра: "on_loan", "damaged", "withdrawn" или "available"."""
+        if self._on_loan >> number & 1:
+            return "on_loan"
+        if self._damaged >> number & 1:
+            return "damaged"
+        if self._withdrawn >> number & 1:
+            return "withdrawn"
+        return "available"
+
+    def shelf(self, number):
+        """Возвращает код полки экземпляра."""
+        return self._shelves[number]
+
+    def set_shelf(self, number, shelf_code):
+        """Задает код полки экземпляра."""
+        self._shelves[number] = shelf_code
+
+    def recode_shelves(self, codes):
+        """Заменяет коды полок экземпляров по словарю codes (прежний код -> новый)."""
+        self._shelves = array("H", [codes[code] for code in self._shelves])
+
+    def barcode(self, number):
+        """Возвращает штрихкод экземпляра (собственный, если он присвоен)."""
+        if self._barcodes is not None and number in self._barcodes:
+            return self._barcodes[number]
+        return CopyTracker.barcode_of(self.isbn, number)
+
+    def own_barcodes(self):
+        """Возвращает словарь номер экземпляра -> собственный штрихкод."""
+        return dict(self._barcodes or {})
+
+    def state(self):
+        """
+        Возвращает состояние для журнала и SQLite: (всего экземпляров, карты наличия,
+        выдачи, повреждений и списания, коды полок - байтами little-endian,
+        собственные штрихкоды - строка "номер, штрихкод, ..." через BATCH_SEPARATOR или None).
+        """
+        shelves = array("H", self._shelves)
+        if sys.byteorder != "little":
+            shelves.byteswap()
+        barcodes = None
+        if self._barcodes:
+            barcodes = CirculationJournal.BATCH_SEPARATOR.join(
+                itertools.chain.from_iterable((str(number), barcode) for number, barcode in self._barcodes.items()))
+        return (self.total, _bits_to_bytes(self._available), _bits_to_bytes(self._on_loan),
+                _bits_to_bytes(self._damaged), _bits_to_bytes(self._withdrawn), shelves.tobytes(), barcodes)
+
+    @classmethod
+    def from_state(cls, isbn, state):
+        """Создает объект по состоянию, возвращенному state."""
+        total, available, on_loan, damaged, withdrawn, shelves, barcodes = state
+        copies = cls.__new__(cls)
+        copies.isbn = isbn
+        copies.total = total
+        copies._available, copies._on_loan, copies._damaged, copies._withdrawn = (
+            int.from_bytes(bits, "little") for bits in (available, on_loan, damaged, withdrawn))
+        copies._shelves = array("H")
+        copies._shelves.frombytes(shelves)
+        if sys.byteorder != "little":
+            copies._shelves.byteswap()
+        copies._barcodes = None
+        if barcodes:
+            values = barcodes.split(CirculationJournal.BATCH_SEPARATOR)
+            copies._barcodes = dict(zip(map(int, values[::2]), values[1::2]))
+        return copies
+
+    def copy(self):
+        """Возвращает независимую копию учета экземпляров."""
+        copies = BookCopies.__new__(BookCopies)
+        copies.__setstate__(self.__getstate__())
+        return copies
+
+    def __getstate__(self):
+        """Возвращает компактное состояние для pickle (полки - байтами массива)."""
+        return (self.isbn, self.total, self._available, self._on_loan, self._damaged, self._shelves.tobytes(),
+                self._withdrawn, self._barcodes)
+
+    def __setstate__(self, state):
+        """Восстанавливает состояние, возвращенное __getstate__ (в том числе без списания и штрихкодов)."""
+        self.isbn, self.total, self._available, self._on_loan, self._damaged, shelves, *rest = state
+        self._withdrawn, barcodes = rest or (0, None)
+        self._barcodes = None if barcodes is None else dict(barcodes)
+        self._shelves = array("H")
+        self._shelves.frombytes(shelves)
+
+
+def _bits_to_bytes(bits):
+    """Возвращает битовую карту (целое число) байтами little-endian."""
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+class CopyTracker:
+    """
+    Экземпляры книг библиотеки по ISBN, общий словарь полок и собственные штрихкоды.
+
+    Объект BookCopies для ISBN создается при первом обращении: в нем
+    столько экземпляров в наличии, сколько указано в Book.quantity. Дальше
+    учет экземпляров - единственный источник наличия: Library переписывает
+    Book.quantity по числу экземпляров в наличии после каждой операции,
+    а изменение Book.quantity в обход Library на учет не влияет.
+    Штрихкод экземпляра по умолчанию - "<ISBN>/<номер>"; собственные
+    штрихкоды, присвоенные при добавлении экземпляров, действуют наравне с ним.
+    """
+    def __init__(self):
+        """Инициализирует пустой учет экземпляров."""
+        self._copies = {}      # ISBN -> BookCopies
+        self.shelves = [""]    # Код полки -> название ("" - полка не указана)
+        self._shelf_codes = {"": 0}
+        self._barcodes = {}    # Собственный штрихкод -> (ISBN, номер экземпляра)
+
+    def get(self, book):
+        """Возвращает экземпляры книги, создавая учет по Book.quantity при первом обращении."""
+        copies = self._copies.get(book.isbn)
+        if copies is None:
+            copies = self._copies.setdefault(book.isbn, BookCopies(book.isbn, max(book.quantity, 0)))
+        return copies
+
+    def add(self, book, count, shelf_code=0, barcodes=None):
+        """
+        Добавляет книге count экземпляров в наличии; возвращает их номера (range).
+
+        Raises:
+            BookError: Если штрихкодов не count или штрихкод уже присвоен другому экземпляру.
+        """
+        if barcodes is not None:
+            barcodes = list(barcodes)
+            if len(barcodes) != count or len(set(barcodes)) != count:
+                raise BookError(f"Нужно {count} различных штрихкодов экземпляров.")
+            if not all(isinstance(barcode, str) and barcode and CirculationJournal.BATCH_SEPARATOR not in barcode
+                       for barcode in barcodes):
+                raise BookError("Штрихкод экземпляра должен быть непустой строкой.")
+            taken = [barcode for barcode in barcodes if barcode in self._barcodes]
+            if taken:
+                raise BookError(f"Штрихкод {taken[0]!r} уже присвоен другому экземпляру.")
+        copies = self.get(book)
+        numbers = copies.add(count, shelf_code, barcodes)
+        if barcodes is not None:
+            self._barcodes.update(zip(barcodes, ((book.isbn, number) for number in numbers)))
+        return numbers
+
+    def find(self, isbn):
+        """Возвращает экземпляры ISBN или None, если учет для него еще не создан (без сверки с количеством)."""
+        return self._copies.get(isbn)
+
+    def adopt(self, copies, shelves):
+        """
+        Заносит экземпляры, перенесенные из учета другого филиала.
+
+        Args:
+            copies: Объект BookCopies (не изменяется).
+            shelves: Названия полок учета-источника в порядке кодов; коды полок
+                экземпляров переводятся в коды этого учета.
+        """
+        copies = copies.copy()
+        copies.recode_shelves({code: self.shelf_code(shelf) for code, shelf in enumerate(shelves)})
+        self.discard(copies.isbn)
+        self._copies[copies.isbn] = copies
+        for number, barcode in copies.own_barcodes().items():
+            self._barcodes[barcode] = (copies.isbn, number)
+        return copies
+
+    def locate(self, barcode):
+        """Возвращает пару (ISBN, номер экземпляра) по собственному штрихкоду или штрихкоду по умолчанию."""
+        location = self._barcodes.get(barcode)
+        return location if location is not None else self.parse_barcode(barcode)
+
+    def discard(self, isbn):
+        """Забывает экземпляры ISBN."""
+        copies = self._copies.pop(isbn, None)
+        if copies is not None:
+            for barcode in copies.own_barcodes().values():
+                self._barcodes.pop(barcode, None)
+
+    def restore(self, isbn, state):
+        """Восстанавливает экземпляры ISBN по состоянию BookCopies.state (из журнала или SQLite)."""
+        self.discard(isbn)
+        copies = self._copies[isbn] = BookCopies.from_state(isbn, state)
+        for number, barcode in copies.own_barcodes().items():
+            self._barcodes[barcode] = (isbn, number)
+        return copies
+
+    def set_shelves(self, shelves):
+        """Восстанавливает словарь полок (названия в порядке кодов)."""
+        self.shelves = list(shelves) or [""]
+        self._shelf_codes = {shelf: code for code, shelf in enumerate(self.shelves)}
+
+    def items(self):
+        """Перебирает пары (ISBN, BookCopies)."""
+        return self._copies.items()
+
+    def copy(self):
+        """Возвращает независимую копию учета (например, для записи снимка после возобновления изменений)."""
+        tracker = CopyTracker()
+        tracker._copies = {isbn: copies.copy() for isbn, copies in self._copies.items()}
+        tracker.shelves = list(self.shelves)
+        tracker._shelf_codes = dict(self._shelf_codes)
+        tracker._barcodes = dict(self._barcodes)
+        return tracker
+
+    def __setstate__(self, state):
+        """Восстанавливает учет из pickle (снимки без собственных штрихкодов тоже читаются)."""
+        self.__dict__.update(state)
+        self.__dict__.setdefault("_barcodes", {})
+
+    def shelf_code(self, shelf):
+        """Возвращает код полки, заводя новый при первом обращении."""
+        return InventoryColumns._code(shelf, self._shelf_codes, self.shelves)
+
+    @staticmethod
+    def barcode_of(isbn, number):
+        """Возвращает штрихкод по умолчанию экземпляра number книги isbn."""
+        return f"{isbn}/{number}"
+
+    @staticmethod
+    def parse_barcode(barcode):
+        """Возвращает пару (ISBN, номер экземпляра) из штрихкода по умолчанию."""
+        isbn, _, number = barcode.rpartition("/")
+        try:
+            return isbn, int(number)
+        except ValueError:
+            raise BookNotFound(f"Некорректный штрихкод экземпляра: {barcode!r}.") from None
+
+    def __len__(self):
+        """Возвращает количество ISBN с учетом экземпляров."""
+        return len(self._copies)
+
+# Очередь резервирования одной книги
+class HoldQueue:
+    """
+    Очередь читателей, ожидающих книгу (первым пришел - первым получил).
+
+    Постановке присваивается порядковый номер; очередь хранит пары
+    (номер, reader_id) в deque, а отметки о действующих постановках -
+    в дереве Фенвика по номерам. Постановка и отмена стоят O(log n),
+    место в очереди - сумма отметок до номера читателя за O(log n),
+    выдача следующего - O(1) в среднем (отмененные пары пропускаются
+    при извлечении). Дерево перестраивается, когда отмененных
+    постановок становится больше действующих.
+    """
+    __slots__ = ("_order", "_numbers", "_tree", "_base")
+
+    def __init__(self):
+        """Инициализирует пустую очередь."""
+        self._order = collections.deque()  # (номер, reader_id) в порядке постановки, включая отмененные
+        self._numbers = {}                 # reader_id -> номер действующей постановки
+        self._tree = []                    # Дерево Фенвика по номерам (номер - _base)
+        self._base = 0
+
+    def _prefix(self, count):
+        """Возвращает число действующих постановок среди первых count номеров дерева."""
+        tree = self._tree
+        total = 0
+        while count > 0:
+            total += tree[count - 1]
+            count &= count - 1
+        return total
+
+    def _discard(self, number):
+        """Снимает отметку постановки number."""
+        tree = self._tree
+        index = number - self._base + 1
+        while index <= len(tree):
+            tree[index - 1] -= 1
+            index += index & -index
+
+    def place(self, reader_id):
+        """Ставит читателя в конец очереди; возвращает место (с 1) или None, если он уже в очереди."""
+        if reader_id in self._numbers:
+            return None
+        tree = self._tree
+        index = len(tree) + 1
+        # Узел index покрывает номера (index - lowbit, index]: новая отметка плюс сумма предыдущих в этом отрезке
+        tree.append(1 + self._prefix(index - 1) - self._prefix(index - (index & -index)))
+        number = self._base + index - 1
+        self._numbers[reader_id] = number
+        self._order.append((number, reader_id))
+        return self._prefix(index)
+
+    def cancel(self, reader_id):
+        """Убирает читателя из очереди; возвращает False, если его там нет."""
+        number = self._numbers.pop(reader_id, None)
+        if number is None:
+            return False
+        self._discard(number)
+        self._compact()
+        return True
+
+    def position(self, reader_id):
+        """Возвращает место читателя в очереди (с 1) или None."""
+        number = self._numbers.get(reader_id)
+        if number is None:
+            return None
+        return self._prefix(number - self._base + 1)
+
+    def pop(self):
+        """Извлекает первого читателя очереди; возвращает reader_id или None, если очередь пуста."""
+        order, numbers = self._order, self._numbers
+        while order:
+            number, reader_id = order.popleft()
+            if numbers.get(reader_id) == number:
+                del numbers[reader_id]
+                self._discard(number)
+                self._compact()
+                return reader_id
+        return None
+
+    def _compact(self):
+        """Перестраивает дерево по действующим постановкам, если отмененных стало слишком много."""
+        if not self._numbers:
+            self._base += len(self._tree)
+            self._order.clear()
+            self._tree = []
+        elif len(self._tree) > 2 * len(self._numbers) + 64:
+            readers = list(self)
+            self._base += len(self._tree)
+            self._order = collections.deque(enumerate(readers, self._base))
+            self._numbers = {reader_id: number for number, reader_id in self._order}
+            # Все отметки равны 1: узел index хранит длину своего отрезка
+            self._tree = [index & -index for index in range(1, len(readers) + 1)]
+
+    def __iter__(self):
+        """Перебирает reader_id в порядке очереди."""
+        numbers = self._numbers
+        return (reader_id for number, reader_id in self._order if numbers.get(reader_id) == number)
+
+    def __len__(self):
+        """Возвращает количество читателей в очереди."""
+        return len(self._numbers)
+
+# Поля строки при импорте книг (CSV-заголовок или ключи JSON-объекта)
+BOOK_IMPORT_FIELDS = ("title", "author_first_name", "author_last_name", "isbn", "genre", "quantity")
+
+# Отчет о пакетном импорте книг
+class ImportReport:
+    """Итоги импорта книг: количество добавленных, дубликаты и некорректные строки."""
+    def __init__(self):
+        """Инициализирует пустой отчет."""
+        self.added = 0
+        # Список пар (номер строки, ISBN)
+        self.duplicates = []
+        # Список пар (номер строки, текст ошибки)
+        self.invalid = []
+
+    def __str__(self):
+        """Возвращает краткую сводку по импорту."""
+        return (f"добавлено {self.added}, дубликатов {len(self.duplicates)}, "
+                f"некорректных строк {len(self.invalid)}")
+
+def _iter_book_rows(source, file_format=None):
+    """
+    Перебирает строки источника импорта.
+
+    Args:
+        source: Путь к файлу CSV/JSONL или итерируемый объект.
+        file_format: "csv" или "jsonl"; по умолчанию определяется по расширению.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        yield from source
+        return
+    if file_format is None:
+        file_format = "csv" if os.fspath(source).lower().endswith(".csv") else "jsonl"
+    with open(source, encoding="utf-8", newline="") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield e
+
+def _book_from_row(row):
+    """
+    Создает объект Book из строки импорта.
+
+    Args:
+        row: Словарь с полями BOOK_IMPORT_FIELDS или объект Book.
+
+    Returns:
+        Пара (Book, None) или (None, текст ошибки).
+    """
+    if isinstance(row, Book):
+        return row, None
+    if not isinstance(row, dict):
+        return None, f"Некорректная строка: {row}"
+    try:
+        author = intern_author(row["author_first_name"], row["author_last_name"])
+        quantity = row["quantity"]
+        if isinstance(quantity, str):
+            quantity = int(quantity)
+        return Book(row["title"], author, row["isbn"], row["genre"], quantity), None
+    except KeyError as e:
+        return None, f"Отсутствует поле {e}."
+    except ValueError:
+        return None, f"Некорректное количество экземпляров: {row['quantity']!r}."
+
+# Колоночное хранилище остатков
+class InventoryColumns:
+    """
+    Колоночное хранилище остатков книг.
+
+    Для каждой книги хранится строка в трех колонках: количество экземпляров,
+    код жанра и идентификатор автора. Колонки - массивы NumPy (если NumPy
+    установлен) или array.array, поэтому агрегаты считаются векторно, без
+    обхода объектов Book. Освободившиеся строки переиспользуются. Рост
+    колонок NumPy заменяет массивы, а количество меняется из-под разных
+    блокировок ISBN, поэтому хранилище защищено собственной блокировкой.
+    """
+    _FREE = -1  # Код жанра свободной строки
+
+    def __init__(self, capacity=1024):
+        """
+        Инициализирует пустое хранилище.
+
+        Args:
+            capacity: Начальная емкость колонок (только для NumPy).
+        """
+        self._lock = threading.Lock()
+        self._size = 0
+        self._rows = {}      # ISBN -> номер строки
+        self._isbns = []     # Номер строки -> ISBN (None для свободной строки)
+        self._free = []      # Свободные строки
+        self.genres = []     # Код жанра -> жанр
+        self._genre_codes = {}
+        self.authors = []    # Идентификатор автора -> Author
+        self._author_ids = {}
+        if np is not None:
+            self._quantity = np.zeros(capacity, dtype=np.int64)
+            self._genre = np.full(capacity, self._FREE, dtype=np.int32)
+            self._author = np.zeros(capacity, dtype=np.int32)
+        else:
+            self._quantity = array("q")
+            self._genre = array("i")
+            self._author = array("i")
+
+    @staticmethod
+    def _code(value, codes, values):
+        """Возвращает код значения, добавляя новое значение в словарь кодов."""
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _new_row(self):
+        """Выделяет строку (свободную или новую в конце колонок)."""
+        if self._free:
+            return self._free.pop()
+        row = self._size
+        self._size += 1
+        self._isbns.append(None)
+        if np is None:
+            self._quantity.append(0)
+            self._genre.append(self._FREE)
+            self._author.append(0)
+        elif row == len(self._quantity):
+            grow = max(row, 1)  # Удвоение емкости; пустые колонки (capacity=0) растут с одной строки
+            self._quantity = np.concatenate((self._quantity, np.zeros(grow, dtype=np.int64)))
+            self._genre = np.concatenate((self._genre, np.full(grow, self._FREE, dtype=np.int32)))
+            self._author = np.concatenate((self._author, np.zeros(grow, dtype=np.int32)))
+        return row
+
+    def add(self, book):
+        """Добавляет строку для книги."""
+        with self._lock:
+            row = self._rows.get(book.isbn)
+            if row is None:
+                row = self._rows[book.isbn] = self._new_row()
+                self._isbns[row] = book.isbn
+            self._quantity[row] = book.quantity
+            self._genre[row] = self._code(book.genre, self._genre_codes, self.genres)
+            self._author[row] = self._code(book.author, self._author_ids, self.authors)
+
+    def remove(self, book):
+        """Освобождает строку книги."""
+        with self._lock:
+            row = self._rows.pop(book.isbn, None)
+            if row is None:
+                return
+            self._isbns[row] = None
+            self._quantity[row] = 0
+            self._genre[row] = self._FREE
+            self._free.append(row)
+
+    def set_quantity(self, book):
+        """Обновляет количество экземпляров книги."""
+        with self._lock:
+            row = self._rows.get(book.isbn)
+            if row is not None:
+                self._quantity[row] = book.quantity
+
+    def __len__(self):
+        """Возвращает количество книг в хранилище."""
+        return len(self._rows)
+
+    def total_copies(self):
+        """Возвращает общее количество экземпляров в наличии."""
+        with self._lock:
+            if np is not None:
+                return int(self._quantity[:self._size].sum())
+            return sum(self._quantity)
+
+    def copies_by_genre(self):
+        """Возвращает словарь жанр -> количество экземпляров в наличии."""
+        with self._lock:
+            return dict(zip(self.genres, self._group_sum(self._genre, len(self.genres))))
+
+    def copies_by_author(self):
+        """Возвращает словарь Author -> количество экземпляров в наличии."""
+        with self._lock:
+            return dict(zip(self.authors, self._group_sum(self._author, len(self.authors))))
+
+    def _group_sum(self, codes, groups):
+        """Суммирует количество экземпляров по кодам колонки codes (свободные строки не учитываются)."""
+        if np is not None:
+            alive = self._genre[:self._size] != self._FREE
+            return np.bincount(codes[:self._size][alive], weights=self._quantity[:self._size][alive],
+                               minlength=groups).astype(np.int64).tolist()
+        totals = [0] * groups
+        for code, genre, quantity in zip(codes, self._genre, self._quantity):
+            if genre != self._FREE:
+                totals[code] += quantity
+        return totals
+
+    def zero_stock(self):
+        """Возвращает список ISBN книг, которых нет в наличии."""
+        with self._lock:
+            if np is not None:
+                size = self._size
+                rows = np.flatnonzero((self._quantity[:size] == 0) & (self._genre[:size] != self._FREE))
+                return [self._isbns[row] for row in rows.tolist()]
+            return [self._isbns[row] for row, (quantity, genre) in enumerate(zip(self._quantity, self._genre))
+                    if quantity == 0 and genre != self._FREE]
+
+# Журнал операций с группировкой записи и снимками
+class CirculationJournal:
+    """
+    Двоичный журнал изменений библиотеки с поддержкой снимков.
+
+    Каждая операция (добавление/удаление книги или читателя, выдача, возврат, резервирование)
+    дописывается в конец файла journal-<поколение>.log записью вида
+    [длина u32][crc32 u32][код операции u8][поля]. Записи копятся в буфере и
+    сбрасываются на диск группой (одна запись+fsync на group_size записей или
+    раз в group_interval секунд). Снимок сохраняет все состояние и начинает
+    новое поколение журнала, поэтому при восстановлении применяется только
+    хвост журнала после последнего снимка.
+    """
+    ADD_BOOK = 1
+    REMOVE_BOOK = 2
+    ADD_READER = 3
+    REMOVE_READER = 4
+    LEND = 5
+    RETURN = 6
+    LOAN = 7  # Открытая выдача в снимке (количество экземпляров уже учтено); флаги LOAN_DETACHED_*, номер экземпляра
+    LEND_MANY = 8  # Пакетная выдача: reader_id, дата выдачи, дата возврата, ISBN через BATCH_SEPARATOR
+    RETURN_MANY = 9  # Пакетный возврат: ISBN и reader_id через BATCH_SEPARATOR (только строковые reader_id)
+    HOLD = 10  # Постановка в очередь резервирования: ISBN, reader_id
+    CANCEL_HOLD = 11  # Снятие резервирования: ISBN, reader_id
+    HOLD_READY = 12  # Отложенный для читателя экземпляр в снимке: ISBN, reader_id, номер экземпляра
+    DETACHED_BOOK = 13  # Удаленная книга с открытыми выдачами в снимке (поля как у ADD_BOOK)
+    DETACHED_READER = 14  # Удаленный читатель с открытыми выдачами в снимке (поля как у ADD_READER)
+    RETURN_BATCH = 15  # Пакетный возврат книг одного читателя: reader_id, ISBN через BATCH_SEPARATOR
+    SHELVES = 16  # Словарь полок в снимке: названия в порядке кодов через BATCH_SEPARATOR
+    COPIES = 17  # Учет экземпляров книги в снимке: ISBN и поля BookCopies.state
+    ADD_COPIES = 18  # Новые экземпляры: ISBN, количество, полка, штрихкоды через BATCH_SEPARATOR или None
+    COPY_DAMAGED = 19  # Отметка о повреждении: ISBN, номер экземпляра, 1 - поврежден, 0 - исправен
+    MOVE_COPY = 20  # Перестановка экземпляра: ISBN, номер экземпляра, полка
+    MOVE_OUT = 21  # Перенос книг в другой филиал вместе с выдачами и резервированиями: ISBN через BATCH_SEPARATOR
+    COPY_WITHDRAWN = 22  # Списание экземпляра: ISBN, номер экземпляра, 1 - списан, 0 - возвращен в фонд
+
+    # Флаги записи LOAN: книга или читатель выдачи удалены (см. DETACHED_BOOK, DETACHED_READER)
+    LOAN_DETACHED_BOOK = 1
+    LOAN_DETACHED_READER = 2
+
+    # Разделитель списков ISBN и reader_id в одной строке пакетной записи
+    BATCH_SEPARATOR = "\x1f"
+
+    _HEADER = struct.Struct("<II")
+    _SNAPSHOT_MAGIC = b"LBSNAP01"
+
+    def __init__(self, directory, group_size=256, group_interval=0.05, snapshot_every=1_000_000, fsync=True):
+        """
+        Открывает журнал в каталоге directory (каталог создается при необходимости).
+
+        Args:
+            directory: Каталог с журналом и снимками.
+            group_size: Сколько записей накапливать перед сбросом на диск.
+            group_interval: Максимальное время (с) между сбросами; None - только по group_size.
+            snapshot_every: Через сколько записей делать снимок; None - только вручную.
+            fsync: Вызывать os.fsync при каждом сбросе.
+        """
+        self.directory = directory
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._buffer = []
+        self._since_snapshot = 0
+        self._generation = self._read_snapshot_generation()
+        self._file = open(self._journal_path(self._generation), "ab")
+        self._closed = threading.Event()
+        self._flusher = None
+        if group_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def _journal_path(self, generation):
+        """Возвращает путь к файлу журнала поколения generation."""
+        return os.path.join(self.directory, f"journal-{generation}.log")
+
+    @property
+    def _snapshot_path(self):
+        """Путь к файлу снимка."""
+        return os.path.join(self.directory, "snapshot.bin")
+
+    def _read_snapshot_generation(self):
+        """Возвращает поколение журнала, с которого начинается последний снимок (0 - снимка нет)."""
+        try:
+            with open(self._snapshot_path, "rb") as file:
+                header = file.read(len(self._SNAPSHOT_MAGIC) + 8)
+        except FileNotFoundError:
+            return 0
+        return struct.unpack_from("<Q", header, len(self._SNAPSHOT_MAGIC))[0]
+
+    # Тег типа поля -> формат struct для его значения в заголовке записи
+    _FIELD_FORMATS = {ord("S"): "H", ord("L"): "I", ord("I"): "q", ord("D"): "i", ord("N"): "B", ord("B"): "I"}
+    _layouts = {}
+
+    @classmethod
+    def _layout(cls, tags):
+        """Возвращает struct.Struct для значений полей с тегами tags (кэшируется)."""
+        layout = cls._layouts.get(tags)
+        if layout is None:
+            layout = cls._layouts[tags] = struct.Struct("<" + "".join(cls._FIELD_FORMATS[tag] for tag in tags))
+        return layout
+
+    @classmethod
+    def encode(cls, op, fields):
+        """
+        Возвращает байты записи журнала.
+
+        Полезная нагрузка: [код операции u8][число полей u8][теги типов полей]
+        [значения полей struct: длина строки или байтов, целое или порядковый номер даты]
+        [байты строк UTF-8 и байтовых полей].
+        Все числа записываются в порядке little-endian.
+        """
+        tags = bytearray()
+        values = []
+        strings = []
+        for value in fields:
+            if value is None:
+                tags.append(78)  # "N"
+                values.append(0)
+            elif isinstance(value, str):
+                data = value.encode("utf-8")
+                tags.append(83 if len(data) < 65536 else 76)  # "S" - короткая строка, "L" - длинная
+                values.append(len(data))
+                strings.append(data)
+            elif isinstance(value, bytes):
+                tags.append(66)  # "B"
+                values.append(len(value))
+                strings.append(value)
+            elif isinstance(value, datetime.date):
+                tags.append(68)  # "D"
+                values.append(value.toordinal())
+            elif isinstance(value, int):
+                tags.append(73)  # "I"
+                values.append(value)
+            else:
+                raise TypeError(f"Неподдерживаемый тип поля журнала: {type(value).__name__}")
+        tags = bytes(tags)
+        payload = b"".join((bytes((op, len(tags))), tags, cls._layout(tags).pack(*values), *strings))
+        return cls._HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    @classmethod
+    def _decode_fields(cls, data, position):
+        """Декодирует поля записи, начинающиеся с байта числа полей data[position]."""
+        count = data[position]
+        tags = bytes(data[position + 1:position + 1 + count])
+        layout = cls._layouts.get(tags) or cls._layout(tags)
+        position += 1 + count
+        values = layout.unpack_from(data, position)
+        position += layout.size
+        fields = []
+        for tag, value in zip(tags, values):
+            if tag == 83 or tag == 76:  # "S", "L"
+                position += value
+                fields.append(str(data[position - value:position], "utf-8"))
+            elif tag == 66:  # "B"
+                position += value
+                fields.append(bytes(data[position - value:position]))
+            elif tag == 68:  # "D"
+                fields.append(datetime.date.fromordinal(value))
+            elif tag == 73:  # "I"
+                fields.append(value)
+            else:
+                fields.append(None)
+        return fields
+
+    @classmethod
+    def iter_records(cls, data):
+        """
+        Перебирает записи в байтах data.
+
+        Returns:
+            Генератор троек (код операции, поля, смещение конца записи);
+            перебор останавливается на неполной или поврежденной записи.
+        """
+        view = memoryview(data)
+        size = len(data)
+        position = 0
+        header_size = cls._HEADER.size
+        unpack_header = cls._HEADER.unpack_from
+        decode_fields = cls._decode_fields
+        crc32 = zlib.crc32
+        while position + header_size <= size:
+            length, checksum = unpack_header(view, position)
+            start = position + header_size
+            end = start + length
+            if end > size or crc32(view[start:end]) != checksum:
+                return
+            yield view[start], decode_fields(view, start + 1), end
+            position = end
+
+    def append(self, op, *fields):
+        """Добавляет запись в буфер; буфер сбрасывается на диск при заполнении группы."""
+        record = self.encode(op, fields)
+        with self._lock:
+            self._buffer.append(record)
+            self._since_snapshot += 1
+            if len(self._buffer) >= self.group_size:
+                self.commit()
+
+    def snapshot_due(self):
+        """Проверяет, пора ли делать снимок."""
+        return self.snapshot_every is not None and self._since_snapshot >= self.snapshot_every
+
+    def commit(self):
+        """Сбрасывает накопленные записи на диск одной операцией записи."""
+        with self._lock:
+            if not self._buffer:
+                return
+            self._file.write(b"".join(self._buffer))
+            self._buffer.clear()
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def _flush_periodically(self):
+        """Фоновый сброс буфера раз в group_interval секунд."""
+        while not self._closed.wait(self.group_interval):
+            self.commit()
+
+    def close(self):
+        """Сбрасывает буфер и закрывает журнал."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self.commit()
+            self._file.close()
+
+    def write_snapshot(self, library):
+        """
+        Сохраняет снимок состояния библиотеки и начинает новое поколение журнала.
+
+        Вызывающий код должен остановить изменения библиотеки на время снимка
+        (см. Library.checkpoint).
+        """
+        with self._lock:
+            self.commit()
+            generation = self._generation + 1
+            temporary = self._snapshot_path + ".tmp"
+            with open(temporary, "wb") as file:
+                file.write(self._SNAPSHOT_MAGIC + struct.pack("<Q", generation))
+                chunk = []
+                for record in self._snapshot_records(library):
+                    chunk.append(record)
+                    if len(chunk) >= 65536:
+                        file.write(b"".join(chunk))
+                        chunk.clear()
+                file.write(b"".join(chunk))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self._snapshot_path)
+            # Снимок зафиксирован: переключаемся на новое поколение и удаляем старый журнал
+            self._file.close()
+            self._file = open(self._journal_path(generation), "ab")
+            os.remove(self._journal_path(self._generation))
+            self._generation = generation
+            self._since_snapshot = 0
+
+    def append_attached(self, library, books, loans):
+        """
+        Записывает книги, перенесенные из другого филиала, вместе с их экземплярами,
+        выдачами loans и очередями резервирования (записями снимка).
+        """
+        records = list(self._state_records(library, books, loans))
+        with self._lock:
+            self._buffer.extend(records)
+            self._since_snapshot += len(records)
+            if len(self._buffer) >= self.group_size:
+                self.commit()
+
+    @classmethod
+    def _book_record(cls, op, book):
+        """Возвращает запись книги (ADD_BOOK или DETACHED_BOOK)."""
+        author = book.author
+        return cls.encode(op, (book.title, author.first_name, author.last_name, author.biography,
+                               book.isbn, book.genre, book.quantity))
+
+    def _snapshot_records(self, library):
+        """Перебирает записи, из которых состоит снимок состояния библиотеки."""
+        for reader in library._reader_database.values():
+            yield self.encode(self.ADD_READER, (reader.first_name, reader.last_name, reader.reader_id))
+        yield from self._state_records(library, library._catalog.values(), library.loans)
+
+    def _state_records(self, library, books, loans):
+        """
+        Перебирает записи книг books из каталога library с их экземплярами и
+        очередями резервирования, а также записи выдач loans.
+        """
+        encode = self.encode
+        books = list(books)
+        for book in books:
+            yield self._book_record(self.ADD_BOOK, book)
+        # Экземпляры (после книг: добавление книги сбрасывает ее учет экземпляров)
+        tracker = library._copies
+        yield encode(self.SHELVES, (self.BATCH_SEPARATOR.join(tracker.shelves),))
+        for book in books:
+            copies = tracker.find(book.isbn)
+            if copies is not None:
+                yield encode(self.COPIES, (book.isbn, *copies.state()))
+        # Выдачи удаленных книг и читателей остаются открытыми: такие объекты сохраняются
+        # отдельными записями перед выдачей и не попадают в каталог при восстановлении,
+        # даже если в каталоге есть новая книга (читатель) с тем же ключом
+        detached_books, detached_readers = set(), set()
+        for loan in loans:
+            book, reader = loan.book, loan.reader
+            flags = 0
+            if library._catalog.get(book.isbn) is not book:
+                flags |= self.LOAN_DETACHED_BOOK
+                if book.isbn not in detached_books:
+                    detached_books.add(book.isbn)
+                    yield self._book_record(self.DETACHED_BOOK, book)
+            if library._reader_database.get(reader.reader_id) is not reader:
+                flags |= self.LOAN_DETACHED_READER
+                if reader.reader_id not in detached_readers:
+                    detached_readers.add(reader.reader_id)
+                    yield encode(self.DETACHED_READER, (reader.first_name, reader.last_name, reader.reader_id))
+            yield encode(self.LOAN, (book.isbn, reader.reader_id, loan.loan_date, loan.due_date, flags, loan.copy))
+        # Очереди резервирования: сначала отложенные экземпляры, затем очередь в ее порядке
+        for book in books:
+            for reader_id, copy in library._ready_holds.get(book.isbn, {}).items():
+                yield encode(self.HOLD_READY, (book.isbn, reader_id, copy))
+            for reader_id in library._holds.get(book.isbn, ()):
+                yield encode(self.HOLD, (book.isbn, reader_id))
+
+    def replay(self, library):
+        """
+        Восстанавливает состояние library: загружает снимок и применяет журнал после него.
+
+        Поврежденный хвост журнала (неполная запись после сбоя) отбрасывается.
+
+        Returns:
+            Количество примененных записей.
+        """
+        applied = 0
+        removed = ({}, {})  # Удаленные книги и читатели, на которые еще ссылаются выдачи
+        try:
+            with open(self._snapshot_path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            data = None
+        if data is not None:
+            header_size = len(self._SNAPSHOT_MAGIC) + 8
+            for op, fields, _ in self.iter_records(memoryview(data)[header_size:]):
+                self._apply(library, op, fields, removed)
+                applied += 1
+        with self._lock:
+            self.commit()
+            path = self._journal_path(self._generation)
+            with open(path, "rb") as file:
+                data = file.read()
+            end = 0
+            for op, fields, end in self.iter_records(data):
+                self._apply(library, op, fields, removed)
+                applied += 1
+            if end < len(data):
+                self._file.truncate(end)
+        return applied
+
+    def _apply(self, library, op, fields, removed):
+        """
+        Применяет запись журнала к библиотеке без проверок, логирования и повторной записи в журнал.
+
+        Args:
+            library: Восстанавливаемая библиотека.
+            op: Код операции.
+            fields: Поля записи.
+            removed: Пара словарей удаленных книг и читателей (ISBN/reader_id -> объект);
+                выдачи, ссылающиеся на удаленные объекты, находят их там.
+        """
+        removed_books, removed_readers = removed
+        if op == self.LOAN:
+            isbn, reader_id, loan_date, due_date, *rest = fields
+            flags, copy = (rest + [0, None])[:2]
+            book = (removed_books[isbn] if flags & self.LOAN_DETACHED_BOOK
+                    else library._catalog.get(isbn) or removed_books[isbn])
+            reader = (removed_readers[reader_id] if flags & self.LOAN_DETACHED_READER
+                      else library._reader_database.get(reader_id) or removed_readers[reader_id])
+            library._add_loan(Loan(book, reader, loan_date, due_date, copy))
+        elif op == self.LEND or op == self.RETURN:
+            book = library._catalog.get(fields[0]) or removed_books[fields[0]]
+            reader = library._reader_database.get(fields[1]) or removed_readers[fields[1]]
+            if op == self.LEND:
+                library._open_loan(book, reader, fields[2], fields[3])
+            else:
+                library._close_loan(book, reader)
+        elif op == self.LEND_MANY:
+            reader_id, loan_date, due_date, isbns = fields
+            reader = library._reader_database.get(reader_id) or removed_readers[reader_id]
+            books = [library._catalog.get(isbn) or removed_books[isbn] for isbn in isbns.split(self.BATCH_SEPARATOR)]
+            library._open_loans(reader, books, loan_date, due_date)
+        elif op == self.RETURN_BATCH:
+            reader_id, isbns = fields
+            reader = library._reader_database.get(reader_id) or removed_readers[reader_id]
+            library._close_loans([(library._catalog.get(isbn) or removed_books[isbn], reader)
+                                  for isbn in isbns.split(self.BATCH_SEPARATOR)])
+        elif op == self.RETURN_MANY:
+            isbns, reader_ids = (field.split(self.BATCH_SEPARATOR) for field in fields)
+            library._close_loans([(library._catalog.get(isbn) or removed_books[isbn],
+                                   library._reader_database.get(reader_id) or removed_readers[reader_id])
+                                  for isbn, reader_id in zip(isbns, reader_ids)])
+        elif op == self.HOLD:
+            library._place_hold(fields[0], fields[1])
+        elif op == self.CANCEL_HOLD:
+            book = library._catalog.get(fields[0])
+            if book is not None:
+                library._cancel_hold(book, fields[1])
+        elif op == self.HOLD_READY:
+            isbn, reader_id, *copy = fields
+            library._ready_holds.setdefault(isbn, {})[reader_id] = copy[0] if copy else None
+        elif op == self.ADD_BOOK:
+            title, first_name, last_name, biography, isbn, genre, quantity = fields
+            if isbn not in library._catalog:
+                library._register_book(Book(title, intern_author(first_name, last_name, biography),
+                                            isbn, genre, quantity))
+        elif op == self.REMOVE_BOOK:
+            book = library._catalog.get(fields[0])
+            if book is not None:
+                library._unregister_book(book)
+                removed_books[book.isbn] = book
+        elif op == self.ADD_READER:
+            first_name, last_name, reader_id = fields
+            library._reader_database[reader_id] = Reader(first_name, last_name, reader_id)
+        elif op == self.REMOVE_READER:
+            reader = library._reader_database.pop(fields[0], None)
+            if reader is not None:
+                removed_readers[reader.reader_id] = reader
+                library._cancel_reader_holds(reader.reader_id)
+        elif op == self.DETACHED_BOOK:
+            title, first_name, last_name, biography, isbn, genre, quantity = fields
+            removed_books[isbn] = Book(title, intern_author(first_name, last_name, biography), isbn, genre, quantity)
+        elif op == self.DETACHED_READER:
+            first_name, last_name, reader_id = fields
+            removed_readers[reader_id] = Reader(first_name, last_name, reader_id)
+        elif op == self.SHELVES:
+            library._copies.set_shelves(fields[0].split(self.BATCH_SEPARATOR))
+        elif op == self.COPIES:
+            library._copies.restore(fields[0], fields[1:])
+        elif op == self.ADD_COPIES:
+            isbn, count, shelf, barcodes = fields
+            book = library._catalog.get(isbn)
+            if book is not None:
+                library._add_copies(book, count, shelf,
+                                    None if barcodes is None else barcodes.split(self.BATCH_SEPARATOR))
+        elif op == self.MOVE_OUT:
+            books = [library._catalog.get(isbn) for isbn in fields[0].split(self.BATCH_SEPARATOR)]
+            library._drop_books([book for book in books if book is not None])
+        elif op == self.COPY_DAMAGED or op == self.COPY_WITHDRAWN or op == self.MOVE_COPY:
+            isbn, number, value = fields
+            book = library._catalog.get(isbn)
+            if book is not None:
+                if op == self.COPY_DAMAGED:
+                    library._set_copy_damaged(book, number, bool(value))
+                elif op == self.COPY_WITHDRAWN:
+                    library._set_copy_withdrawn(book, number, bool(value))
+                else:
+                    library._move_copy(book, number, value)
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Выключает сборщик циклов: при создании миллионов объектов без циклов он только тратит время."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+# Снимок всей библиотеки в колоночном формате
+class ColumnarSnapshot:
+    """
+    Снимок библиотеки в компактном колоночном двоичном формате.
+
+    Каждое поле объектов Book, Author, Reader и Loan хранится отдельной
+    колонкой. Строки (названия, имена, ISBN, жанры, reader_id)
+    интернируются в общую таблицу: каждая различная строка записывается
+    один раз, а колонка хранит ее номер (array("I")). Количества, даты
+    (порядковые номера) и номера экземпляров хранятся упакованными
+    массивами. Таблица строк - один блок UTF-8 с разделителем "\\0",
+    который загружается одним decode и split.
+
+    Колонки передаются pickle протокола 5 вне основного потока
+    (PickleBuffer): в файле они лежат сырыми байтами после метаданных,
+    а при загрузке копируются в массивы один раз, без разбора pickle.
+    Объекты создаются сразу для целой колонки (через дескрипторы
+    __slots__), без вызова __init__ для каждого объекта.
+
+    Файл: [MAGIC][длина метаданных u64][число колонок u32][длины колонок u64...]
+    [метаданные pickle][колонки, каждая выровнена на 8 байт].
+    Метаданные - pickle, поэтому загружать можно только снимки из доверенного источника.
+    """
+    MAGIC = b"LBCOLS01"
+    _HEADER = struct.Struct("<8sQI")
+    _SEPARATOR = "\0"
+
+    @classmethod
+    def collect(cls, library):
+        """
+        Собирает колонки снимка библиотеки; результат передается в write.
+
+        Вызывающий код должен остановить изменения библиотеки (см. Library.save_snapshot).
+        Собранные значения не ссылаются на изменяемое состояние библиотеки,
+        поэтому write выполняется уже после возобновления изменений.
+        """
+        string_columns = []  # (словарь колонок, имя колонки, значения) - кодируются после сбора таблицы строк
+        author_columns = []  # (словарь колонок, объекты Author книг)
+
+        def strings(columns, name, values):
+            string_columns.append((columns, name, list(values)))
+
+        def book_columns(books):
+            columns = {"quantity": cls._column("q", map(operator.attrgetter("quantity"), books))}
+            for name in ("title", "isbn", "genre"):
+                strings(columns, name, map(operator.attrgetter(name), books))
+            author_columns.append((columns, list(map(operator.attrgetter("author"), books))))
+            return columns
+
+        def reader_columns(readers):
+            columns = {}
+            for name in ("first_name", "last_name", "reader_id"):
+                strings(columns, name, map(operator.attrgetter(name), readers))
+            return columns
+
+        # Выдачи удаленных книг и читателей остаются открытыми: такие объекты
+        # сохраняются в отдельных таблицах, выдача ссылается на них по номеру
+        loans = list(library.loans)
+        removed_books, removed_readers = {}, {}
+        book_overrides, reader_overrides = array("I"), array("I")
+        for position, loan in enumerate(loans):
+            book, reader = loan.book, loan.reader
+            if library._catalog.get(book.isbn) is not book:
+                book_overrides.extend((position, removed_books.setdefault(id(book), (len(removed_books), book))[0]))
+            if library._reader_database.get(reader.reader_id) is not reader:
+                reader_overrides.extend((position, removed_readers.setdefault(id(reader),
+                                                                                (len(removed_readers), reader))[0]))
+
+        loan_columns = {
+            "loan_date": cls._column("i", [loan.loan_date.toordinal() for loan in loans]),
+            "due_date": cls._column("i", [loan.due_date.toordinal() for loan in loans]),
+            "copy": cls._column("q", [-1 if loan.copy is None else loan.copy for loan in loans]),
+            "removed_books": cls._column("I", book_overrides),
+            "removed_readers": cls._column("I", reader_overrides),
+        }
+        strings(loan_columns, "isbn", (loan.book.isbn for loan in loans))
+        strings(loan_columns, "reader_id", (loan.reader.reader_id for loan in loans))
+        meta = {
+            "byteorder": sys.byteorder,
+            "library": {"name": library.name, "address": library.address,
+                        "library_type": library.library_type, "loan_limit": library.loan_limit},
+            "loan_limits": dict(library._loan_limits),
+            "books": book_columns(list(library._catalog.values())),
+            "removed_books": book_columns([book for _, book in removed_books.values()]),
+            "readers": reader_columns(list(library._reader_database.values())),
+            "removed_readers": reader_columns([reader for _, reader in removed_readers.values()]),
+            "loans": loan_columns,
+            "holds": {isbn: list(queue) for isbn, queue in library._holds.items()},
+            "ready_holds": {isbn: dict(ready) for isbn, ready in library._ready_holds.items()},
+            "copies": library._copies.copy(),
+        }
+        return meta, string_columns, author_columns
+
+    @classmethod
+    def write(cls, state, path):
+        """
+        Кодирует собранный collect снимок и записывает его в файл path
+        (через временный файл и os.replace).
+        """
+        meta, string_columns, author_columns = state
+        # Авторы: таблица различных объектов Author (сравниваются по id без вызова
+        # Author.__hash__, общий объект записывается один раз) и номера в колонках книг
+        authors, author_ids = {}, []
+        for columns, values in author_columns:
+            author_ids.append((columns, list(map(id, values))))
+            authors.update(zip(author_ids[-1][1], values))
+        author_codes = dict(zip(authors, itertools.count()))
+        for columns, ids in author_ids:
+            columns["author"] = cls._column("I", map(author_codes.__getitem__, ids))
+        authors = authors.values()
+        meta["authors"] = {}
+        for name in ("first_name", "last_name", "biography"):
+            string_columns.append((meta["authors"], name, list(map(operator.attrgetter(name), authors))))
+
+        # Таблица различных строк (0 - None) строится за один проход, колонки хранят номера
+        table = dict.fromkeys(itertools.chain([None], *(values for _, _, values in string_columns)))
+        codes = dict(zip(table, itertools.count()))
+        for columns, name, values in string_columns:
+            columns[name] = cls._column("I", map(codes.__getitem__, values))
+        values = list(table)[1:]
+        try:
+            joined = cls._SEPARATOR.join(values)
+        except TypeError:
+            joined = None  # Нестроковые значения (например, числовые reader_id)
+        if joined is not None and joined.count(cls._SEPARATOR) == max(len(values) - 1, 0):
+            meta["strings"] = pickle.PickleBuffer(joined.encode("utf-8"))
+        else:
+            meta["strings"] = values  # Обычный pickle: нестроковые значения или разделитель внутри строки
+
+        buffers = []
+        payload = pickle.dumps(meta, protocol=5, buffer_callback=buffers.append)
+        raws = [buffer.raw() for buffer in buffers]
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(cls._HEADER.pack(cls.MAGIC, len(payload), len(raws)))
+            file.write(struct.pack(f"<{len(raws)}Q", *(raw.nbytes for raw in raws)))
+            file.write(payload)
+            for raw in raws:
+                file.write(bytes(-file.tell() % 8))
+                file.write(raw)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+    @staticmethod
+    def _column(typecode, values):
+        """Упаковывает значения в массив для передачи вне потока pickle."""
+        return typecode, pickle.PickleBuffer(array(typecode, values))
+
+    @classmethod
+    def load(cls, library_class, path, **options):
+        """
+        Читает снимок из файла path и создает по нему библиотеку.
+
+        Args:
+            library_class: Класс создаваемой библиотеки.
+            path: Путь к файлу снимка.
+            options: Дополнительные параметры конструктора библиотеки.
+
+        Returns:
+            Объект library_class.
+
+        Raises:
+            ValueError: Если файл не является колоночным снимком.
+        """
+        with _gc_paused():
+            return cls._load(library_class, path, options)
+
+    @classmethod
+    def _load(cls, library_class, path, options):
+        """Загружает снимок (см. load)."""
+        with open(path, "rb") as file:
+            data = file.read()
+        view = memoryview(data)
+        magic, payload_size, count = cls._HEADER.unpack_from(view, 0)
+        if magic != cls.MAGIC:
+            raise ValueError(f"Файл {path} не является снимком библиотеки.")
+        position = cls._HEADER.size
+        sizes = struct.unpack_from(f"<{count}Q", view, position)
+        position += 8 * count
+        payload = view[position:position + payload_size]
+        position += payload_size
+        buffers = []
+        for size in sizes:
+            position += -position % 8
+            buffers.append(view[position:position + size])
+            position += size
+        meta = pickle.loads(payload, buffers=buffers)
+        swap = meta["byteorder"] != sys.byteorder
+
+        def column(entry):
+            typecode, buffer = entry
+            values = array(typecode)
+            values.frombytes(buffer)
+            if swap:
+                values.byteswap()
+            return values
+
+        strings = meta["strings"]
+        if not isinstance(strings, list):
+            strings = str(strings, "utf-8").split(cls._SEPARATOR)
+        strings = [None, *strings]
+        lookup = strings.__getitem__
+
+        def decode(entry):
+            return list(map(lookup, column(entry)))
+
+        columns = meta["authors"]
+        author_list = list(map(intern_author, decode(columns["first_name"]), decode(columns["last_name"]),
+                               decode(columns["biography"])))
+
+        def load_books(columns):
+            genres = column(columns["genre"])
+            for code in set(genres):
+                strings[code] = intern_genre(strings[code])
+            isbns = decode(columns["isbn"])
+            books = cls._build(Book, len(isbns), title=decode(columns["title"]),
+                               author=map(author_list.__getitem__, column(columns["author"])),
+                               isbn=isbns, genre=map(lookup, genres), quantity=column(columns["quantity"]))
+            return isbns, books
+
+        def load_readers(columns):
+            reader_ids = decode(columns["reader_id"])
+            readers = cls._build(Reader, len(reader_ids), first_name=decode(columns["first_name"]),
+                                 last_name=decode(columns["last_name"]), reader_id=reader_ids,
+                                 _borrowed_books=itertools.repeat(None))
+            return reader_ids, readers
+
+        settings = meta["library"]
+        library = library_class(settings["name"], settings["address"], settings["library_type"],
+                                loan_limit=settings["loan_limit"], **options)
+        library._loan_limits.update(meta["loan_limits"])
+        library._catalog.update(zip(*load_books(meta["books"])))
+        library._reader_database.update(zip(*load_readers(meta["readers"])))
+
+        columns = meta["loans"]
+        books = list(map(library._catalog.get, decode(columns["isbn"])))
+        readers = list(map(library._reader_database.get, decode(columns["reader_id"])))
+        for overrides, objects, removed in ((column(columns["removed_books"]), books,
+                                             load_books(meta["removed_books"])[1]),
+                                            (column(columns["removed_readers"]), readers,
+                                             load_readers(meta["removed_readers"])[1])):
+            for index in range(0, len(overrides), 2):
+                objects[overrides[index]] = removed[overrides[index + 1]]
+        ordinals = column(columns["loan_date"]), column(columns["due_date"])
+        dates = {ordinal: datetime.date.fromordinal(ordinal) for ordinal in set().union(*ordinals)}
+        loans = cls._build(Loan, len(books), book=books, reader=readers,
+                           loan_date=map(dates.__getitem__, ordinals[0]),
+                           due_date=map(dates.__getitem__, ordinals[1]),
+                           copy=[None if copy < 0 else copy for copy in column(columns["copy"])])
+        library.loans.extend(loans)
+        library._due_index.add_many(loans)
+
+        library._copies = meta["copies"]
+        for isbn, reader_ids in meta["holds"].items():
+            queue = library._holds[isbn] = HoldQueue()
+            for reader_id in reader_ids:
+                queue.place(reader_id)
+        library._ready_holds.update(meta["ready_holds"])
+        return library
+
+    @staticmethod
+    def _build(object_class, count, **columns):
+        """Создает count объектов класса со __slots__ и заполняет их атрибуты по колонкам."""
+        objects = list(map(object_class.__new__, itertools.repeat(object_class, count)))
+        for name, values in columns.items():
+            collections.deque(map(getattr(object_class, name).__set__, objects, values), maxlen=0)
+        return objects
+
+# Упорядоченный индекс книг по названию
+class TitleIndex:
+    """
+    Упорядоченный индекс книг по ключу (название, ISBN).
+
+    Ключи хранятся в отсортированных блоках ограниченного размера, поэтому
+    вставка и удаление сдвигают только один блок, а переход к курсору
+    выполняется двоичным поиском за O(log n).
+    """
+    def __init__(self, books=(), load=1000):
+        """
+        Инициализирует индекс.
+
+        Args:
+            books: Начальные книги.
+            load: Размер блока; блок вдвое большего размера делится пополам.
+        """
+        self._load = load
+        keys = sorted(self.key(book) for book in books)
+        self._blocks = [keys[i:i + load] for i in range(0, len(keys), load)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._size = len(keys)
+
+    @staticmethod
+    def key(book):
+        """Возвращает ключ книги в индексе."""
+        return (book.title, book.isbn)
+
+    def add(self, book):
+        """Добавляет книгу в индекс."""
+        key = self.key(book)
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+        else:
+            i = min(bisect.bisect_left(self._maxes, key), len(self._blocks) - 1)
+            block = self._blocks[i]
+            bisect.insort(block, key)
+            self._maxes[i] = block[-1]
+            if len(block) >= 2 * self._load:
+                self._blocks.insert(i + 1, block[self._load:])
+                del block[self._load:]
+                self._maxes.insert(i, block[-1])
+        self._size += 1
+
+    def remove(self, book):
+        """Удаляет книгу из индекса, если она там есть."""
+        key = self.key(book)
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._blocks):
+            return
+        block = self._blocks[i]
+        j = bisect.bisect_left(block, key)
+        if j == len(block) or block[j] != key:
+            return
+        del block[j]
+        self._size -= 1
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+
+    def iter_keys(self, start_after=None):
+        """Перебирает ключи по возрастанию, начиная строго после start_after."""
+        if start_after is None:
+            i = j = 0
+        else:
+            i = bisect.bisect_right(self._maxes, start_after)
+            j = bisect.bisect_right(self._blocks[i], start_after) if i < len(self._blocks) else 0
+        for block in itertools.islice(self._blocks, i, None):
+            yield from itertools.islice(block, j, None)
+            j = 0
+
+    def __len__(self):
+        """Возвращает количество книг в индексе."""
+        return self._size
+
+# Индекс книг по значению атрибута (автор, жанр)
+class AttributeIndex:
+    """
+    Индекс "значение атрибута -> ISBN книг" с отдельным подмножеством книг в наличии.
+
+    Для каждого значения хранятся два упорядоченных множества ISBN (dict):
+    все книги и книги с quantity > 0. Добавление, удаление и изменение
+    количества стоят O(1), поэтому выборка книг в наличии не просматривает
+    выданные книги. Изменения количества приходят из-под разных блокировок
+    ISBN, поэтому индекс защищен собственной блокировкой.
+    """
+    def __init__(self, attribute, books=()):
+        """
+        Инициализирует индекс.
+
+        Args:
+            attribute: Имя атрибута книги ("author", "genre").
+            books: Начальные книги.
+        """
+        self.attribute = attribute
+        self._lock = threading.Lock()
+        self._all = {}        # Значение -> {ISBN: None}
+        self._available = {}  # Значение -> {ISBN: None} для книг в наличии
+        for book in books:
+            self.add(book)
+
+    @staticmethod
+    def _discard(groups, key, isbn):
+        """Удаляет ISBN из группы значения key, удаляя опустевшую группу."""
+        group = groups.get(key)
+        if group is not None and group.pop(isbn, False) is None and not group:
+            del groups[key]
+
+    def add(self, book):
+        """Добавляет книгу в индекс."""
+        key = getattr(book, self.attribute)
+        with self._lock:
+            self._all.setdefault(key, {})[book.isbn] = None
+            if book.quantity > 0:
+                self._available.setdefault(key, {})[book.isbn] = None
+
+    def remove(self, book):
+        """Удаляет книгу из индекса."""
+        key = getattr(book, self.attribute)
+        with self._lock:
+            self._discard(self._all, key, book.isbn)
+            self._discard(self._available, key, book.isbn)
+
+    def set_quantity(self, book):
+        """Переносит книгу в подмножество книг в наличии или из него после изменения количества."""
+        key = getattr(book, self.attribute)
+        with self._lock:
+            if book.quantity > 0:
+                if book.isbn in self._all.get(key, ()):
+                    self._available.setdefault(key, {})[book.isbn] = None
+            else:
+                self._discard(self._available, key, book.isbn)
+
+    def isbns(self, key, available=False):
+        """Возвращает список ISBN книг со значением key (только в наличии, если available)."""
+        with self._lock:
+            return list((self._available if available else self._all).get(key, ()))
+
+    def contains(self, key, isbn, available=False):
+        """Проверяет за O(1), есть ли книга isbn среди книг со значением key."""
+        return isbn in (self._available if available else self._all).get(key, ())
+
+    def count(self, key, available=False):
+        """Возвращает количество книг со значением key за O(1)."""
+        return len((self._available if available else self._all).get(key, ()))
+
+    def keys(self):
+        """Возвращает список значений атрибута, для которых есть книги."""
+        with self._lock:
+            return list(self._all)
+
+# План выполнения запроса к каталогу
+class QueryPlan:
+    """
+    План запроса CatalogQuery.
+
+    Attributes:
+        access: Способ получения кандидатов: "isbn", "author", "genre",
+            "title_scan" (обход индекса названий) или "full_scan".
+        estimate: Оценка количества кандидатов.
+        probes: Условия, проверяемые по индексам (без обращения к Book).
+        filters: Условия, проверяемые по объекту Book.
+        sort: None, "index" (порядок индекса названий) или "memory".
+    """
+    _ACCESS_NAMES = {"isbn": "поиск по ISBN", "author": "индекс авторов", "genre": "индекс жанров",
+                     "title_scan": "обход индекса названий", "full_scan": "полный просмотр каталога"}
+
+    def __init__(self, access, estimate, probes=(), filters=(), sort=None, available_index=False):
+        """Инициализирует объект QueryPlan."""
+        self.access = access
+        self.estimate = estimate
+        self.probes = list(probes)
+        self.filters = list(filters)
+        self.sort = sort
+        # Кандидаты и проверки берутся из подмножеств книг в наличии
+        self.available_index = available_index
+
+    def describe(self, query):
+        """Возвращает текстовое описание плана для запроса query."""
+        conditions = query._conditions
+        access = self._ACCESS_NAMES[self.access]
+        if self.access in ("isbn", "author", "genre"):
+            access += f" ({self.access} = {conditions[self.access]})"
+        in_stock = ", только в наличии" if self.available_index else ""
+        if self.access in ("author", "genre"):
+            access += in_stock
+        lines = [f"Доступ: {access}, ~{self.estimate} кандидатов"]
+        for field in self.probes:
+            lines.append(f"Пересечение с индексом: {field} = {conditions[field]}{in_stock}")
+        for field in self.filters:
+            lines.append(f"Фильтр: {field} = {conditions[field]!r}")
+        if query._order is not None:
+            how = "порядок индекса названий" if self.sort == "index" else "сортировка в памяти"
+            lines.append(f"Порядок: {query._order} ({how})")
+        if query._offset or query._limit is not None:
+            lines.append(f"Смещение: {query._offset}, лимит: {query._limit}")
+        return "\n".join(lines)
+
+
+# Запрос к каталогу с выбором индекса
+class CatalogQuery:
+    """
+    Составной запрос к каталогу библиотеки.
+
+    Условия where объединяются по "И". Планировщик выбирает самый
+    селективный индекс (ISBN, автор, жанр; для available=True - подмножество
+    книг в наличии), остальные индексированные условия проверяет по
+    индексам (пересечение), прочие - по объекту Book. При сортировке по
+    названию с небольшим лимитом может оказаться выгоднее обходить индекс
+    названий и останавливаться после нужного числа совпадений. Результат
+    вычисляется лениво при переборе.
+    """
+    FIELDS = ("isbn", "title", "author", "genre", "available")
+
+    def __init__(self, library):
+        """
+        Инициализирует пустой запрос.
+
+        Args:
+            library: Объект Library.
+        """
+        self._library = library
+        self._conditions = {}
+        self._order = None
+        self._offset = 0
+        self._limit = None
+
+    def where(self, **conditions):
+        """
+        Добавляет условия на равенство: isbn, title, author (Author), genre, available (bool).
+
+        Returns:
+            Этот же запрос.
+        """
+        for field in conditions:
+            if field not in self.FIELDS:
+                raise ValueError(f"Неизвестное поле запроса: {field!r}.")
+        self._conditions.update(conditions)
+        return self
+
+    def order_by(self, field):
+        """Задает сортировку по атрибуту книги (по названию - через индекс названий)."""
+        self._order = field
+        return self
+
+    def offset(self, count):
+        """Пропускает первые count книг результата."""
+        self._offset = count
+        return self
+
+    def limit(self, count):
+        """Ограничивает результат count книгами."""
+        self._limit = count
+        return self
+
+    def page(self, number, size):
+        """Выбирает страницу number (с 1) по size книг."""
+        return self.offset((number - 1) * size).limit(size)
+
+    def plan(self):
+        """Выбирает план выполнения запроса (QueryPlan)."""
+        library = self._library
+        conditions = self._conditions
+        available_index = conditions.get("available") is True
+        total = len(library._catalog)
+        if "isbn" in conditions:
+            return QueryPlan("isbn", 1, filters=[field for field in conditions if field != "isbn"])
+        indexes = {"author": library.author_index, "genre": library.genre_index}
+        # Индексированные условия по возрастанию количества подходящих книг
+        indexed = sorted((indexes[field].count(conditions[field], available_index), field)
+                         for field in indexes if field in conditions)
+        if indexed:
+            estimate, access = indexed[0]
+            probes = [field for _, field in indexed[1:]]
+        else:
+            estimate, access, probes = total, "full_scan", []
+            available_index = False
+        # Оценка размера результата в предположении независимости условий
+        matches = estimate
+        for count, _ in indexed[1:]:
+            matches *= count / max(total, 1)
+        sort = None if self._order is None else "memory"
+        if self._order == "title":
+            # Обход индекса названий просматривает ~ (offset + limit) / доля подходящих книг
+            if self._limit is None or matches < 1:
+                scan_cost = total
+            else:
+                scan_cost = min(total, (self._offset + self._limit) * total / matches)
+            index_cost = estimate * max(1.0, math.log2(estimate + 1))
+            if access == "full_scan" or scan_cost < index_cost:
+                access, sort = "title_scan", "index"
+                probes = [field for _, field in indexed]
+                available_index = available_index and bool(probes)
+                estimate = int(scan_cost)
+        covered = {access, *probes}
+        if available_index:
+            covered.add("available")
+        filters = [field for field in conditions if field not in covered]
+        return QueryPlan(access, estimate, probes, filters, sort, available_index)
+
+    def explain(self):
+        """Возвращает описание выбранного плана."""
+        return self.plan().describe(self)
+
+    def _candidates(self, plan):
+        """Перебирает ISBN кандидатов согласно способу доступа плана."""
+        library = self._library
+        if plan.access == "isbn":
+            isbn = self._conditions["isbn"]
+            return iter([isbn] if isbn in library._catalog else [])
+        if plan.access == "author":
+            return iter(library.author_index.isbns(self._conditions["author"], plan.available_index))
+        if plan.access == "genre":
+            return iter(library.genre_index.isbns(self._conditions["genre"], plan.available_index))
+        if plan.access == "title_scan":
+            return (isbn for _, isbn in library.title_index.iter_keys())
+        return iter(list(library._catalog))
+
+    def _matches(self, plan):
+        """Перебирает книги, удовлетворяющие условиям, в порядке кандидатов."""
+        library = self._library
+        conditions = self._conditions
+        probes = [({"author": library.author_index, "genre": library.genre_index}[field], conditions[field])
+                  for field in plan.probes]
+        filters = [(field, conditions[field]) for field in plan.filters]
+        catalog = library._catalog
+        for isbn in self._candidates(plan):
+            if not all(index.contains(key, isbn, plan.available_index) for index, key in probes):
+                continue
+            book = catalog.get(isbn)
+            if book is None:
+                continue  # Книга удалена после выбора кандидатов
+            for field, value in filters:
+                actual = book.quantity > 0 if field == "available" else getattr(book, field)
+                if actual != value:
+                    break
+            else:
+                yield book
+
+    def __iter__(self):
+        """Выполняет запрос и лениво перебирает найденные книги."""
+        plan = self.plan()
+        books = self._matches(plan)
+        stop = None if self._limit is None else self._offset + self._limit
+        if plan.sort == "memory":
+            if self._order == "title":
+                key = TitleIndex.key
+            else:
+                field = self._order
+                key = lambda book: (getattr(book, field), book.isbn)
+            books = iter(sorted(books, key=key) if stop is None else heapq.nsmallest(stop, books, key=key))
+        return itertools.islice(books, self._offset, stop)
+
+    def all(self):
+        """Возвращает список найденных книг."""
+        return list(self)
+
+    def count(self):
+        """Возвращает количество найденных книг (без учета offset и limit)."""
+        return sum(1 for _ in self._matches(self.plan()))
+
+# Полнотекстовый индекс по названиям книг и именам авторов
+class TitleSearchIndex:
+    """
+    Инвертированный индекс по словам из названия книги и имени автора.
+
+    Слова приводятся к нижнему регистру (casefold), "ё" заменяется на "е".
+    Словарь слов хранится отсортированным для поиска по префиксу, а для
+    нечеткого поиска поддерживается индекс триграмм. Добавление и удаление
+    книги стоят O(количество слов книги). Собственной блокировки у индекса
+    нет: Library меняет его и ищет по нему под блокировкой каталога.
+    """
+    TITLE_WEIGHT = 2.0
+    AUTHOR_WEIGHT = 1.0
+    _WORD = re.compile(r"\w+")
+
+    def __init__(self, max_expansions=50, min_similarity=0.3):
+        """
+        Инициализирует пустой индекс.
+
+        Args:
+            max_expansions: Сколько слов словаря учитывать для одного префикса или нечеткого слова.
+            min_similarity: Минимальное сходство по триграммам для нечеткого поиска.
+        """
+        self.max_expansions = max_expansions
+        self.min_similarity = min_similarity
+        self._postings = {}     # Слово -> {ISBN: вес}
+        self._documents = {}    # ISBN -> слова книги
+        self._vocabulary = []   # Отсортированный список слов
+        self._trigrams = {}     # Триграмма -> множество слов
+
+    @classmethod
+    def tokenize(cls, text):
+        """Разбивает текст на нормализованные слова."""
+        return cls._WORD.findall(str(text).casefold().replace("ё", "е"))
+
+    @staticmethod
+    def _word_trigrams(word):
+        """Возвращает множество триграмм слова (с маркерами начала и конца)."""
+        padded = f"^{word}$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, book):
+        """Добавляет книгу в индекс (повторное добавление заменяет старую запись)."""
+        if book.isbn in self._documents:
+            self.remove(book)
+        weights = {}
+        for word in self.tokenize(book.title):
+            weights[word] = weights.get(word, 0.0) + self.TITLE_WEIGHT
+        author = book.author
+        for word in self.tokenize(f"{getattr(author, 'first_name', author)} {getattr(author, 'last_name', '')}"):
+            weights[word] = weights.get(word, 0.0) + self.AUTHOR_WEIGHT
+        for word, weight in weights.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                bisect.insort(self._vocabulary, word)
+                for trigram in self._word_trigrams(word):
+                    self._trigrams.setdefault(trigram, set()).add(word)
+            postings[book.isbn] = weight
+        self._documents[book.isbn] = tuple(weights)
+
+    def remove(self, book):
+        """Удаляет книгу из индекса."""
+        words = self._documents.pop(book.isbn, ())
+        for word in words:
+            postings = self._postings[word]
+            del postings[book.isbn]
+            if not postings:
+                del self._postings[word]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+                for trigram in self._word_trigrams(word):
+                    words_with_trigram = self._trigrams[trigram]
+                    words_with_trigram.discard(word)
+                    if not words_with_trigram:
+                        del self._trigrams[trigram]
+
+    def __len__(self):
+        """Возвращает количество книг в индексе."""
+        return len(self._documents)
+
+    def _prefix_matches(self, prefix):
+        """Возвращает слова словаря, начинающиеся с prefix (не более max_expansions)."""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = []
+        for word in itertools.islice(self._vocabulary, start, start + self.max_expansions):
+            if not word.startswith(prefix):
+                break
+            matches.append(word)
+        return matches
+
+    def _fuzzy_matches(self, word):
+        """Возвращает пары (слово словаря, сходство) для слов, похожих на word."""
+        trigrams = self._word_trigrams(word)
+        shared = {}
+        for trigram in trigrams:
+            for candidate in self._trigrams.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        matches = []
+        for candidate, count in shared.items():
+            # Коэффициент Жаккара; у слова длины n ровно n триграмм с маркерами
+            similarity = count / (len(trigrams) + len(candidate) - count)
+            if similarity >= self.min_similarity:
+                matches.append((candidate, similarity))
+        return heapq.nlargest(self.max_expansions, matches, key=lambda match: match[1])
+
+    def search(self, query, limit=10, prefix=True, fuzzy=False):
+        """
+        Ищет книги по запросу.
+
+        Args:
+            query: Строка запроса.
+            limit: Максимальное количество результатов.
+            prefix: Считать последнее слово запроса префиксом.
+            fuzzy: Учитывать похожие слова (совпадение по триграммам).
+
+        Returns:
+            Список пар (ISBN, оценка) по убыванию оценки.
+        """
+        words = self.tokenize(query)
+        total = len(self._documents)
+        scores = {}
+        for position, word in enumerate(words):
+            matches = {word: 1.0} if word in self._postings else {}
+            if prefix and position == len(words) - 1:
+                for match in self._prefix_matches(word):
+                    matches.setdefault(match, 1.0)
+            if fuzzy:
+                for match, similarity in self._fuzzy_matches(word):
+                    matches[match] = max(matches.get(match, 0.0), similarity)
+            # Для каждого слова запроса книга получает лучшую оценку среди подходящих слов
+            best = {}
+            for match, similarity in matches.items():
+                postings = self._postings.get(match)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + total / len(postings))
+                for isbn, weight in postings.items():
+                    score = weight * idf * similarity
+                    if score > best.get(isbn, 0.0):
+                        best[isbn] = score
+            for isbn, score in best.items():
+                scores[isbn] = scores.get(isbn, 0.0) + score
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+# Представление каталога в виде множества книг
+class CatalogBookView(Set):
+    """
+    Множество книг библиотеки, построенное поверх каталога (ISBN: Book).
+
+    Книги не хранятся повторно: проверка принадлежности выполняется
+    по ISBN, а перебор идет по значениям каталога.
+    """
+    def __init__(self, catalog):
+        """
+        Инициализирует объект CatalogBookView.
+
+        Args:
+            catalog: Отображение ISBN -> Book.
+        """
+        self._catalog = catalog
+
+    def __contains__(self, book):
+        """Проверяет, есть ли книга в каталоге (сравнение по ISBN)."""
+        return isinstance(book, Book) and book.isbn in self._catalog
+
+    def __iter__(self):
+        """Перебирает книги каталога."""
+        return iter(self._catalog.values())
+
+    def __len__(self):
+        """Возвращает количество книг в каталоге."""
+        return len(self._catalog)
+
+    def add(self, book):
+        """Добавляет книгу в каталог, если книги с таким ISBN еще нет."""
+        if book.isbn not in self._catalog:
+            self._catalog[book.isbn] = book
+
+    def remove(self, book):
+        """Удаляет книгу из каталога; KeyError, если ее там нет."""
+        if book not in self:
+            raise KeyError(book)
+        del self._catalog[book.isbn]
+
+    def discard(self, book):
+        """Удаляет книгу из каталога, если она там есть."""
+        if book in self:
+            del self._catalog[book.isbn]
+
+# Метрики операций библиотеки
+class OperationMetrics:
+    """Счетчики и гистограмма задержек одной операции."""
+    __slots__ = ("count", "errors", "buckets", "total")
+
+    def __init__(self, bucket_count):
+        """Инициализирует пустые счетчики для гистограммы из bucket_count корзин (+ корзина +Inf)."""
+        self.count = 0
+        self.errors = {}  # Имя класса исключения (или статус отказа) -> количество
+        self.buckets = [0] * (bucket_count + 1)
+        self.total = 0.0
+
+
+class LibraryMetrics:
+    """
+    Метрики операций библиотеки: число вызовов, ошибки по классам
+    исключений и гистограмма задержек с фиксированными границами корзин.
+
+    Отказ try_*-метода учитывается под именем исключения, которое для
+    этого статуса выбрасывает обычный метод (BookNotFound, BookUnavailable, ...);
+    отказы без исключения - под значением статуса ("not_lent").
+    """
+    # Верхние границы корзин гистограммы задержек (секунды)
+    BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+               1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    # Операция -> статус отказа -> класс исключения
+    STATUS_ERRORS = {
+        "add_book": {OpStatus.INVALID_DATA: InvalidBookData, OpStatus.DUPLICATE: BookError},
+        "remove_book": {OpStatus.BOOK_NOT_FOUND: BookNotFound},
+        "add_reader": {OpStatus.DUPLICATE: ReaderError},
+        "remove_reader": {OpStatus.READER_NOT_FOUND: ReaderNotFound},
+        "lend_book": {OpStatus.BOOK_NOT_FOUND: BookNotFound, OpStatus.READER_NOT_FOUND: ReaderNotFound,
+                      OpStatus.UNAVAILABLE: BookUnavailable, OpStatus.LIMIT_REACHED: LoanLimitExceeded},
+        "place_hold": {OpStatus.BOOK_NOT_FOUND: BookNotFound, OpStatus.READER_NOT_FOUND: ReaderNotFound,
+                       OpStatus.DUPLICATE: ReaderError},
+        "cancel_hold": {OpStatus.NO_HOLD: HoldNotFound},
+    }
+    STATUS_ERRORS["lend_many"] = STATUS_ERRORS["lend_book"]
+
+    def __init__(self):
+        """Инициализирует пустые метрики."""
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def wrap(self, op, method):
+        """Возвращает обертку метода method, учитывающую его вызовы как операцию op."""
+        operation = self._operations.setdefault(op, OperationMetrics(len(self.BUCKETS)))
+        error_names = {status: error.__name__ for status, error in self.STATUS_ERRORS.get(op, {}).items()}
+        bounds = self.BUCKETS
+        lock = self._lock
+        clock = time.perf_counter
+
+        @functools.wraps(method)
+        def measured(*args, **kwargs):
+            error = None
+            start = clock()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            else:
+                if isinstance(result, OpResult) and result.status is not OpStatus.OK:
+                    error = error_names.get(result.status, result.status.value)
+                return result
+            finally:
+                elapsed = clock() - start
+                with lock:
+                    operation.count += 1
+                    operation.total += elapsed
+                    operation.buckets[bisect.bisect_left(bounds, elapsed)] += 1
+                    if error is not None:
+                        operation.errors[error] = operation.errors.get(error, 0) + 1
+
+        return measured
+
+    def _quantile(self, buckets, count, fraction):
+        """
+        Оценивает квантиль задержки (с) по гистограмме: верхняя граница корзины квантиля.
+
+        Если квантиль попал в корзину +Inf, возвращается последняя конечная
+        граница (оценка снизу): значение должно оставаться конечным для JSON.
+        """
+        rank = fraction * count
+        seen = 0
+        for bound, bucket in zip(self.BUCKETS, buckets):
+            seen += bucket
+            if seen >= rank:
+                return bound
+        return self.BUCKETS[-1]
+
+    def snapshot(self):
+        """
+        Возвращает словарь операция -> {"count", "errors", "total_s", "mean_us",
+        "p50_us", "p95_us", "p99_us", "buckets"} (buckets - накопленные счетчики по границам BUCKETS и +Inf).
+        """
+        with self._lock:
+            operations = {op: (metrics.count, dict(metrics.errors), list(metrics.buckets), metrics.total)
+                          for op, metrics in self._operations.items()}
+        result = {}
+        for op, (count, errors, buckets, total) in operations.items():
+            entry = {"count": count, "errors": errors, "total_s": total,
+                     "mean_us": total / count * 1e6 if count else 0.0,
+                     "buckets": list(itertools.accumulate(buckets))}
+            for name, fraction in (("p50_us", 0.50), ("p95_us", 0.95), ("p99_us", 0.99)):
+                entry[name] = self._quantile(buckets, count, fraction) * 1e6 if count else 0.0
+            result[op] = entry
+        return result
+
+
+def _prometheus_label(value):
+    """Экранирует значение метки в текстовом формате Prometheus."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(library):
+    """
+    Возвращает метрики библиотеки в текстовом формате Prometheus (версия 0.0.4).
+
+    Args:
+        library: Объект Library (метрики операций выводятся, если включены).
+    """
+    stats = library.stats()
+    name = _prometheus_label(library.name)
+    lines = []
+    for metric, key, help_text in (("library_books", "books", "Книг в каталоге."),
+                                   ("library_readers", "readers", "Зарегистрированных читателей."),
+                                   ("library_open_loans", "open_loans", "Открытых выдач.")):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f'{metric}{{library="{name}"}} {stats[key]}']
+    operations = stats.get("operations")
+    if operations:
+        lines += ["# HELP library_operations_total Вызовов операции.", "# TYPE library_operations_total counter"]
+        for op, entry in operations.items():
+            lines.append(f'library_operations_total{{library="{name}",operation="{op}"}} {entry["count"]}')
+        lines += ["# HELP library_operation_errors_total Отказов и исключений операции по классам.",
+                  "# TYPE library_operation_errors_total counter"]
+        for op, entry in operations.items():
+            for error, count in entry["errors"].items():
+                lines.append(f'library_operation_errors_total{{library="{name}",operation="{op}",'
+                             f'error="{_prometheus_label(error)}"}} {count}')
+        lines += ["# HELP library_operation_duration_seconds Задержка операции.",
+                  "# TYPE library_operation_duration_seconds histogram"]
+        for op, entry in operations.items():
+            labels = f'library="{name}",operation="{op}"'
+            for bound, cumulative in zip((*LibraryMetrics.BUCKETS, "+Inf"), entry["buckets"]):
+                lines.append(f'library_operation_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"library_operation_duration_seconds_sum{{{labels}}} {entry['total_s']!r}")
+            lines.append(f"library_operation_duration_seconds_count{{{labels}}} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusFileExporter:
+    """
+    Записывает метрики библиотеки в файл текстового формата Prometheus
+    (например, для textfile-коллектора node_exporter). Файл заменяется
+    атомарно; при заданном interval запись повторяется в фоновом потоке.
+    """
+    def __init__(self, library, path, interval=None):
+        """
+        Инициализирует экспортер.
+
+        Args:
+            library: Объект Library.
+            path: Путь к файлу метрик (обычно с расширением .prom).
+            interval: Период записи (с); None - только по вызову write().
+        """
+        self.library = library
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+        if interval is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def write(self):
+        """Записывает текущие метрики в файл."""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(prometheus_text(self.library))
+        os.replace(temporary, self.path)
+
+    def _run(self):
+        """Периодическая запись метрик."""
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def close(self):
+        """Останавливает фоновую запись и записывает метрики последний раз."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()
+
+# Постоянное хранилище на SQLite
+class SQLiteStorage:
+    """
+    Хранилище каталога, читателей, открытых выдач, экземпляров и резервирований в базе SQLite (режим WAL).
+
+    Объекты Book и Reader создаются только при обращении к ним и
+    кэшируются по слабым ссылкам. Изменения при выдаче и возврате
+    копятся в одной транзакции и фиксируются пакетами по batch_size
+    операций или при вызове commit(). Соединение защищено блокировкой и
+    может использоваться из нескольких потоков.
+    """
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (
+            isbn TEXT NOT NULL PRIMARY KEY,
+            title TEXT NOT NULL,
+            author_first_name TEXT NOT NULL,
+            author_last_name TEXT NOT NULL,
+            author_biography TEXT NOT NULL DEFAULT '',
+            genre TEXT,
+            quantity INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS readers (
+            reader_id NOT NULL PRIMARY KEY,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS loans (
+            loan_id INTEGER PRIMARY KEY,
+            isbn TEXT NOT NULL,
+            reader_id NOT NULL,
+            loan_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            copy INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS loans_by_key ON loans (isbn, reader_id);
+        CREATE TABLE IF NOT EXISTS holds (
+            hold_id INTEGER PRIMARY KEY,
+            isbn TEXT NOT NULL,
+            reader_id NOT NULL,
+            ready INTEGER NOT NULL DEFAULT 0,
+            copy INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS holds_by_key ON holds (isbn, reader_id);
+        CREATE TABLE IF NOT EXISTS copies (
+            isbn TEXT NOT NULL PRIMARY KEY,
+            total INTEGER NOT NULL,
+            available BLOB NOT NULL,
+            on_loan BLOB NOT NULL,
+            damaged BLOB NOT NULL,
+            withdrawn BLOB NOT NULL,
+            shelves BLOB NOT NULL,
+            barcodes TEXT
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS shelves (
+            code INTEGER PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+    """
+    # Столбцы, добавленные после первой версии схемы: (таблица, столбец, тип)
+    _ADDED_COLUMNS = (("loans", "copy", "INTEGER"), ("holds", "copy", "INTEGER"))
+
+    def __init__(self, path, batch_size=1000):
+        """
+        Открывает (или создает) базу данных.
+
+        Args:
+            path: Путь к файлу базы данных (":memory:" - база в памяти).
+            batch_size: Количество операций записи в одной транзакции.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = 0
+        self._depth = 0  # Вложенность блоков _transaction
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(self._SCHEMA)
+        self._migrate()
+        self.catalog = SQLiteCatalog(self)
+        self.readers = SQLiteReaderDatabase(self)
+
+    def _migrate(self):
+        """Добавляет столбцы, которых нет в базе, созданной прежней версией."""
+        for table, column, column_type in self._ADDED_COLUMNS:
+            columns = {row[1] for row in self._connection.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self._connection.commit()
+
+    def _execute(self, sql, params=()):
+        """Выполняет запрос на чтение."""
+        with self._lock:
+            return self._connection.execute(sql, params)
+
+    def _write(self, sql, params=()):
+        """Выполняет запрос на запись в текущей транзакции, фиксируя ее по заполнении пакета."""
+        with self._lock:
+            cursor = self._connection.execute(sql, params)
+            self._pending += 1
+            if self._pending >= self.batch_size and not self._depth:
+                self.commit()
+            return cursor
+
+    def _write_many(self, sql, rows):
+        """Выполняет запрос на запись для каждой строки rows; пакет не разбивается между транзакциями."""
+        with self._lock:
+            cursor = self._connection.executemany(sql, rows)
+            self._pending += max(cursor.rowcount, 1)
+            if self._pending >= self.batch_size and not self._depth:
+                self.commit()
+            return cursor
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Выполняет несколько записей в одной транзакции: фиксация пакета откладывается до конца блока."""
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            if not self._depth and self._pending >= self.batch_size:
+                self.commit()
+
+    def commit(self):
+        """Фиксирует текущую транзакцию."""
+        with self._lock:
+            self._connection.commit()
+            self._pending = 0
+
+    def close(self):
+        """Фиксирует изменения и закрывает базу данных."""
+        with self._lock:
+            self.commit()
+            self._connection.close()
+
+    def record_lend(self, loan, copies=()):
+        """Сохраняет выдачу книги, новое количество экземпляров и учет экземпляров copies (объекты BookCopies)."""
+        with self._transaction():
+            self._write("UPDATE books SET quantity = ? WHERE isbn = ?", (loan.book.quantity, loan.book.isbn))
+            self._write("INSERT INTO loans (isbn, reader_id, loan_date, due_date, copy) VALUES (?, ?, ?, ?, ?)",
+                        (loan.book.isbn, loan.reader.reader_id,
+                         loan.loan_date.toordinal(), loan.due_date.toordinal(), loan.copy))
+            self._write_copies(copies)
+
+    def record_lends(self, loans, copies=()):
+        """Сохраняет пакет выдач и учет экземпляров copies в одной транзакции."""
+        with self._transaction():
+            self._write_many("UPDATE books SET quantity = ? WHERE isbn = ?",
+                             {loan.book.isbn: (loan.book.quantity, loan.book.isbn) for loan in loans}.values())
+            self._write_many("INSERT INTO loans (isbn, reader_id, loan_date, due_date, copy) VALUES (?, ?, ?, ?, ?)",
+                             [(loan.book.isbn, loan.reader.reader_id, loan.loan_date.toordinal(),
+                               loan.due_date.toordinal(), loan.copy) for loan in loans])
+            self._write_copies(copies)
+
+    def record_returns(self, loans, copies=()):
+        """Сохраняет пакет возвратов и учет экземпляров copies в одной транзакции."""
+        with self._transaction():
+            self._write_many("UPDATE books SET quantity = ? WHERE isbn = ?",
+                             {loan.book.isbn: (loan.book.quantity, loan.book.isbn) for loan in loans}.values())
+            self._write_many("DELETE FROM loans WHERE loan_id = (SELECT loan_id FROM loans "
+                             "WHERE isbn = ? AND reader_id = ? ORDER BY loan_id LIMIT 1)",
+                             [(loan.book.isbn, loan.reader.reader_id) for loan in loans])
+            self._write_copies(copies)
+
+    def record_return(self, loan, copies=()):
+        """Сохраняет возврат книги: удаляет самую раннюю выдачу этой книги этому читателю."""
+        self.record_returns([loan], copies)
+
+    def record_copies(self, quantity, copies, shelves):
+        """Сохраняет учет экземпляров книги (BookCopies), ее количество и словарь полок."""
+        with self._transaction():
+            self._write("UPDATE books SET quantity = ? WHERE isbn = ?", (quantity, copies.isbn))
+            self._write_copies([copies])
+            self._write_many("INSERT OR IGNORE INTO shelves (code, name) VALUES (?, ?)", enumerate(shelves))
+
+    def _write_copies(self, copies):
+        """Записывает учет экземпляров (объекты BookCopies) в текущей транзакции."""
+        rows = [(item.isbn, *item.state()) for item in copies]
+        if rows:
+            self._write_many("INSERT OR REPLACE INTO copies VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def record_hold(self, isbn, reader_id):
+        """Сохраняет постановку читателя в очередь резервирования."""
+        self._write("INSERT INTO holds (isbn, reader_id) VALUES (?, ?)", (isbn, reader_id))
+
+    def record_hold_ready(self, isbn, reader_id, copy=None):
+        """Отмечает, что для читателя отложен экземпляр copy (количество экземпляров при этом не меняется)."""
+        self._write("UPDATE holds SET ready = 1, copy = ? WHERE isbn = ? AND reader_id = ?", (copy, isbn, reader_id))
+
+    def record_hold_removed(self, isbn, reader_id, quantity=None, copies=()):
+        """
+        Удаляет резервирование (выдано или снято) и, если задано, сохраняет новое
+        количество экземпляров и учет экземпляров copies.
+        """
+        with self._transaction():
+            if quantity is not None:
+                self._write("UPDATE books SET quantity = ? WHERE isbn = ?", (quantity, isbn))
+            self._write_copies(copies)
+            self._write("DELETE FROM holds WHERE isbn = ? AND reader_id = ?", (isbn, reader_id))
+
+    def record_holds_cleared(self, isbn):
+        """Удаляет все резервирования книги (книга удалена из каталога)."""
+        self._write("DELETE FROM holds WHERE isbn = ?", (isbn,))
+
+    def load_holds(self):
+        """
+        Перебирает сохраненные резервирования в порядке постановки:
+        (ISBN, reader_id, отложен ли экземпляр, номер отложенного экземпляра или None).
+        """
+        rows = self._execute("SELECT isbn, reader_id, ready, copy FROM holds ORDER BY hold_id")
+        for isbn, reader_id, ready, copy in rows.fetchall():
+            yield isbn, reader_id, bool(ready), copy
+
+    def load_loans(self):
+        """Перебирает сохраненные открытые выдачи в порядке выдачи."""
+        rows = self._execute("SELECT isbn, reader_id, loan_date, due_date, copy FROM loans ORDER BY loan_id")
+        for isbn, reader_id, loan_date, due_date, copy in rows.fetchall():
+            yield Loan(self.catalog[isbn], self.readers[reader_id],
+                       datetime.date.fromordinal(loan_date), datetime.date.fromordinal(due_date), copy)
+
+    def load_copies(self):
+        """Перебирает сохраненный учет экземпляров: пары (ISBN, состояние BookCopies.state)."""
+        for isbn, *state in self._execute("SELECT * FROM copies").fetchall():
+            yield isbn, tuple(state)
+
+    def load_shelves(self):
+        """Возвращает названия полок в порядке кодов."""
+        return [name for (name,) in self._execute("SELECT name FROM shelves ORDER BY code").fetchall()]
+
+class _SQLiteMapping(MutableMapping):
+    """Общая часть отображений SQLite: кэш созданных объектов и счетчик строк."""
+    _table = None
+    _key_column = None
+
+    def __init__(self, storage):
+        """
+        Инициализирует отображение.
+
+        Args:
+            storage: Объект SQLiteStorage.
+        """
+        self._storage = storage
+        self._cache = weakref.WeakValueDictionary()
+        self._count = None
+
+    @abstractmethod
+    def _load(self, row):
+        """Создает объект предметной области из строки таблицы."""
+
+    @abstractmethod
+    def _row(self, key, value):
+        """Возвращает значения столбцов для сохранения объекта."""
+
+    @staticmethod
+    @abstractmethod
+    def _key_of(value):
+        """Возвращает ключ объекта."""
+
+    def __getitem__(self, key):
+        """Возвращает объект по ключу, создавая его из строки базы при первом обращении."""
+        value = self._cache.get(key)
+        if value is None:
+            row = self._storage._execute(
+                f"SELECT * FROM {self._table} WHERE {self._key_column} = ?", (key,)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            value = self._cache[key] = self._load(row)
+        return value
+
+    def __contains__(self, key):
+        """Проверяет наличие ключа по индексу первичного ключа."""
+        if key in self._cache:
+            return True
+        return self._storage._execute(
+            f"SELECT 1 FROM {self._table} WHERE {self._key_column} = ?", (key,)).fetchone() is not None
+
+    def __setitem__(self, key, value):
+        """Сохраняет объект в базе."""
+        row = self._row(key, value)
+        existed = key in self
+        placeholders = ", ".join("?" * len(row))
+        self._storage._write(f"INSERT OR REPLACE INTO {self._table} VALUES ({placeholders})", row)
+        self._cache[key] = value
+        if self._count is not None and not existed:
+            self._count += 1
+
+    def __delitem__(self, key):
+        """Удаляет объект из базы."""
+        cursor = self._storage._write(f"DELETE FROM {self._table} WHERE {self._key_column} = ?", (key,))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+        self._cache.pop(key, None)
+        if self._count is not None:
+            self._count -= 1
+
+    def __iter__(self):
+        """Перебирает ключи в порядке первичного ключа."""
+        for (key,) in self._storage._execute(f"SELECT {self._key_column} FROM {self._table}"):
+            yield key
+
+    def __len__(self):
+        """Возвращает количество строк (считается один раз, затем поддерживается)."""
+        if self._count is None:
+            self._count = self._storage._execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+        return self._count
+
+    def values(self):
+        """Перебирает объекты, читая таблицу одним запросом."""
+        for row in self._storage._execute(f"SELECT * FROM {self._table}"):
+            value = self._cache.get(row[0])
+            if value is None:
+                value = self._cache[row[0]] = self._load(row)
+            yield value
+
+    def items(self):
+        """Перебирает пары (ключ, объект), читая таблицу одним запросом."""
+        for value in self.values():
+            yield self._key_of(value), value
+
+class SQLiteCatalog(_SQLiteMapping):
+    """Каталог книг (ISBN: Book), хранящийся в таблице books."""
+    _table = "books"
+    _key_column = "isbn"
+
+    def _load(self, row):
+        """Создает объект Book из строки таблицы books."""
+        isbn, title, first_name, last_name, biography, genre, quantity = row
+        return Book(title, intern_author(first_name, last_name, biography), isbn, genre, quantity)
+
+    def _row(self, isbn, book):
+        """Возвращает значения столбцов таблицы books."""
+        author = book.author
+        return (isbn, book.title, author.first_name, author.last_name,
+                getattr(author, "biography", ""), book.genre, book.quantity)
+
+    def __delitem__(self, isbn):
+        """Удаляет книгу из базы вместе с учетом ее экземпляров."""
+        with self._storage._transaction():
+            super().__delitem__(isbn)
+            self._storage._write("DELETE FROM copies WHERE isbn = ?", (isbn,))
+
+    @staticmethod
+    def _key_of(book):
+        """Возвращает ключ книги."""
+        return book.isbn
+
+class SQLiteReaderDatabase(_SQLiteMapping):
+    """База данных читателей (reader_id: Reader), хранящаяся в таблице readers."""
+    _table = "readers"
+    _key_column = "reader_id"
+
+    def _load(self, row):
+        """Создает объект Reader из строки таблицы readers."""
+        reader_id, first_name, last_name = row
+        return Reader(first_name, last_name, reader_id)
+
+    def _row(self, reader_id, reader):
+        """Возвращает значения столбцов таблицы readers."""
+        return (reader_id, reader.first_name, reader.last_name)
+
+    @staticmethod
+    def _key_of(reader):
+        """Возвращает ключ читателя."""
+        return reader.reader_id
+
+# Каталог только для чтения в файле, отображаемом в память
+class MappedCatalog(Mapping):
+    """
+    Каталог книг (ISBN: Book) только для чтения в файле, отображаемом в память (mmap).
+
+    Файл: [заголовок][таблица хеша ISBN][записи книг]. Таблица - открытая
+    адресация с линейным пробированием: слот из 16 байт хранит 64-битный
+    хеш ISBN (BLAKE2b) и смещение записи + 1 (0 - пустой слот), число
+    слотов - степень двойки, заполнение не больше 0.7. Запись книги -
+    количество, длины строк и сами строки UTF-8.
+
+    Открытие читает только заголовок, поэтому не зависит от размера
+    каталога; поиск по ISBN читает один-два слота и одну запись прямо из
+    отображения, а Book создается только при обращении и кэшируется по
+    слабым ссылкам. Процессы, открывшие один файл, разделяют его страницы
+    в кэше операционной системы. Файл создается методом write
+    (или Library.export_catalog).
+    """
+    MAGIC = b"LBCAT001"
+    _HEADER = struct.Struct("<8sQQQQ")   # Сигнатура, книг, слотов, смещение таблицы, смещение записей
+    _SLOT = struct.Struct("<QQ")         # Хеш ISBN, смещение записи + 1
+    _RECORD = struct.Struct("<qHHHHHI")  # Количество; длины ISBN, названия, имени, фамилии, жанра, биографии
+    _NO_GENRE = 0xFFFF                   # Длина жанра для genre = None
+    _LOAD_FACTOR = 0.7
+
+    def __init__(self, path):
+        """
+        Открывает файл каталога.
+
+        Args:
+            path: Путь к файлу, созданному MappedCatalog.write.
+
+        Raises:
+            ValueError: Если файл не является каталогом.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < self._HEADER.size or self._map[:len(self.MAGIC)] != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"Файл {path} не является каталогом книг.")
+        _, self._count, slot_count, self._slots, self._records = self._HEADER.unpack_from(self._map, 0)
+        self._mask = slot_count - 1
+        self._cache = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def _hash(key):
+        """Возвращает 64-битный хеш байтов ISBN (одинаковый во всех процессах, в отличие от hash())."""
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    @classmethod
+    def write(cls, path, books):
+        """
+        Записывает книги в файл каталога (через временный файл и os.replace).
+
+        Args:
+            path: Путь к файлу.
+            books: Объекты Book с различными ISBN.
+
+        Returns:
+            Количество записанных книг.
+
+        Raises:
+            ValueError: Если ISBN повторяется или строка слишком длинная для записи.
+        """
+        return cls._write_rows(path, map(cls._row, books))
+
+    @staticmethod
+    def _row(book):
+        """Возвращает поля книги для записи: ISBN, название, имя, фамилия, жанр, биография, количество."""
+        author = book.author
+        return (book.isbn, book.title, author.first_name, author.last_name, book.genre, author.biography,
+                book.quantity)
+
+    @classmethod
+    def _write_rows(cls, path, rows):
+        """Записывает файл каталога из полей книг (см. _row); возвращает количество книг."""
+        records, offsets, hashes = [], array("Q"), array("Q")
+        seen = set()
+        size = 0
+        for isbn, title, first_name, last_name, genre, biography, quantity in rows:
+            if isbn in seen:
+                raise ValueError(f"ISBN {isbn} повторяется в каталоге.")
+            seen.add(isbn)
+            strings = [isbn.encode("utf-8"), title.encode("utf-8"), first_name.encode("utf-8"),
+                       last_name.encode("utf-8"), b"" if genre is None else genre.encode("utf-8")]
+            if max(map(len, strings)) >= cls._NO_GENRE:
+                raise ValueError(f"Слишком длинное поле книги с ISBN {isbn}.")
+            biography = biography.encode("utf-8")
+            lengths = [len(data) for data in strings]
+            if genre is None:
+                lengths[4] = cls._NO_GENRE
+            record = cls._RECORD.pack(quantity, *lengths, len(biography)) + b"".join(strings) + biography
+            records.append(record)
+            offsets.append(size)
+            hashes.append(cls._hash(strings[0]))
+            size += len(record)
+        count = len(records)
+        slot_count = 8
+        while slot_count * cls._LOAD_FACTOR < count:
+            slot_count *= 2
+        mask = slot_count - 1
+        slots = array("Q", bytes(16 * slot_count))  # Пары (хеш, смещение + 1)
+        for index in range(count):
+            slot = hashes[index] & mask
+            while slots[2 * slot + 1]:
+                slot = (slot + 1) & mask
+            slots[2 * slot] = hashes[index]
+            slots[2 * slot + 1] = offsets[index] + 1
+        if sys.byteorder != "little":
+            slots.byteswap()
+        header_size = cls._HEADER.size
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(cls._HEADER.pack(cls.MAGIC, count, slot_count, header_size, header_size + 16 * slot_count))
+            file.write(slots.tobytes())
+            for start in range(0, count, 65536):
+                file.write(b"".join(records[start:start + 65536]))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        return count
+
+    def _find(self, isbn):
+        """Возвращает смещение записи книги с данным ISBN или -1."""
+        if not isinstance(isbn, str):
+            return -1
+        key = isbn.encode("utf-8")
+        expected = self._hash(key)
+        data, unpack_slot, mask = self._map, self._SLOT.unpack_from, self._mask
+        slot = expected & mask
+        start = self._RECORD.size
+        while True:
+            stored, offset = unpack_slot(data, self._slots + 16 * slot)
+            if not offset:
+                return -1
+            if stored == expected:
+                record = self._records + offset - 1
+                length = self._RECORD.unpack_from(data, record)[1]
+                if data[record + start:record + start + length] == key:
+                    return record
+            slot = (slot + 1) & mask
+
+    def _decode(self, record):
+        """Создает Book из записи со смещением record; возвращает (Book, смещение следующей записи)."""
+        quantity, *lengths = self._RECORD.unpack_from(self._map, record)
+        position = record + self._RECORD.size
+        genre_missing = lengths[4] == self._NO_GENRE  # Признак только у длины жанра
+        if genre_missing:
+            lengths[4] = 0
+        fields = []
+        for length in lengths:
+            fields.append(str(self._map[position:position + length], "utf-8"))
+            position += length
+        isbn, title, first_name, last_name, genre, biography = fields
+        if genre_missing:
+            genre = None
+        book = self._cache.get(isbn)
+        if book is None:
+            book = self._cache[isbn] = Book(title, intern_author(first_name, last_name, biography),
+                                            isbn, genre, quantity)
+        return book, position
+
+    def __getitem__(self, isbn):
+        """Возвращает книгу по ISBN, создавая Book из записи при первом обращении."""
+        book = self._cache.get(isbn)
+        if book is None:
+            record = self._find(isbn)
+            if record < 0:
+                raise KeyError(isbn)
+            book = self._decode(record)[0]
+        return book
+
+    def __contains__(self, isbn):
+        """Проверяет наличие ISBN по таблице хеша, не создавая Book."""
+        return isbn in self._cache or self._find(isbn) >= 0
+
+    def values(self):
+        """Перебирает книги в порядке записи в файл."""
+        position, end = self._records, len(self._map)
+        while position < end:
+            book, position = self._decode(position)
+            yield book
+
+    def items(self):
+        """Перебирает пары (ISBN, Book) в порядке записи в файл."""
+        for book in self.values():
+            yield book.isbn, book
+
+    def __iter__(self):
+        """Перебирает ISBN в порядке записи в файл."""
+        for book in self.values():
+            yield book.isbn
+
+    def __len__(self):
+        """Возвращает количество книг (из заголовка)."""
+        return self._count
+
+    def close(self):
+        """Закрывает отображение файла."""
+        self._map.close()
+
+    def __enter__(self):
+        """Возвращает каталог для использования в блоке with."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Закрывает каталог при выходе из блока with."""
+        self.close()
 
-    def is_overdue(self):
-        """Проверяет, просрочена ли книга."""
-        return self.due_date < datetime.date.today()
+    def __reduce__(self):
+        """При передаче в другой процесс каталог открывается там заново по пути к файлу."""
+        return type(self), (self.path,)
 
 # Задание 2: Класс для работы с массивами объектов
 class Item:
@@ -479,6 +5016,7 @@ def find_max_item(matrix):
 
 # Основная функция
 if __name__ == "__main__":
+    configure_logging()
 
     # Создание авторов
     author1 = Author("Джон", "Толкин")
@@ -0,0 +1,290 @@
+import argparse
+import concurrent.futures
+import datetime
+import importlib
+import logging
+import operator
+import os
+import random
+import time
+from array import array
+
+# Модуль лабораторной работы 4 (имя начинается с цифры, поэтому импорт через importlib)
+lb = importlib.import_module("4LB")
+np = lb.np
+
+
+class LoanColumns:
+    """
+    Открытые выдачи в колоночном виде для передачи в процессы анализа.
+
+    Каждая выдача - строка в трех колонках array("i"): порядковый номер
+    даты возврата, код жанра и код ISBN. Строки жанров и ISBN хранятся
+    один раз в таблицах genres и isbns и в процессы не передаются:
+    процессы возвращают счетчики по кодам, которые переводятся в строки
+    при слиянии.
+    """
+    def __init__(self, due=None, genre_codes=None, isbn_codes=None, genres=(), isbns=()):
+        """
+        Инициализирует объект LoanColumns.
+
+        Args:
+            due: Колонка дат возврата (date.toordinal()).
+            genre_codes: Колонка кодов жанра (номер в genres).
+            isbn_codes: Колонка кодов ISBN (номер в isbns).
+            genres: Код жанра -> жанр.
+            isbns: Код ISBN -> ISBN.
+        """
+        self.due = due if due is not None else array("i")
+        self.genre_codes = genre_codes if genre_codes is not None else array("i")
+        self.isbn_codes = isbn_codes if isbn_codes is not None else array("i")
+        self.genres = list(genres)
+        self.isbns = list(isbns)
+
+    @classmethod
+    def from_library(cls, library):
+        """Собирает колонки из открытых выдач библиотеки."""
+        columns = cls()
+        genre_codes, isbn_codes = {}, {}
+        due, genres, isbns = columns.due, columns.genre_codes, columns.isbn_codes
+        for loan in library.loans:
+            book = loan.book
+            due.append(loan.due_date.toordinal())
+            genres.append(lb.InventoryColumns._code(book.genre, genre_codes, columns.genres))
+            isbns.append(lb.InventoryColumns._code(book.isbn, isbn_codes, columns.isbns))
+        return columns
+
+    def __len__(self):
+        """Возвращает количество выдач."""
+        return len(self.due)
+
+    def chunks(self, chunk_size):
+        """Перебирает аргументы _aggregate_chunk для частей колонок по chunk_size строк."""
+        for start in range(0, len(self.due), chunk_size):
+            end = start + chunk_size
+            yield (self.due[start:end].tobytes(), self.genre_codes[start:end].tobytes(),
+                   self.isbn_codes[start:end].tobytes(), len(self.genres), len(self.isbns))
+
+
+def synthetic_loan_columns(loans, titles=1_000_000, genres=20, days=120, seed=1):
+    """
+    Создает колонки выдач без объектов Loan (для замеров на десятках миллионов выдач).
+
+    Args:
+        loans: Количество выдач.
+        titles: Количество различных ISBN.
+        genres: Количество жанров.
+        days: Даты возврата равномерно распределены на days дней вокруг сегодняшней.
+        seed: Начальное значение генератора случайных чисел.
+    """
+    today = datetime.date.today().toordinal()
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        due = array("i", rng.integers(today - days // 2, today + days // 2, loans, dtype=np.int32).tobytes())
+        genre_codes = array("i", rng.integers(0, genres, loans, dtype=np.int32).tobytes())
+        isbn_codes = array("i", rng.integers(0, titles, loans, dtype=np.int32).tobytes())
+    else:
+        rng = random.Random(seed)
+        due = array("i", [today - days // 2 + int(rng.random() * days) for _ in range(loans)])
+        genre_codes = array("i", [int(rng.random() * genres) for _ in range(loans)])
+        isbn_codes = array("i", [int(rng.random() * titles) for _ in range(loans)])
+    return LoanColumns(due, genre_codes, isbn_codes, (f"Жанр {i}" for i in range(genres)),
+                       (f"isbn-{i}" for i in range(titles)))
+
+
+def _aggregate_chunk(due, genre_codes, isbn_codes, genre_count, isbn_count, as_of):
+    """
+    Считает частичные агрегаты по части колонок (выполняется в процессе пула).
+
+    Returns:
+        Тройка (количество просроченных выдач, байты array("q") выдач по кодам
+        жанра, байты array("i") выдач по кодам ISBN).
+    """
+    if np is not None:
+        due = np.frombuffer(due, dtype=np.int32)
+        overdue = int(np.count_nonzero(due < as_of))
+        by_genre = np.bincount(np.frombuffer(genre_codes, dtype=np.int32), minlength=genre_count)
+        by_isbn = np.bincount(np.frombuffer(isbn_codes, dtype=np.int32), minlength=isbn_count)
+        return overdue, by_genre.astype(np.int64).tobytes(), by_isbn.astype(np.int32).tobytes()
+    columns = array("i"), array("i"), array("i")
+    for column, data in zip(columns, (due, genre_codes, isbn_codes)):
+        column.frombytes(data)
+    due, genre_codes, isbn_codes = columns
+    overdue = sum(1 for value in due if value < as_of)
+    by_genre = array("q", bytes(8 * genre_count))
+    for code in genre_codes:
+        by_genre[code] += 1
+    by_isbn = array("i", bytes(4 * isbn_count))
+    for code in isbn_codes:
+        by_isbn[code] += 1
+    return overdue, by_genre.tobytes(), by_isbn.tobytes()
+
+
+class _CodeCounts:
+    """
+    Суммы частичных агрегатов по частям одного набора колонок.
+
+    Счетчики складываются по кодам в два массива (NumPy или array("q")),
+    поэтому слияние части стоит одного векторного сложения, а словари по
+    жанрам и ISBN строятся один раз, в LoanAnalytics._merge.
+    """
+    def __init__(self, columns):
+        """
+        Инициализирует нулевые суммы.
+
+        Args:
+            columns: Объект LoanColumns, к частям которого относятся агрегаты.
+        """
+        self.columns = columns
+        self.overdue = 0
+        if np is not None:
+            self.by_genre = np.zeros(len(columns.genres), dtype=np.int64)
+            self.by_isbn = np.zeros(len(columns.isbns), dtype=np.int64)
+        else:
+            self.by_genre = array("q", bytes(8 * len(columns.genres)))
+            self.by_isbn = array("q", bytes(8 * len(columns.isbns)))
+
+    def add(self, partial):
+        """Прибавляет частичные агрегаты одной части (результат _aggregate_chunk)."""
+        overdue, by_genre, by_isbn = partial
+        self.overdue += overdue
+        if np is not None:
+            self.by_genre += np.frombuffer(by_genre, dtype=np.int64)
+            self.by_isbn += np.frombuffer(by_isbn, dtype=np.int32)
+        else:
+            self.by_genre = array("q", map(operator.add, self.by_genre, array("q", by_genre)))
+            self.by_isbn = array("q", map(operator.add, self.by_isbn, array("i", by_isbn)))
+
+
+class LoanAnalytics:
+    """Сводные показатели по открытым выдачам одной или нескольких библиотек."""
+    def __init__(self):
+        """Инициализирует пустую сводку."""
+        self.active_loans = 0
+        self.overdue = 0
+        self.loans_by_genre = {}  # Жанр -> количество выдач
+        self.loans_by_isbn = {}   # ISBN -> количество выдач
+
+    def utilization(self, available):
+        """
+        Возвращает загрузку книг: доля выданных экземпляров среди всех экземпляров.
+
+        Args:
+            available: Отображение ISBN -> количество экземпляров в наличии.
+
+        Returns:
+            Словарь ISBN -> доля от 0 до 1 для книг, у которых есть открытые выдачи.
+        """
+        return {isbn: on_loan / (on_loan + available.get(isbn, 0))
+                for isbn, on_loan in self.loans_by_isbn.items()}
+
+    def _merge(self, counts):
+        """Добавляет суммы агрегатов одного набора колонок (_CodeCounts)."""
+        columns = counts.columns
+        self.overdue += counts.overdue
+        by_genre, by_isbn = counts.by_genre, counts.by_isbn
+        if np is not None:
+            # Словарь строится только по кодам с выдачами
+            isbn_codes = np.flatnonzero(by_isbn).tolist()
+            by_genre, by_isbn = by_genre.tolist(), by_isbn.tolist()
+        else:
+            isbn_codes = (code for code, count in enumerate(by_isbn) if count)
+        self.active_loans += sum(by_genre)
+        for genre, count in zip(columns.genres, by_genre):
+            if count:
+                self.loans_by_genre[genre] = self.loans_by_genre.get(genre, 0) + count
+        loans_by_isbn = self.loans_by_isbn
+        isbns = columns.isbns
+        for code in isbn_codes:
+            isbn = isbns[code]
+            loans_by_isbn[isbn] = loans_by_isbn.get(isbn, 0) + by_isbn[code]
+
+
+def analyze_columns(column_sets, as_of=None, workers=None, chunk_size=None):
+    """
+    Считает сводку по колонкам выдач, распределяя части по процессам.
+
+    Args:
+        column_sets: Объекты LoanColumns (например, по одному на библиотеку).
+        as_of: Дата проверки просрочки (по умолчанию сегодня).
+        workers: Количество процессов (по умолчанию os.cpu_count()); 1 - расчет в текущем процессе.
+        chunk_size: Строк в одной части (по умолчанию - чтобы на процесс пришлось около двух частей).
+
+    Returns:
+        Объект LoanAnalytics.
+    """
+    as_of = (as_of or datetime.date.today()).toordinal()
+    workers = workers or os.cpu_count() or 1
+    column_sets = list(column_sets)
+    if chunk_size is None:
+        total = sum(len(columns) for columns in column_sets)
+        chunk_size = max(1, -(-total // (2 * workers)))
+    sums = [_CodeCounts(columns) for columns in column_sets]
+    tasks = [(counts, chunk) for counts in sums for chunk in counts.columns.chunks(chunk_size)]
+    if workers == 1:
+        for counts, chunk in tasks:
+            counts.add(_aggregate_chunk(*chunk, as_of))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            futures = {pool.submit(_aggregate_chunk, *chunk, as_of): counts for counts, chunk in tasks}
+            # Частичные агрегаты складываются по мере готовности, пока остальные части еще считаются
+            for future in concurrent.futures.as_completed(futures):
+                futures[future].add(future.result())
+    result = LoanAnalytics()
+    for counts in sums:
+        result._merge(counts)
+    return result
+
+
+def analyze_libraries(libraries, as_of=None, workers=None, chunk_size=None):
+    """
+    Считает число просроченных выдач, выдачи по жанрам и загрузку книг по нескольким библиотекам.
+
+    Args:
+        libraries: Объекты Library.
+        as_of: Дата проверки просрочки (по умолчанию сегодня).
+        workers: Количество процессов.
+        chunk_size: Строк в одной части.
+
+    Returns:
+        Пара (LoanAnalytics, словарь ISBN -> загрузка).
+    """
+    libraries = list(libraries)
+    result = analyze_columns([LoanColumns.from_library(library) for library in libraries],
+                             as_of, workers, chunk_size)
+    available = {}
+    for isbn in result.loans_by_isbn:
+        available[isbn] = sum(library._catalog[isbn].quantity for library in libraries
+                              if isbn in library._catalog)
+    return result, result.utilization(available)
+
+
+def speedup_report(loans=50_000_000, titles=1_000_000, worker_counts=None):
+    """Печатает время расчета сводки на синтетических выдачах в зависимости от числа процессов."""
+    if worker_counts is None:
+        cores = os.cpu_count() or 1
+        worker_counts = sorted({1, *(n for n in (2, 4, 8, 16, 32) if n <= cores), cores})
+    start = time.perf_counter()
+    columns = synthetic_loan_columns(loans, titles)
+    # Число ядер в отчете: без него ускорение на машине с 1-2 ядрами выглядит как регрессия
+    print(f"Синтетические выдачи: {loans:,} выдач, {titles:,} книг "
+          f"(создание {time.perf_counter() - start:.1f} с, NumPy: {'да' if np is not None else 'нет'}, "
+          f"ядер: {os.cpu_count() or 1})")
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        result = analyze_columns([columns], workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  процессов {workers}: {elapsed:.2f} с, ускорение x{baseline / elapsed:.2f} "
+              f"(просрочено {result.overdue:,})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Параллельная аналитика выдач по филиалам (4LB.py).")
+    parser.add_argument("--loans", type=int, default=50_000_000)
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="*", default=None, help="Количества процессов для замера.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    speedup_report(args.loans, args.titles, args.workers)
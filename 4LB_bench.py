@@ -0,0 +1,586 @@
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import gc
+import importlib
+import io
+import itertools
+import json
+import logging
+import os
+import pickle
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+from functools import partial
+
+# Модуль лабораторной работы 4 (имя начинается с цифры, поэтому импорт через importlib)
+lb = importlib.import_module("4LB")
+
+
+class _DictAuthor:
+    """Автор с __dict__ (вариант до перехода на __slots__) для сравнения."""
+    def __init__(self, first_name, last_name, biography=""):
+        self.first_name = first_name
+        self.last_name = last_name
+        self.biography = biography
+
+
+class _DictBook:
+    """Книга с __dict__ и собственным объектом автора (вариант до перехода на __slots__)."""
+    def __init__(self, title, author, isbn, genre, quantity):
+        self.title = title
+        self.author = author
+        self.isbn = isbn
+        self.genre = genre
+        self.quantity = quantity
+
+
+def _make_compact_book(i, authors, genres):
+    """Создает книгу с __slots__ и интернированными автором и жанром."""
+    first_name, last_name = authors[i % len(authors)]
+    return lb.Book(f"Книга {i}", lb.intern_author(first_name, last_name),
+                   f"978-{i:010d}", genres[i % len(genres)], i % 7)
+
+
+def _make_dict_book(i, authors, genres):
+    """Создает книгу с __dict__, как было до перехода на __slots__."""
+    first_name, last_name = authors[i % len(authors)]
+    # Отдельная копия строки жанра, как при чтении каждой строки из файла
+    genre = "".join(genres[i % len(genres)])
+    return _DictBook(f"Книга {i}", _DictAuthor(first_name, last_name), f"978-{i:010d}", genre, i % 7)
+
+
+def measure_bytes_per_book(factory, sample):
+    """
+    Измеряет память на одну книгу вместе с записью в каталоге (ISBN: Book).
+
+    Args:
+        factory: Функция (номер, авторы, жанры) -> книга.
+        sample: Количество книг в выборке.
+
+    Returns:
+        Среднее количество байт на книгу.
+    """
+    authors = [(f"Имя{i}", f"Фамилия{i}") for i in range(1000)]
+    genres = ["Фэнтези", "Детектив", "Роман", "Поэзия", "Фантастика"]
+    gc.collect()
+    tracemalloc.start()
+    catalog = {}
+    for i in range(sample):
+        book = factory(i, authors, genres)
+        catalog[book.isbn] = book
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del catalog
+    return used / sample
+
+
+def memory_report(sample=200_000, scales=(1_000_000, 10_000_000)):
+    """
+    Печатает отчет о памяти на книгу и оценку для заданных размеров каталога.
+
+    Память измеряется на выборке из sample книг и экстраполируется линейно.
+    """
+    rows = [("__dict__, свой Author", measure_bytes_per_book(_make_dict_book, sample)),
+            ("__slots__, интернирование", measure_bytes_per_book(_make_compact_book, sample))]
+    print(f"Память на книгу (выборка {sample} книг, включая строки и запись каталога):")
+    for name, per_book in rows:
+        estimates = ", ".join(f"{scale:,} книг ~ {per_book * scale / 2 ** 20:,.0f} МиБ" for scale in scales)
+        print(f"  {name}: {per_book:.0f} байт/книга; {estimates}")
+
+
+def _circulation_library(titles, copies, readers):
+    """Создает библиотеку с titles книгами по copies экземпляров и readers читателями."""
+    library = lb.Library("Стресс-тест", "—")
+    author = lb.intern_author("Имя", "Фамилия")
+    books = [lb.Book(f"Книга {i}", author, f"isbn-{i}", "Роман", copies) for i in range(titles)]
+    people = [lb.Reader("Читатель", str(i), f"r{i}") for i in range(readers)]
+    library.import_books(books)
+    for reader in people:
+        library.add_reader(reader)
+    return library, books, people
+
+
+def stress_concurrent_lending(threads=8, titles=4, copies=3, operations=20_000, seed=1):
+    """
+    Стресс-тест одновременной выдачи и возврата книг из нескольких потоков.
+
+    Потоки выдают и возвращают немногочисленные книги с малым числом экземпляров,
+    чтобы чаще конкурировать за последний экземпляр. Проверяется, что количество
+    экземпляров не становится отрицательным ни во время работы (наблюдающий поток),
+    ни после нее, и что экземпляры в наличии плюс открытые выдачи равны исходному количеству.
+
+    Returns:
+        Количество операций в секунду.
+    """
+    library, books, people = _circulation_library(titles, copies, threads)
+    due_date = datetime.date.today() + datetime.timedelta(days=14)
+    negative = []
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            negative.extend(book.isbn for book in books if book.quantity < 0)
+
+    def desk(reader, rng):
+        for _ in range(operations // threads):
+            book = rng.choice(books)
+            if rng.random() < 0.5:
+                library.lend_book(book, reader, due_date)
+            else:
+                library.return_book(book, reader)
+
+    workers = [threading.Thread(target=desk, args=(reader, random.Random(seed + i)))
+               for i, reader in enumerate(people)]
+    watcher = threading.Thread(target=watch)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # Частые переключения потоков повышают конкуренцию
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            watcher.start()
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            done.set()
+            watcher.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert not negative, f"Отрицательное количество экземпляров: {sorted(set(negative))}"
+    for book in books:
+        on_loan = sum(library.loans.count(book, reader) for reader in people)
+        assert book.quantity >= 0, book
+        assert book.quantity + on_loan == copies, (book, book.quantity, on_loan)
+    return (operations // threads) * threads / elapsed
+
+
+def throughput_report(thread_counts=(1, 2, 4, 8), titles=1000, operations=100_000):
+    """Печатает пропускную способность выдачи/возврата в зависимости от числа потоков."""
+    print(f"Выдача/возврат, {titles} книг, {operations} операций:")
+    for threads in thread_counts:
+        rate = stress_concurrent_lending(threads, titles=titles, copies=2, operations=operations)
+        print(f"  потоков {threads}: {rate:,.0f} опер./с")
+
+
+def _raising_lend(library, book, reader, due_date):
+    """Выдача книги в прежнем виде: отказ выбрасывает исключение и тут же ловит его ради сообщения."""
+    try:
+        with library._lock_for(book.isbn):
+            if book not in library.books:
+                raise lb.BookNotFound(f"Книга '{book.title}' не найдена в библиотеке.")
+            if reader.reader_id not in library._reader_database:
+                raise lb.ReaderNotFound(f"Читатель '{reader.first_name} {reader.last_name}' не найден в библиотеке.")
+            if book.quantity <= 0:
+                raise lb.BookUnavailable(f"Книга '{book.title}' недоступна для выдачи.")
+            loan = library._open_loan(book, reader, datetime.date.today(), due_date)
+        logging.info(f"Книга '{book.title}' выдана читателю '{reader.first_name} {reader.last_name}'.")
+        return loan
+    except lb.BookError as e:
+        logging.error(f"Ошибка: {e}")
+        print(f"Ошибка: {e}")
+    except lb.ReaderError as e:
+        logging.error(f"Ошибка: {e}")
+        print(f"Ошибка: {e}")
+    finally:
+        logging.debug("Завершение операции выдачи книги.")
+
+
+def _failing_workload(calls, failure_rate, seed=1):
+    """
+    Создает библиотеку и список выдач (книга, читатель), из которых доля failure_rate
+    завершится отказом: поровну нет экземпляров, неизвестная книга и неизвестный читатель.
+    """
+    library, books, people = _circulation_library(titles=100, copies=10 ** 9, readers=100)
+    author = lb.intern_author("Имя", "Фамилия")
+    empty = lb.Book("Нет в наличии", author, "isbn-empty", "Роман", 0)
+    library.add_book(empty)
+    missing_book = lb.Book("Нет в каталоге", author, "isbn-missing", "Роман", 1)
+    missing_reader = lb.Reader("Нет", "Читателя", "r-missing")
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(calls):
+        book, reader = rng.choice(books), rng.choice(people)
+        if rng.random() < failure_rate:
+            kind = rng.randrange(3)
+            if kind == 0:
+                book = empty
+            elif kind == 1:
+                book = missing_book
+            else:
+                reader = missing_reader
+        workload.append((book, reader))
+    return library, workload
+
+
+def result_codes_report(calls=100_000, failure_rate=0.3):
+    """
+    Печатает время выдачи при доле отказов failure_rate: прежний вариант с исключениями,
+    lend_book и try_lend. Логирование отключено, вывод в консоль перенаправлен.
+    """
+    due_date = datetime.date.today() + datetime.timedelta(days=14)
+    variants = (("исключения (прежний lend_book)", lambda library: partial(_raising_lend, library)),
+                ("lend_book", lambda library: library.lend_book),
+                ("try_lend", lambda library: library.try_lend))
+    print(f"Выдача: {calls:,} вызовов, доля отказов {failure_rate:.0%}:")
+    for name, bind in variants:
+        library, workload = _failing_workload(calls, failure_rate)
+        lend = bind(library)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for book, reader in workload:
+                lend(book, reader, due_date)
+            elapsed = time.perf_counter() - start
+        print(f"  {name}: {elapsed * 1e9 / calls:,.0f} нс/вызов")
+
+
+def _write_synthetic_journal(directory, events, titles, readers, seed=1):
+    """
+    Записывает журнал из events событий: добавление titles книг и readers читателей,
+    затем чередование выдач и возвратов.
+    """
+    journal = lb.CirculationJournal(directory, group_size=4096, group_interval=None, snapshot_every=None, fsync=False)
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    for i in range(titles):
+        journal.append(journal.ADD_BOOK, f"Книга {i}", "Имя", f"Автор {i % 1000}", "", f"isbn-{i}", "Роман", 5)
+    for i in range(readers):
+        journal.append(journal.ADD_READER, "Читатель", str(i), f"r{i}")
+    open_loans = []
+    for _ in range(events - titles - readers):
+        if open_loans and (len(open_loans) > 100_000 or rng.random() < 0.45):
+            isbn, reader_id = open_loans.pop(rng.randrange(len(open_loans)))
+            journal.append(journal.RETURN, isbn, reader_id)
+        else:
+            loan = (f"isbn-{rng.randrange(titles)}", f"r{rng.randrange(readers)}")
+            open_loans.append(loan)
+            journal.append(journal.LEND, *loan, today, today + datetime.timedelta(days=14))
+    journal.close()
+
+
+def recovery_report(events=1_000_000, tail=0.1):
+    """
+    Печатает время восстановления библиотеки из журнала из events событий:
+    полное применение журнала и восстановление из снимка плюс хвост из tail*events событий.
+    """
+    titles, readers = max(1, events // 20), max(1, events // 100)
+    directory = tempfile.mkdtemp(prefix="4lb-journal-")
+    try:
+        _write_synthetic_journal(directory, events, titles, readers)
+        size = os.path.getsize(os.path.join(directory, "journal-0.log"))
+        start = time.perf_counter()
+        library = lb.Library.recover("Восстановление", "—", directory, group_interval=None, snapshot_every=None)
+        full = time.perf_counter() - start
+        print(f"Журнал: {events:,} событий, {size / 2 ** 20:,.1f} МиБ")
+        print(f"  полное применение журнала: {full:.2f} с ({events / full:,.0f} событий/с)")
+
+        library.checkpoint()
+        journal = library._journal
+        rng = random.Random(2)
+        today = datetime.date.today()
+        for _ in range(int(events * tail)):
+            journal.append(journal.LEND, f"isbn-{rng.randrange(titles)}", f"r{rng.randrange(readers)}",
+                           today, today + datetime.timedelta(days=14))
+        journal.close()
+        start = time.perf_counter()
+        lb.Library.recover("Восстановление", "—", directory, group_interval=None, snapshot_every=None)._journal.close()
+        print(f"  снимок + хвост {tail:.0%} журнала: {time.perf_counter() - start:.2f} с")
+    finally:
+        shutil.rmtree(directory)
+
+
+def snapshot_report(books=1_000_000, loans=200_000, readers=100_000, seed=1):
+    """Печатает время и размер колоночного снимка (save_snapshot/load_snapshot) в сравнении с pickle."""
+    rng = random.Random(seed)
+    library = lb.Library("Снимок", "—")
+    authors = [lb.intern_author("Имя", f"Фамилия {i}") for i in range(max(1, books // 10))]
+    for i in range(books):
+        library._register_book(lb.Book(f"Книга {i}", authors[i // 10], f"isbn-{i}", f"Жанр {i % 20}", 3))
+    for i in range(readers):
+        library._reader_database[f"r{i}"] = lb.Reader("Читатель", str(i), f"r{i}")
+    catalog, reader_list = list(library._catalog.values()), list(library._reader_database.values())
+    today = datetime.date.today()
+    for i in range(loans):
+        book = catalog[rng.randrange(books)]
+        if book.quantity > 0:
+            library._open_loan(book, reader_list[i % readers], today, today + datetime.timedelta(days=rng.randrange(60)))
+    print(f"Библиотека: {books:,} книг, {readers:,} читателей, {len(library.loans):,} выдач")
+    directory = tempfile.mkdtemp(prefix="4lb-snapshot-")
+    try:
+        path = os.path.join(directory, "library.snap")
+        start = time.perf_counter()
+        library.save_snapshot(path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        lb.Library.load_snapshot(path)
+        loaded = time.perf_counter() - start
+        print(f"  колоночный снимок: запись {saved:.2f} с, чтение {loaded:.2f} с, "
+              f"{os.path.getsize(path) / 2 ** 20:,.1f} МиБ")
+        state = (library._catalog, library._reader_database, list(library.loans))
+        start = time.perf_counter()
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        pickle.loads(data)
+        loaded = time.perf_counter() - start
+        print(f"  pickle объектов:   запись {saved:.2f} с, чтение {loaded:.2f} с, {len(data) / 2 ** 20:,.1f} МиБ")
+    finally:
+        shutil.rmtree(directory)
+
+
+_TITLE_WORDS = ("Тайна", "Песнь", "Дорога", "Город", "Сад", "Ночь", "Море", "Ветер", "Дом", "Звезда",
+                "Последний", "Старый", "Белый", "Золотой", "Тихий", "Долгий", "Северный", "Забытый")
+_GENRES = ("Фэнтези", "Детектив", "Роман", "Поэзия", "Фантастика", "История", "Наука", "Детская")
+
+
+class SyntheticDataset:
+    """
+    Детерминированный синтетический набор данных для замеров.
+
+    При одинаковых scale и seed создаются одни и те же авторы, книги,
+    читатели и выдачи: scale книг, scale // 10 авторов и читателей,
+    scale // 2 выдач (номер книги, номер читателя, срок в днях).
+    """
+    def __init__(self, scale, seed=1):
+        """
+        Создает набор данных.
+
+        Args:
+            scale: Количество книг.
+            seed: Начальное значение генератора случайных чисел.
+        """
+        rng = random.Random(seed)
+        self.scale = scale
+        self.seed = seed
+        self.authors = [lb.intern_author(f"Имя{i}", f"Фамилия{i}") for i in range(max(1, scale // 10))]
+        self.books = [lb.Book(f"{rng.choice(_TITLE_WORDS)} {rng.choice(_TITLE_WORDS).lower()} {i}",
+                              rng.choice(self.authors), f"978-{i:010d}", rng.choice(_GENRES), 1 + rng.randrange(4))
+                      for i in range(scale)]
+        self.readers = [lb.Reader("Читатель", str(i), f"r{i}") for i in range(max(1, scale // 10))]
+        loans = max(1, scale // 2)
+        self.loan_books = array("i", (rng.randrange(scale) for _ in range(loans)))
+        self.loan_readers = array("i", (rng.randrange(len(self.readers)) for _ in range(loans)))
+        self.loan_days = array("i", (rng.randrange(-30, 60) for _ in range(loans)))
+        # ISBN для поиска: половина есть в каталоге, половина отсутствует
+        self.lookups = [f"978-{rng.randrange(2 * scale):010d}" for _ in range(min(scale, 1_000_000))]
+
+
+class _NullWriter:
+    """Поток вывода, отбрасывающий все данные (для замера display_books без затрат на хранение текста)."""
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def _latency_summary(latencies_ns, elapsed, errors=0):
+    """Возвращает сводку по задержкам вызовов (в микросекундах) и пропускной способности."""
+    values = sorted(latencies_ns)
+    count = len(values)
+
+    def percentile(fraction):
+        return round(values[min(count - 1, int(fraction * count))] / 1000, 3) if values else 0.0
+
+    return {"count": count, "errors": errors, "ops_per_s": round(count / elapsed, 1) if elapsed else 0.0,
+            "p50_us": percentile(0.50), "p95_us": percentile(0.95), "p99_us": percentile(0.99),
+            "max_us": round(values[-1] / 1000, 3) if values else 0.0}
+
+
+def _timed(calls):
+    """
+    Выполняет вызовы и замеряет задержку каждого.
+
+    Args:
+        calls: Итерируемый объект функций без аргументов; результат None считается ошибкой.
+
+    Returns:
+        Сводка _latency_summary.
+    """
+    latencies = array("q")
+    errors = 0
+    clock = time.perf_counter_ns
+    start = clock()
+    for call in calls:
+        before = clock()
+        result = call()
+        latencies.append(clock() - before)
+        if result is None:
+            errors += 1
+    return _latency_summary(latencies, (clock() - start) / 1e9, errors)
+
+
+def run_scale(scale, seed=1, pages=1000, page_size=100):
+    """
+    Замеряет операции библиотеки на наборе данных размера scale.
+
+    Returns:
+        Словарь: сводки по операциям add_book, add_reader, lookup, display_books,
+        lend_book, return_book и пиковая память процесса (МиБ).
+    """
+    logging.disable(logging.CRITICAL)
+    start = time.perf_counter()
+    data = SyntheticDataset(scale, seed)
+    result = {"generate_s": round(time.perf_counter() - start, 3)}
+    library = lb.Library("Замеры", "—")
+    catalog = library._catalog
+    today = datetime.date.today()
+    lent = []
+
+    def add_book(book):
+        library.add_book(book)
+        return True
+
+    def add_reader(reader):
+        library.add_reader(reader)
+        return True
+
+    def display_page(cursor):
+        library.display_books(start_after=cursor, limit=page_size)
+        return True
+
+    def lend(position):
+        book = data.books[data.loan_books[position]]
+        reader = data.readers[data.loan_readers[position]]
+        loan = library.lend_book(book, reader, today + datetime.timedelta(days=data.loan_days[position]))
+        if loan is not None:
+            lent.append((book, reader))
+        return loan
+
+    with contextlib.redirect_stdout(_NullWriter()):
+        result["add_book"] = _timed(partial(add_book, book) for book in data.books)
+        result["add_reader"] = _timed(partial(add_reader, reader) for reader in data.readers)
+        result["lookup"] = _timed(partial(catalog.get, isbn, False) for isbn in data.lookups)
+        # Курсоры страниц (последняя книга предыдущей страницы) вычисляются до замера;
+        # последняя книга каталога курсором не становится: страница после нее пуста
+        stop = min(page_size * (pages - 1), len(catalog) - 1)
+        keys = itertools.islice(library.title_index.iter_keys(), page_size - 1, max(stop, 0), page_size)
+        cursors = [None] + [catalog[isbn] for _, isbn in keys]
+        result["display_books"] = _timed(partial(display_page, cursor) for cursor in cursors)
+        result["lend_book"] = _timed(partial(lend, position) for position in range(len(data.loan_books)))
+        random.Random(seed).shuffle(lent)
+        result["return_book"] = _timed(partial(library.return_book, book, reader) for book, reader in lent)
+    result["peak_rss_mib"] = _peak_rss_mib()
+    return result
+
+
+def _peak_rss_mib():
+    """Возвращает пиковый объем памяти процесса в МиБ или None, если модуля resource нет (Windows)."""
+    try:
+        import resource  # Только POSIX
+    except ImportError:
+        return None
+    # ru_maxrss в Linux - в килобайтах, в macOS - в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 1024), 1)
+
+
+def benchmark_suite(scales=(1_000, 10_000, 100_000, 1_000_000), seed=1):
+    """
+    Выполняет замеры для каждого размера в отдельном процессе (чтобы пиковая память не накапливалась).
+
+    Returns:
+        Словарь с описанием окружения ("meta") и результатами по размерам ("results").
+    """
+    report = {"meta": {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "cpu_count": os.cpu_count(), "numpy": lb.np is not None, "seed": seed},
+              "results": {}}
+    for scale in scales:
+        with concurrent.futures.ProcessPoolExecutor(1) as pool:
+            result = pool.submit(run_scale, scale, seed).result()
+        report["results"][str(scale)] = result
+        print(f"{scale:>12,} книг: " + ", ".join(
+            f"{op} {result[op]['ops_per_s']:,.0f}/с p99 {result[op]['p99_us']:,.1f} мкс"
+            for op in ("add_book", "lookup", "lend_book", "return_book", "display_books"))
+            + (f", пик {result['peak_rss_mib']:,.0f} МиБ" if result["peak_rss_mib"] is not None else ""))
+    return report
+
+
+def compare_reports(previous, current, tolerance=0.2):
+    """
+    Сравнивает два отчета benchmark_suite.
+
+    Регрессией считается падение пропускной способности или рост p99
+    более чем на долю tolerance, а также рост пиковой памяти на ту же долю.
+
+    Returns:
+        Список строк с описанием регрессий.
+    """
+    regressions = []
+    for scale, result in current["results"].items():
+        old = previous.get("results", {}).get(scale)
+        if old is None:
+            continue
+        for op, summary in result.items():
+            before = old.get(op)
+            if not isinstance(summary, dict) or not isinstance(before, dict):
+                continue
+            if before["ops_per_s"] and summary["ops_per_s"] < before["ops_per_s"] * (1 - tolerance):
+                regressions.append(f"{scale} {op}: {before['ops_per_s']:,.0f} -> {summary['ops_per_s']:,.0f} опер./с")
+            if before["p99_us"] and summary["p99_us"] > before["p99_us"] * (1 + tolerance):
+                regressions.append(f"{scale} {op}: p99 {before['p99_us']:,.1f} -> {summary['p99_us']:,.1f} мкс")
+        peak, old_peak = result.get("peak_rss_mib"), old.get("peak_rss_mib")
+        if old_peak and peak is not None and peak > old_peak * (1 + tolerance):
+            regressions.append(f"{scale} память: {old_peak:,.0f} -> {peak:,.0f} МиБ")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности библиотеки (4LB.py).")
+    parser.add_argument("report", nargs="?", default="memory",
+                        choices=("memory", "threads", "recovery", "results", "suite", "snapshot"),
+                        help="Отчет: память на книгу, многопоточная выдача, восстановление из журнала, "
+                             "выдача с отказами (исключения против try_lend), набор замеров по размерам "
+                             "или колоночный снимок против pickle.")
+    parser.add_argument("--sample", type=int, default=200_000, help="Размер выборки для замера памяти.")
+    parser.add_argument("--events", type=int, default=1_000_000, help="Количество событий журнала.")
+    parser.add_argument("--books", type=int, default=1_000_000, help="Количество книг для замера снимка.")
+    parser.add_argument("--loans", type=int, default=200_000, help="Количество выдач для замера снимка.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="Размеры каталога для набора замеров (до 10 000 000).")
+    parser.add_argument("--seed", type=int, default=1, help="Начальное значение генератора данных.")
+    parser.add_argument("--output", default=None, help="Файл JSON с результатами набора замеров "
+                                                        "(по умолчанию bench-results/<дата-время>.json).")
+    parser.add_argument("--compare", default=None, help="Файл JSON предыдущего запуска для поиска регрессий.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (доля).")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    if args.report == "memory":
+        memory_report(args.sample)
+    elif args.report == "recovery":
+        recovery_report(args.events)
+    elif args.report == "results":
+        result_codes_report()
+    elif args.report == "snapshot":
+        snapshot_report(args.books, args.loans)
+    elif args.report == "suite":
+        report = benchmark_suite(args.scales, args.seed)
+        output = args.output or os.path.join(
+            "bench-results", datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {output}")
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as file:
+                regressions = compare_reports(json.load(file), report, args.tolerance)
+            for line in regressions:
+                print(f"  регрессия: {line}")
+            print(f"Регрессий: {len(regressions)}")
+            if regressions:
+                sys.exit(1)
+    else:
+        stress_concurrent_lending()
+        print("Стресс-тест: количество экземпляров ни разу не стало отрицательным.")
+        throughput_report()
@@ -0,0 +1,664 @@
+import argparse
+import bisect
+import contextlib
+import datetime
+import hashlib
+import importlib
+import io
+import logging
+import multiprocessing
+import threading
+import time
+
+# Модуль лабораторной работы 4 (имя начинается с цифры, поэтому импорт через importlib)
+lb = importlib.import_module("4LB")
+
+
+def _ring_hash(key):
+    """Возвращает 64-битный хеш строки, одинаковый во всех процессах (в отличие от hash())."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Кольцо согласованного хеширования.
+
+    Каждый узел занимает vnodes точек на кольце; ключ принадлежит узлу
+    первой точки по часовой стрелке от хеша ключа. При добавлении узла
+    к нему переходит примерно 1/(n+1) ключей, остальные остаются на месте.
+    """
+    def __init__(self, vnodes=128, nodes=()):
+        """
+        Инициализирует кольцо.
+
+        Args:
+            vnodes: Количество точек на кольце для одного узла.
+            nodes: Начальные узлы.
+        """
+        self.vnodes = vnodes
+        self._points = []  # Отсортированные хеши точек
+        self._owners = []  # Узел каждой точки
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """Добавляет узел на кольцо."""
+        for i in range(self.vnodes):
+            point = _ring_hash(f"{node}#{i}")
+            position = bisect.bisect_left(self._points, point)
+            self._points.insert(position, point)
+            self._owners.insert(position, node)
+
+    def remove(self, node):
+        """Удаляет узел с кольца."""
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def owner(self, key):
+        """Возвращает узел, которому принадлежит ключ; KeyError, если кольцо пусто."""
+        if not self._points:
+            raise KeyError(key)
+        position = bisect.bisect_right(self._points, _ring_hash(key))
+        return self._owners[position % len(self._points)]
+
+    def copy(self):
+        """Возвращает копию кольца."""
+        ring = HashRing(self.vnodes)
+        ring._points = list(self._points)
+        ring._owners = list(self._owners)
+        return ring
+
+    def __contains__(self, node):
+        """Проверяет, есть ли узел на кольце."""
+        return node in self._owners
+
+    def __len__(self):
+        """Возвращает количество узлов."""
+        return len(set(self._owners))
+
+
+# Операции филиала: функция (library, *аргументы) -> результат. Аргументы и
+# результаты передаются между процессами через pickle, поэтому это простые
+# значения и копии объектов Book/Reader/Loan.
+
+def _find_book(library, isbn):
+    """Возвращает книгу филиала по ISBN или None."""
+    return library._catalog.get(isbn)
+
+
+def _find_books(library, isbns):
+    """Возвращает список книг (или None) для списка ISBN."""
+    catalog = library._catalog
+    return [catalog.get(isbn) for isbn in isbns]
+
+
+def _add_book(library, book):
+    """Добавляет книгу в филиал."""
+    return library.try_add_book(book)
+
+
+def _remove_book(library, isbn):
+    """Удаляет книгу филиала по ISBN."""
+    book = library._catalog.get(isbn)
+    if book is None:
+        return lb._FAILED_RESULTS[lb.OpStatus.BOOK_NOT_FOUND]
+    return library.try_remove_book(book)
+
+
+def _import_books(library, rows):
+    """Импортирует строки каталога в филиал; возвращает ImportReport."""
+    return library.import_books(rows)
+
+
+def _add_readers(library, readers):
+    """Регистрирует читателей в филиале (уже зарегистрированные пропускаются)."""
+    for reader in readers:
+        library.try_add_reader(reader)
+
+
+def _remove_reader(library, reader_id):
+    """Удаляет читателя из филиала."""
+    reader = library._reader_database.get(reader_id)
+    if reader is not None:
+        library.try_remove_reader(reader)
+
+
+def _lend(library, isbn, reader_id, due_date):
+    """Выдает книгу читателю по ISBN и reader_id."""
+    book = library._catalog.get(isbn)
+    if book is None:
+        return lb._FAILED_RESULTS[lb.OpStatus.BOOK_NOT_FOUND]
+    reader = library._reader_database.get(reader_id)
+    if reader is None:
+        return lb._FAILED_RESULTS[lb.OpStatus.READER_NOT_FOUND]
+    return library.try_lend(book, reader, due_date)
+
+
+def _return(library, isbn, reader_id):
+    """Принимает возврат книги по ISBN и reader_id."""
+    book = library._catalog.get(isbn)
+    reader = library._reader_database.get(reader_id)
+    if book is None or reader is None:
+        return lb._FAILED_RESULTS[lb.OpStatus.NOT_LENT]
+    return library.try_return(book, reader)
+
+
+def _sizes(library):
+    """Возвращает пару (количество книг, количество открытых выдач)."""
+    return len(library._catalog), len(library.loans)
+
+
+def _export_moved(library, ring, new_ring, name):
+    """
+    Собирает книги филиала name, которые по кольцу new_ring переходят к другому
+    филиалу, вместе с их открытыми выдачами, экземплярами и очередями
+    резервирования, не изменяя филиал. Книги, которые уже и по прежнему кольцу
+    ring принадлежали другим филиалам (остатки прерванного переноса), не собираются.
+
+    Returns:
+        Кортеж Library._export_books или None, если переносить нечего.
+    """
+    with library._paused():
+        moved = [book for isbn, book in library._catalog.items()
+                 if ring.owner(isbn) == name and new_ring.owner(isbn) != name]
+        if not moved:
+            return None
+        return library._export_books(moved)
+
+
+def _drop_moved(library, ring, name):
+    """Изымает из филиала name книги, которые по кольцу ring принадлежат другим филиалам; возвращает их количество."""
+    with library._paused():
+        moved = [book for isbn, book in library._catalog.items() if ring.owner(isbn) != name]
+        library._drop_books(moved)
+        return len(moved)
+
+
+def _attach(library, transfer):
+    """Заносит в филиал книги, собранные в другом филиале (см. _export_moved)."""
+    library._attach_books(transfer)
+
+
+_SHARD_OPS = {
+    "find_book": _find_book,
+    "find_books": _find_books,
+    "add_book": _add_book,
+    "remove_book": _remove_book,
+    "import_books": _import_books,
+    "add_readers": _add_readers,
+    "remove_reader": _remove_reader,
+    "lend": _lend,
+    "return": _return,
+    "sizes": _sizes,
+    "export_moved": _export_moved,
+    "drop_moved": _drop_moved,
+    "attach": _attach,
+}
+
+
+class LocalShard:
+    """Филиал сети, работающий в текущем процессе."""
+    def __init__(self, name, address, library_type="Public"):
+        """
+        Инициализирует объект LocalShard.
+
+        Args:
+            name: Название филиала (уникально в сети).
+            address: Адрес филиала.
+            library_type: Тип библиотеки.
+        """
+        self.name = name
+        self.library = lb.Library(name, address, library_type)
+        self._pending = None
+
+    def call(self, op, *args):
+        """Выполняет операцию филиала и возвращает результат."""
+        return _SHARD_OPS[op](self.library, *args)
+
+    def send(self, op, *args):
+        """Начинает операцию (для единообразия с ProcessShard выполняется сразу)."""
+        self._pending = self.call(op, *args)
+
+    def receive(self):
+        """Возвращает результат операции, начатой send."""
+        result, self._pending = self._pending, None
+        return result
+
+    def close(self):
+        """Ничего не делает: локальному филиалу нечего останавливать."""
+
+
+def _shard_worker(connection, name, address, library_type):
+    """Цикл процесса филиала: принимает операции из канала и отправляет результаты."""
+    logging.disable(logging.CRITICAL)
+    library = lb.Library(name, address, library_type)
+    # Сообщения об отказах, которые Library выводит в консоль, не нужны в процессе филиала
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            try:
+                op, args = connection.recv()
+            except EOFError:
+                break
+            if op is None:
+                break
+            try:
+                connection.send((True, _SHARD_OPS[op](library, *args)))
+            except Exception as e:
+                connection.send((False, e))
+    connection.close()
+
+
+class ProcessShard:
+    """
+    Филиал сети, работающий в отдельном процессе.
+
+    Операции передаются по каналу multiprocessing.Pipe; книги, читатели и
+    выдачи, возвращаемые операциями, - копии объектов процесса филиала.
+    """
+    def __init__(self, name, address, library_type="Public", context=None):
+        """
+        Запускает процесс филиала.
+
+        Args:
+            name: Название филиала (уникально в сети).
+            address: Адрес филиала.
+            library_type: Тип библиотеки.
+            context: Контекст multiprocessing (по умолчанию - контекст по умолчанию).
+        """
+        self.name = name
+        context = context or multiprocessing.get_context()
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_shard_worker, args=(child, name, address, library_type),
+                                        name=f"shard-{name}", daemon=True)
+        self._process.start()
+        child.close()
+        # Запрос и ответ по каналу должны идти парой
+        self._lock = threading.Lock()
+
+    def send(self, op, *args):
+        """Отправляет операцию в процесс филиала, не дожидаясь результата (захватывает канал)."""
+        self._lock.acquire()
+        try:
+            self._connection.send((op, args))
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def receive(self):
+        """Дожидается результата операции, отправленной send, и освобождает канал."""
+        try:
+            ok, result = self._connection.recv()
+        finally:
+            self._lock.release()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, op, *args):
+        """Выполняет операцию в процессе филиала и возвращает результат."""
+        self.send(op, *args)
+        return self.receive()
+
+    def close(self):
+        """Останавливает процесс филиала."""
+        with self._lock:
+            with contextlib.suppress(OSError):
+                self._connection.send((None, ()))
+            self._connection.close()
+        self._process.join()
+
+
+class RoutingLock:
+    """
+    Блокировка маршрутизации сети: операции, направляемые по кольцу, захватывают
+    ее совместно и выполняются параллельно, а изменение состава филиалов -
+    монопольно. Ожидающий монопольный захват не пропускает новые совместные,
+    поэтому add_branch не ждет бесконечно под потоком операций.
+    """
+    def __init__(self):
+        """Инициализирует свободную блокировку."""
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextlib.contextmanager
+    def shared(self):
+        """Захватывает блокировку совместно (повторный захват тем же потоком не поддерживается)."""
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Захватывает блокировку монопольно."""
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class LibraryNetwork:
+    """
+    Сеть филиалов, между которыми каталог распределен по ISBN.
+
+    Владелец каждой книги определяется согласованным хешированием ISBN
+    (HashRing), поэтому поиск, выдача и возврат направляются ровно в
+    один филиал. Читатели регистрируются во всех филиалах. При добавлении
+    филиала к нему переносятся только книги, перешедшие к нему по кольцу,
+    вместе с их открытыми выдачами, экземплярами и очередями
+    резервирования. Филиалы могут работать в отдельных
+    процессах (processes=True); пакетные операции рассылаются всем
+    филиалам сразу и выполняются параллельно.
+
+    Операции сети захватывают RoutingLock совместно, а add_branch - монопольно,
+    поэтому операция не направляется по кольцу, которое меняется в этот момент.
+    """
+    def __init__(self, processes=False, vnodes=128, context=None):
+        """
+        Инициализирует пустую сеть.
+
+        Args:
+            processes: Запускать филиалы в отдельных процессах.
+            vnodes: Количество точек филиала на кольце.
+            context: Контекст multiprocessing для процессов филиалов.
+        """
+        self.processes = processes
+        self.ring = HashRing(vnodes)
+        self._context = context
+        self._branches = {}  # Название -> LocalShard или ProcessShard
+        self._readers = {}   # reader_id -> Reader (копия для регистрации в новых филиалах)
+        self._routing = RoutingLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Останавливает процессы филиалов."""
+        with self._routing.exclusive():
+            for shard in self._branches.values():
+                shard.close()
+            self._branches.clear()
+
+    @property
+    def branches(self):
+        """Названия филиалов в порядке добавления."""
+        return list(self._branches)
+
+    def library(self, name):
+        """Возвращает объект Library филиала (только для филиалов в текущем процессе)."""
+        shard = self._branches[name]
+        if not isinstance(shard, LocalShard):
+            raise TypeError(f"Филиал '{name}' работает в отдельном процессе.")
+        return shard.library
+
+    def owner(self, isbn):
+        """Возвращает название филиала, которому принадлежит книга с данным ISBN."""
+        return self.ring.owner(isbn)
+
+    def _call_owner(self, isbn, op, *args):
+        """Выполняет операцию в филиале-владельце ISBN."""
+        with self._routing.shared():
+            return self._branches[self.ring.owner(isbn)].call(op, *args)
+
+    def _scatter(self, requests):
+        """
+        Выполняет операции в нескольких филиалах параллельно.
+
+        Args:
+            requests: Словарь название филиала -> (операция, *аргументы).
+
+        Returns:
+            Словарь название филиала -> результат.
+        """
+        sent = []
+        try:
+            # Каналы захватываются в порядке добавления филиалов, что исключает взаимоблокировки
+            for name, shard in self._branches.items():
+                if name in requests:
+                    shard.send(*requests[name])
+                    sent.append(name)
+        finally:
+            results = {}
+            error = None
+            for name in sent:
+                try:
+                    results[name] = self._branches[name].receive()
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def add_branch(self, name, address, library_type="Public"):
+        """
+        Добавляет филиал и переносит в него книги, которые теперь принадлежат ему по кольцу.
+
+        Перенос выполняется копированием с фиксацией: новый филиал сначала
+        получает копии книг с их выдачами, экземплярами и резервированиями,
+        затем сеть переключается на новое кольцо, и только после этого прежние
+        владельцы изымают свои книги. Если копирование не удалось, новый филиал
+        останавливается, а прежние филиалы остаются без изменений.
+
+        Args:
+            name: Название филиала (уникально в сети).
+            address: Адрес филиала.
+            library_type: Тип библиотеки.
+
+        Returns:
+            Количество перенесенных книг.
+        """
+        with self._routing.exclusive():
+            if name in self._branches:
+                raise ValueError(f"Филиал '{name}' уже есть в сети.")
+            if self.processes:
+                shard = ProcessShard(name, address, library_type, self._context)
+            else:
+                shard = LocalShard(name, address, library_type)
+            ring = self.ring.copy()
+            ring.add(name)
+            try:
+                if self._readers:
+                    shard.call("add_readers", list(self._readers.values()))
+                # Существующие филиалы параллельно собирают книги, переходящие к новому филиалу
+                exported = self._scatter({other: ("export_moved", self.ring, ring, other)
+                                          for other in self._branches})
+                moved = 0
+                for transfer in exported.values():
+                    if transfer is not None:
+                        shard.call("attach", transfer)
+                        moved += len(transfer[0])
+            except BaseException:
+                shard.close()
+                raise
+            self._branches[name] = shard
+            self.ring = ring
+            # Книги уже есть в новом филиале: прежние владельцы изымают их. Если изъятие
+            # в каком-то филиале не удалось, его оставшиеся книги не получают операций
+            # по новому кольцу и изымаются при следующем добавлении филиала
+            self._scatter({other: ("drop_moved", ring, other) for other in self._branches if other != name})
+        lb._log_event(logging.INFO, "branch_added", "Филиал '%s' добавлен в сеть, перенесено книг: %d.",
+                      name, moved, branch=name, moved=moved)
+        return moved
+
+    def add_book(self, book):
+        """
+        Добавляет книгу в филиал-владелец.
+
+        Returns:
+            OpResult операции Library.try_add_book.
+        """
+        return self._call_owner(book.isbn, "add_book", book)
+
+    def remove_book(self, isbn):
+        """Удаляет книгу из филиала-владельца; возвращает OpResult."""
+        return self._call_owner(isbn, "remove_book", isbn)
+
+    def import_books(self, rows, batch_size=50_000):
+        """
+        Загружает книги, распределяя строки по филиалам; филиалы импортируют пакеты параллельно.
+        Добавление филиала ждет окончания импорта.
+
+        Args:
+            rows: Словари с полями BOOK_IMPORT_FIELDS или объекты Book.
+            batch_size: Сколько строк накапливать перед рассылкой филиалам.
+
+        Returns:
+            Количество добавленных книг.
+        """
+        added = 0
+        batches = {}
+        pending = 0
+        with self._routing.shared():
+            owner = self.ring.owner
+            for row in rows:
+                isbn = row.isbn if isinstance(row, lb.Book) else row.get("isbn")
+                if not isinstance(isbn, str):
+                    continue  # Строки без ISBN некуда направить
+                batches.setdefault(owner(isbn), []).append(row)
+                pending += 1
+                if pending >= batch_size:
+                    added += self._import_batches(batches)
+                    batches, pending = {}, 0
+            if batches:
+                added += self._import_batches(batches)
+        return added
+
+    def _import_batches(self, batches):
+        """Рассылает пакеты строк филиалам; возвращает количество добавленных книг."""
+        reports = self._scatter({name: ("import_books", rows) for name, rows in batches.items()})
+        return sum(report.added for report in reports.values())
+
+    def find_book(self, isbn):
+        """Возвращает книгу по ISBN или None."""
+        return self._call_owner(isbn, "find_book", isbn)
+
+    def find_books(self, isbns):
+        """
+        Ищет несколько книг; филиалы выполняют поиск параллельно.
+
+        Returns:
+            Список книг (None для ненайденных) в порядке isbns.
+        """
+        isbns = list(isbns)
+        groups = {}  # Филиал -> (позиции в isbns, ISBN)
+        with self._routing.shared():
+            owner = self.ring.owner
+            for position, isbn in enumerate(isbns):
+                positions, keys = groups.setdefault(owner(isbn), ([], []))
+                positions.append(position)
+                keys.append(isbn)
+            results = self._scatter({name: ("find_books", keys) for name, (_, keys) in groups.items()})
+        books = [None] * len(isbns)
+        for name, (positions, _) in groups.items():
+            for position, book in zip(positions, results[name]):
+                books[position] = book
+        return books
+
+    def add_reader(self, reader):
+        """Регистрирует читателя во всех филиалах."""
+        with self._routing.shared():
+            self._readers[reader.reader_id] = reader
+            self._scatter({name: ("add_readers", [reader]) for name in self._branches})
+
+    def remove_reader(self, reader_id):
+        """Удаляет читателя из всех филиалов."""
+        with self._routing.shared():
+            self._readers.pop(reader_id, None)
+            self._scatter({name: ("remove_reader", reader_id) for name in self._branches})
+
+    def try_lend(self, isbn, reader_id, due_date):
+        """
+        Выдает книгу в филиале-владельце.
+
+        Returns:
+            OpResult: OK (value - Loan), BOOK_NOT_FOUND, READER_NOT_FOUND или UNAVAILABLE.
+        """
+        return self._call_owner(isbn, "lend", isbn, reader_id, due_date)
+
+    def try_return(self, isbn, reader_id):
+        """
+        Принимает возврат книги в филиале-владельце.
+
+        Returns:
+            OpResult: OK (value - закрытый Loan) или NOT_LENT.
+        """
+        return self._call_owner(isbn, "return", isbn, reader_id)
+
+    def sizes(self):
+        """Возвращает словарь название филиала -> (количество книг, количество открытых выдач)."""
+        with self._routing.shared():
+            return self._scatter({name: ("sizes",) for name in self._branches})
+
+
+def _demo(branches, titles, lookups, processes):
+    """Замеры сети: импорт каталога, поиск по одному и пакетами, добавление филиала."""
+    rng_isbns = [f"isbn-{(i * 7919) % titles}" for i in range(lookups)]
+    rows = ({"title": f"Книга {i}", "author_first_name": "Имя", "author_last_name": f"Автор {i % 500}",
+             "isbn": f"isbn-{i}", "genre": "Роман", "quantity": 3} for i in range(titles))
+    with LibraryNetwork(processes=processes) as network:
+        for i in range(branches):
+            network.add_branch(f"Филиал {i}", "—")
+        network.add_reader(lb.Reader("Читатель", "0", "r0"))
+        mode = "процессы" if processes else "один процесс"
+        print(f"Сеть: {branches} филиалов ({mode}), {titles:,} книг")
+
+        start = time.perf_counter()
+        network.import_books(rows)
+        elapsed = time.perf_counter() - start
+        print(f"  импорт: {elapsed:.2f} с ({titles / elapsed:,.0f} книг/с)")
+
+        start = time.perf_counter()
+        for isbn in rng_isbns[:lookups // 10]:
+            network.find_book(isbn)
+        elapsed = time.perf_counter() - start
+        print(f"  поиск по одной книге: {lookups // 10 / elapsed:,.0f} запросов/с")
+
+        start = time.perf_counter()
+        for i in range(0, lookups, 10_000):
+            network.find_books(rng_isbns[i:i + 10_000])
+        elapsed = time.perf_counter() - start
+        print(f"  пакетный поиск (по 10 000): {lookups / elapsed:,.0f} запросов/с")
+
+        due_date = datetime.date.today() + datetime.timedelta(days=14)
+        for isbn in rng_isbns[:1000]:
+            network.try_lend(isbn, "r0", due_date)
+        start = time.perf_counter()
+        moved = network.add_branch(f"Филиал {branches}", "—")
+        elapsed = time.perf_counter() - start
+        loans = sum(count for _, count in network.sizes().values())
+        print(f"  новый филиал: перенесено {moved:,} книг ({moved / titles:.1%}, "
+              f"ожидалось ~{1 / (branches + 1):.1%}) за {elapsed:.2f} с; открытых выдач после переноса: {loans}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сеть филиалов с распределением каталога по ISBN.")
+    parser.add_argument("--branches", type=int, default=4)
+    parser.add_argument("--titles", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--processes", action="store_true", help="Запускать филиалы в отдельных процессах.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    _demo(args.branches, args.titles, args.lookups, args.processes)
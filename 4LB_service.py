@@ -0,0 +1,439 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import importlib
+import itertools
+import json
+import logging
+import random
+import time
+
+# Модуль лабораторной работы 4 (имя начинается с цифры, поэтому импорт через importlib)
+lb = importlib.import_module("4LB")
+
+
+def _percentile(sorted_values, fraction):
+    """Возвращает перцентиль уже отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LatencyStats:
+    """Задержки обработки запросов (в миллисекундах) за последние window запросов."""
+    def __init__(self, window=100_000):
+        """
+        Инициализирует объект LatencyStats.
+
+        Args:
+            window: Сколько последних значений хранить для расчета перцентилей.
+        """
+        self.window = window
+        self.count = 0
+        self._values = []
+
+    def add(self, latency_ms):
+        """Добавляет значение задержки."""
+        self.count += 1
+        if len(self._values) < self.window:
+            self._values.append(latency_ms)
+        else:
+            self._values[self.count % self.window] = latency_ms
+
+    def summary(self):
+        """Возвращает словарь с количеством запросов и перцентилями задержки."""
+        values = sorted(self._values)
+        return {
+            "count": self.count,
+            "p50_ms": round(_percentile(values, 0.50), 3),
+            "p95_ms": round(_percentile(values, 0.95), 3),
+            "p99_ms": round(_percentile(values, 0.99), 3),
+            "max_ms": round(values[-1], 3) if values else 0.0,
+        }
+
+
+class CirculationService:
+    """
+    Асинхронный сервис выдачи, возврата и поиска книг поверх Library.
+
+    Протокол - JSON-строки по TCP: каждая строка запроса - объект с полями
+    "id", "op" ("lookup", "lend", "return", "hold", "cancel_hold", "stats") и параметрами операции,
+    на каждую строку приходит строка ответа с тем же "id". Запросы всех
+    клиентов попадают в ограниченную очередь и выполняются пакетами
+    (не более max_batch за раз) в отдельном потоке; при заполненной очереди
+    сервис перестает читать из сокетов, и клиенты ждут (обратное давление).
+    """
+    def __init__(self, library, max_batch=256, queue_size=4096, max_in_flight=256):
+        """
+        Инициализирует объект CirculationService.
+
+        Args:
+            library: Объект Library.
+            max_batch: Максимальный размер пакета операций.
+            queue_size: Емкость общей очереди запросов.
+            max_in_flight: Сколько необработанных запросов может быть у одного соединения.
+        """
+        self.library = library
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight
+        self.latency = LatencyStats()
+        self.batches = 0
+        self.batched_requests = 0
+        self._queue = None
+        self._server = None
+        self._batcher = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Запускает сервер и обработчик пакетов; возвращает asyncio.Server."""
+        self._queue = asyncio.Queue(self.queue_size)
+        self._batcher = asyncio.create_task(self._run_batches())
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server
+
+    async def stop(self):
+        """Останавливает сервер и обработчик пакетов."""
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._batcher
+
+    async def _handle_client(self, reader, writer):
+        """Читает запросы одного соединения и отправляет ответы по мере готовности."""
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await in_flight.acquire()
+                received = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if not isinstance(request, dict):
+                    request = {"op": None}
+                future = asyncio.get_running_loop().create_future()
+                await self._queue.put((request, future))  # Ждет, если очередь заполнена
+                task = asyncio.create_task(self._respond(request, future, received, writer, write_lock, in_flight))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _respond(self, request, future, received, writer, write_lock, in_flight):
+        """Дожидается результата запроса и отправляет ответ клиенту."""
+        try:
+            response = await future
+            latency_ms = (time.perf_counter() - received) * 1000
+            self.latency.add(latency_ms)
+            response["id"] = request.get("id")
+            response["latency_ms"] = round(latency_ms, 3)
+            async with write_lock:
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            in_flight.release()
+
+    async def _run_batches(self):
+        """Собирает запросы из очереди в пакеты и выполняет их в отдельном потоке."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self.batches += 1
+            self.batched_requests += len(batch)
+            responses = await loop.run_in_executor(None, self._execute_batch, [request for request, _ in batch])
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    def _execute_batch(self, requests):
+        """Выполняет пакет запросов; одинаковые запросы поиска между выдачами выполняются один раз."""
+        lookups = {}
+        today = datetime.date.today()
+        responses = []
+        for request in requests:
+            op = request.get("op")
+            try:
+                if op == "lookup":
+                    isbn = request["isbn"]
+                    if isbn not in lookups:
+                        lookups[isbn] = self._lookup(isbn)
+                    responses.append(dict(lookups[isbn]))
+                elif op == "lend":
+                    lookups.pop(request.get("isbn"), None)
+                    responses.append(self._lend(request, today))
+                elif op == "return":
+                    lookups.pop(request.get("isbn"), None)
+                    responses.append(self._return(request))
+                elif op == "hold":
+                    responses.append(self._hold(request))
+                elif op == "cancel_hold":
+                    lookups.pop(request.get("isbn"), None)
+                    responses.append(self._cancel_hold(request))
+                elif op == "stats":
+                    responses.append({"ok": True, "stats": self.stats()})
+                else:
+                    responses.append({"ok": False, "error": f"Неизвестная операция: {op!r}"})
+            except (KeyError, TypeError, ValueError) as e:
+                responses.append({"ok": False, "error": f"Некорректный запрос: {e}"})
+            except Exception as e:
+                # Сбой одного запроса не должен останавливать обработку пакетов
+                lb.logger.exception("Ошибка при выполнении запроса %r: %s", op, e)
+                responses.append({"ok": False, "error": f"Внутренняя ошибка сервиса: {e}"})
+        return responses
+
+    def _lookup(self, isbn):
+        """Возвращает ответ на поиск книги по ISBN."""
+        book = self.library._catalog.get(isbn)
+        if book is None:
+            return {"ok": False, "error": f"Книга с ISBN {isbn} не найдена."}
+        return {"ok": True, "book": {"title": book.title, "author": str(book.author), "isbn": book.isbn,
+                                     "genre": book.genre, "quantity": book.quantity}}
+
+    def _find(self, request):
+        """Находит книгу и читателя запроса; возвращает (book, reader, ошибка)."""
+        book = self.library._catalog.get(request["isbn"])
+        if book is None:
+            return None, None, f"Книга с ISBN {request['isbn']} не найдена."
+        reader = self.library._reader_database.get(request["reader_id"])
+        if reader is None:
+            return None, None, f"Читатель с ID {request['reader_id']} не найден."
+        return book, reader, None
+
+    def _lend(self, request, today):
+        """Выдает книгу по запросу."""
+        book, reader, error = self._find(request)
+        if error is not None:
+            return {"ok": False, "error": error}
+        if "due_date" in request:
+            due_date = datetime.date.fromisoformat(request["due_date"])
+        else:
+            due_date = today + datetime.timedelta(days=request.get("days", 14))
+        result = self.library.try_lend(book, reader, due_date)
+        if not result:
+            if result.status is lb.OpStatus.UNAVAILABLE:
+                error = f"Книга '{book.title}' недоступна для выдачи."
+            elif result.status is lb.OpStatus.BOOK_NOT_FOUND:
+                error = f"Книга с ISBN {book.isbn} не найдена."
+            elif result.status is lb.OpStatus.LIMIT_REACHED:
+                error = f"Читатель с ID {reader.reader_id} достиг предела выдач."
+            else:
+                error = f"Читатель с ID {reader.reader_id} не найден."
+            return {"ok": False, "status": result.status.value, "error": error}
+        return {"ok": True, "due_date": result.value.due_date.isoformat()}
+
+    def _return(self, request):
+        """Принимает возврат книги по запросу."""
+        book, reader, error = self._find(request)
+        if error is not None:
+            return {"ok": False, "error": error}
+        result = self.library.try_return(book, reader)
+        if not result:
+            return {"ok": False, "status": result.status.value, "error": "Данная книга не была выдана этому читателю."}
+        return {"ok": True}
+
+    def _hold(self, request):
+        """Ставит читателя в очередь резервирования книги по запросу."""
+        book, reader, error = self._find(request)
+        if error is not None:
+            return {"ok": False, "error": error}
+        result = self.library.try_place_hold(book, reader)
+        if not result:
+            return {"ok": False, "status": result.status.value, "error": "Читатель уже ожидает эту книгу."}
+        return {"ok": True, "position": result.value}
+
+    def _cancel_hold(self, request):
+        """Снимает резервирование книги по запросу."""
+        book, reader, error = self._find(request)
+        if error is not None:
+            return {"ok": False, "error": error}
+        result = self.library.try_cancel_hold(book, reader)
+        if not result:
+            return {"ok": False, "status": result.status.value, "error": "Читатель не ожидает эту книгу."}
+        return {"ok": True}
+
+    def stats(self):
+        """Возвращает статистику сервиса: задержки и средний размер пакета."""
+        summary = self.latency.summary()
+        summary["batches"] = self.batches
+        summary["mean_batch"] = round(self.batched_requests / self.batches, 2) if self.batches else 0.0
+        return summary
+
+
+class CirculationClient:
+    """Клиент сервиса CirculationService; запросы одного клиента можно отправлять конвейером."""
+    def __init__(self):
+        """Инициализирует неподключенный клиент."""
+        self._reader = None
+        self._writer = None
+        self._ids = itertools.count(1)
+        self._waiting = {}
+        self._receiver = None
+
+    async def connect(self, host="127.0.0.1", port=8765):
+        """Подключается к сервису."""
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        self._receiver = asyncio.create_task(self._receive())
+
+    async def close(self):
+        """Закрывает соединение."""
+        self._writer.close()
+        with contextlib.suppress(ConnectionError):
+            await self._writer.wait_closed()
+        self._receiver.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._receiver
+
+    async def _receive(self):
+        """Раздает ответы ожидающим запросам по полю "id"."""
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Соединение с сервисом закрыто."))
+
+    async def request(self, op, **fields):
+        """
+        Отправляет запрос и ждет ответа.
+
+        Args:
+            op: Операция ("lookup", "lend", "return", "hold", "cancel_hold", "stats").
+            fields: Параметры операции (isbn, reader_id, due_date, days).
+
+        Returns:
+            Словарь ответа сервиса.
+        """
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self._writer.write(json.dumps({"id": request_id, "op": op, **fields}).encode("utf-8") + b"\n")
+        await self._writer.drain()
+        return await future
+
+
+def build_demo_library(titles=10_000, readers=1_000, copies=3):
+    """Создает библиотеку с синтетическим каталогом и читателями для нагрузочного теста."""
+    library = lb.Library("Сервисная библиотека", "—")
+    library.import_books({"title": f"Книга {i}", "author_first_name": "Имя", "author_last_name": f"Автор {i % 500}",
+                          "isbn": f"isbn-{i}", "genre": "Роман", "quantity": copies} for i in range(titles))
+    for i in range(readers):
+        library.add_reader(lb.Reader("Читатель", str(i), f"r{i}"))
+    return library
+
+
+async def load_test(host="127.0.0.1", port=8765, requests=20_000, connections=8, concurrency=64,
+                    titles=10_000, readers=1_000, seed=1):
+    """
+    Нагрузочный тест: connections клиентов отправляют всего requests запросов,
+    держа не более concurrency запросов в полете на соединение.
+
+    Returns:
+        Словарь с пропускной способностью и перцентилями задержки на стороне клиента.
+    """
+    rng = random.Random(seed)
+    clients = [CirculationClient() for _ in range(connections)]
+    for client in clients:
+        await client.connect(host, port)
+    latencies = LatencyStats(window=requests)
+    per_connection = requests // connections
+
+    async def run(client):
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one():
+            fields = {"isbn": f"isbn-{rng.randrange(titles)}", "reader_id": f"r{rng.randrange(readers)}"}
+            op = rng.choice(("lookup", "lookup", "lend", "return"))
+            start = time.perf_counter()
+            await client.request(op, **fields)
+            latencies.add((time.perf_counter() - start) * 1000)
+            slots.release()
+
+        tasks = []
+        for _ in range(per_connection):
+            await slots.acquire()
+            tasks.append(asyncio.create_task(one()))
+        await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(client) for client in clients))
+    elapsed = time.perf_counter() - start
+    server_stats = (await clients[0].request("stats"))["stats"]
+    for client in clients:
+        await client.close()
+    result = latencies.summary()
+    result["throughput_rps"] = round(per_connection * connections / elapsed)
+    result["server"] = server_stats
+    return result
+
+
+async def _serve(args):
+    """Запускает сервис до прерывания."""
+    service = CirculationService(build_demo_library(args.titles, args.readers), max_batch=args.max_batch)
+    server = await service.start(args.host, args.port)
+    print(f"Сервис выдачи книг слушает {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def _demo(args):
+    """Запускает сервис и нагрузочный тест в одном процессе."""
+    service = CirculationService(build_demo_library(args.titles, args.readers), max_batch=args.max_batch)
+    await service.start(args.host, args.port)
+    try:
+        result = await load_test(args.host, args.port, args.requests, args.connections, args.concurrency,
+                                 args.titles, args.readers)
+    finally:
+        await service.stop()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Асинхронный сервис выдачи книг (JSON-строки по TCP).")
+    parser.add_argument("mode", choices=("serve", "load", "demo"),
+                        help="serve - сервис, load - нагрузочный клиент, demo - сервис и клиент в одном процессе.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--titles", type=int, default=10_000)
+    parser.add_argument("--readers", type=int, default=1_000)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--log-sample", type=float, default=None,
+                        help="Включить JSON-журнал операций через очередь с заданной долей записей INFO.")
+    args = parser.parse_args()
+    # Ответы и отчеты выводятся в stdout, поэтому ошибки операций Library в консоль не дублируются
+    if args.log_sample is None:
+        lb.configure_logging("sync", echo_errors=False)
+        logging.disable(logging.CRITICAL)
+    else:
+        lb.configure_logging("queue", sample_rate=args.log_sample, echo_errors=False)
+    if args.mode == "serve":
+        asyncio.run(_serve(args))
+    elif args.mode == "load":
+        result = asyncio.run(load_test(args.host, args.port, args.requests, args.connections,
+                                       args.concurrency, args.titles, args.readers))
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        result = asyncio.run(_demo(args))
+        print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,62 @@
+"""Общие фикстуры тестов: модули лабораторной работы импортируются из корня репозитория."""
+import datetime
+import importlib
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def lb():
+    """Модуль 4LB (имя начинается с цифры, поэтому импорт через importlib)."""
+    return importlib.import_module("4LB")
+
+
+@pytest.fixture
+def due():
+    """Дата возврата для выдач в тестах."""
+    return datetime.date(2030, 1, 1)
+
+
+@pytest.fixture
+def make_book(lb):
+    """Создает книгу с корректным ISBN-13 по порядковому номеру."""
+    def make(number=0, quantity=1, title=None, genre="Fiction", author=None):
+        digits = "978%09d" % number
+        check = (10 - sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(digits)) % 10) % 10
+        author = author if author is not None else lb.Author("Лев", "Толстой")
+        return lb.Book(title or "Книга %d" % number, author, digits + str(check), genre, quantity)
+    return make
+
+
+@pytest.fixture
+def library(lb):
+    """Пустая библиотека в памяти."""
+    return lb.Library("Тестовая", "ул. Тестовая, 1")
+
+
+@pytest.fixture(scope="session")
+def service_module():
+    """Модуль 4LB_service."""
+    return importlib.import_module("4LB_service")
+
+
+@pytest.fixture(scope="session")
+def analytics_module():
+    """Модуль 4LB_analytics."""
+    return importlib.import_module("4LB_analytics")
+
+
+@pytest.fixture(scope="session")
+def network_module():
+    """Модуль 4LB_network."""
+    return importlib.import_module("4LB_network")
+
+
+@pytest.fixture(scope="session")
+def bench_module():
+    """Модуль 4LB_bench."""
+    return importlib.import_module("4LB_bench")
@@ -0,0 +1,55 @@
+"""Тесты параллельной аналитики выдач (4LB_analytics)."""
+import collections
+import datetime
+
+import pytest
+
+
+@pytest.fixture(params=["numpy", "array"])
+def analytics_backend(request, analytics_module, monkeypatch):
+    """Принудительно выбирает расчет агрегатов: NumPy или array.array."""
+    if request.param == "numpy":
+        monkeypatch.setattr(analytics_module, "np", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(analytics_module, "np", None)
+    return request.param
+
+
+def test_process_pool_matches_single_process(analytics_module, analytics_backend):
+    columns = analytics_module.synthetic_loan_columns(20_000, titles=500)
+    as_of = datetime.date.today()
+    single = analytics_module.analyze_columns([columns], as_of, workers=1)
+    pooled = analytics_module.analyze_columns([columns], as_of, workers=2, chunk_size=3_000)
+    assert single.active_loans == pooled.active_loans == 20_000
+    assert single.overdue == pooled.overdue
+    assert single.loans_by_genre == pooled.loans_by_genre
+    assert single.loans_by_isbn == pooled.loans_by_isbn
+
+
+def test_chunks_of_several_column_sets_are_summed(analytics_module, analytics_backend):
+    sets = [analytics_module.synthetic_loan_columns(5_000, titles=300, genres=7, seed=seed) for seed in (1, 2)]
+    as_of = datetime.date.today()
+    result = analytics_module.analyze_columns(sets, as_of, workers=1, chunk_size=700)
+
+    expected = collections.Counter()
+    for columns in sets:
+        expected.update(columns.isbns[code] for code in columns.isbn_codes)
+    assert result.loans_by_isbn == dict(expected)
+    assert sum(result.loans_by_genre.values()) == result.active_loans == 10_000
+    assert result.overdue == sum(1 for columns in sets for due in columns.due if due < as_of.toordinal())
+
+
+def test_analyze_libraries(lb, analytics_module, library, make_book):
+    books = [make_book(number, quantity=2, genre=genre) for number, genre in enumerate(("Роман", "Поэзия"))]
+    for book in books:
+        library.add_book(book)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+    today = datetime.date.today()
+    assert library.try_lend(books[0], reader, today - datetime.timedelta(days=1))
+    assert library.try_lend(books[1], reader, today + datetime.timedelta(days=7))
+
+    result, utilization = analytics_module.analyze_libraries([library], today, workers=1)
+    assert result.active_loans == 2 and result.overdue == 1
+    assert result.loans_by_genre == {"Роман": 1, "Поэзия": 1}
+    assert utilization == {books[0].isbn: 0.5, books[1].isbn: 0.5}
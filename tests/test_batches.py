@@ -0,0 +1,39 @@
+"""Тесты пакетных операций lend_many и return_many по принципу "все или ничего"."""
+
+
+def test_lend_many_rejects_the_whole_batch(lb, library, make_book, due):
+    reader = lb.Reader("Анна", "Иванова", 1)
+    books = [make_book(1, quantity=1), make_book(2, quantity=1)]
+    for book in books:
+        library.add_book(book)
+    library.add_reader(reader)
+
+    result = library.lend_many(reader, [books[0], books[1], books[1]], due)
+    assert result.status is lb.OpStatus.UNAVAILABLE and result.detail is books[1]
+    missing = make_book(3)
+    result = library.lend_many(reader, [books[0], missing], due)
+    assert result.status is lb.OpStatus.BOOK_NOT_FOUND and result.detail is missing
+    assert library.lend_many(lb.Reader("Нет", "Такого", 9), books, due).status is lb.OpStatus.READER_NOT_FOUND
+    assert len(library.loans) == 0 and [book.quantity for book in books] == [1, 1]
+    assert library.lend_many(reader, [], due).value == []
+
+
+def test_return_many_rejects_the_whole_batch(lb, library, make_book, due):
+    reader, other = lb.Reader("Анна", "Иванова", 1), lb.Reader("Борис", "Петров", 2)
+    books = [make_book(1, quantity=2), make_book(2, quantity=1)]
+    for book in books:
+        library.add_book(book)
+    library.add_reader(reader)
+    library.add_reader(other)
+    loans = library.lend_many(reader, [books[0], books[0], books[1]], due).value
+
+    # Третьего экземпляра первой книги у читателя нет, второй книги нет у другого читателя
+    for pairs in ([(books[0], reader)] * 3, [(books[0], reader), (books[1], other)]):
+        result = library.return_many(pairs)
+        assert result.status is lb.OpStatus.NOT_LENT and result.detail == pairs[-1]
+        assert list(library.loans) == loans and [book.quantity for book in books] == [0, 0]
+
+    result = library.return_many([(books[1], reader), (books[0], reader), (books[0], reader)])
+    assert result.value == [loans[2], loans[0], loans[1]]
+    assert len(library.loans) == 0 and [book.quantity for book in books] == [2, 1]
+    assert library.return_many([]).value == []
@@ -0,0 +1,85 @@
+"""Тесты набора замеров 4LB_bench: поиск регрессий между отчетами и формат результатов run_scale."""
+import json
+import logging
+
+import pytest
+
+OPERATIONS = ("add_book", "add_reader", "lookup", "display_books", "lend_book", "return_book")
+
+
+def _summary(ops_per_s=1000.0, p99_us=10.0):
+    return {"count": 100, "errors": 0, "ops_per_s": ops_per_s, "p50_us": 1.0, "p95_us": 5.0,
+            "p99_us": p99_us, "max_us": 20.0}
+
+
+def _report(peak=100.0, **results):
+    """Отчет benchmark_suite с одним размером: results - операция -> сводка."""
+    return {"meta": {}, "results": {"1000": {"generate_s": 0.1, **results, "peak_rss_mib": peak}}}
+
+
+def test_changes_within_tolerance_are_not_regressions(bench_module):
+    previous = _report(lookup=_summary())
+    # Ровно на границе допуска (20%) - еще не регрессия
+    current = _report(peak=120.0, lookup=_summary(ops_per_s=800.0, p99_us=12.0))
+    assert bench_module.compare_reports(previous, current, tolerance=0.2) == []
+    assert bench_module.compare_reports(previous, _report(lookup=_summary(5000.0, 1.0))) == []
+
+
+def test_throughput_latency_and_memory_regressions(bench_module):
+    previous = _report(lookup=_summary(), lend_book=_summary())
+    current = _report(peak=121.0, lookup=_summary(ops_per_s=799.0), lend_book=_summary(p99_us=12.1))
+    regressions = bench_module.compare_reports(previous, current, tolerance=0.2)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("1000 lookup: 1,000 -> 799")
+    assert regressions[1].startswith("1000 lend_book: p99 10.0 -> 12.1")
+    assert regressions[2].startswith("1000 память: 100 -> 121")
+    assert bench_module.compare_reports(previous, current, tolerance=0.5) == []
+
+
+def test_missing_scales_and_operations_are_skipped(bench_module):
+    previous = _report(lookup=_summary())
+    current = _report(lookup=_summary(ops_per_s=1.0), add_book=_summary(ops_per_s=1.0))
+    current["results"]["10000"] = current["results"].pop("1000")
+    assert bench_module.compare_reports(previous, current) == []
+    assert bench_module.compare_reports({}, current) == []
+    # Операции, которой не было в предыдущем отчете, сравнивать не с чем
+    assert bench_module.compare_reports(previous, _report(add_book=_summary(ops_per_s=1.0))) == []
+
+
+def test_unknown_peak_memory_is_not_compared(bench_module):
+    assert bench_module.compare_reports(_report(peak=None), _report(peak=500.0)) == []
+    assert bench_module.compare_reports(_report(peak=100.0), _report(peak=None)) == []
+
+
+def test_zero_throughput(bench_module):
+    # Нулевая пропускная способность в прошлом отчете не дает базы для сравнения
+    assert bench_module.compare_reports(_report(lookup=_summary(0.0, 0.0)), _report(lookup=_summary(1.0))) == []
+    regressions = bench_module.compare_reports(_report(lookup=_summary()), _report(lookup=_summary(0.0)))
+    assert regressions == ["1000 lookup: 1,000 -> 0 опер./с"]
+
+
+@pytest.fixture
+def logging_restored():
+    """run_scale отключает журналирование процесса; после теста оно включается снова."""
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def test_run_scale_result_shape(bench_module, logging_restored):
+    result = bench_module.run_scale(1000)
+    assert json.loads(json.dumps(result)) == result
+    assert set(result) == {"generate_s", "peak_rss_mib", *OPERATIONS}
+    for op in OPERATIONS:
+        summary = result[op]
+        assert set(summary) == {"count", "errors", "ops_per_s", "p50_us", "p95_us", "p99_us", "max_us"}
+        assert summary["p50_us"] <= summary["p95_us"] <= summary["p99_us"] <= summary["max_us"]
+    assert result["add_book"]["count"] == 1000 and result["add_book"]["errors"] == 0
+    assert result["lookup"]["count"] == 1000
+    assert result["display_books"]["count"] == 10  # 1000 книг по 100 на странице
+    assert result["lend_book"]["count"] == 500
+    assert result["return_book"]["count"] == 500 - result["lend_book"]["errors"]
+    assert result["peak_rss_mib"] is None or result["peak_rss_mib"] > 0
+
+    # Результат попадает в отчет, который можно сравнить с самим собой
+    report = {"meta": {}, "results": {"1000": result}}
+    assert bench_module.compare_reports(report, report) == []
@@ -0,0 +1,113 @@
+"""Тесты потокобезопасности Library: выдача, возврат, изменение читателей и поиск из нескольких потоков."""
+import sys
+import threading
+import time
+
+import pytest
+
+
+class SlowDict(dict):
+    """Словарь, проверка ключа в котором уступает процессор другим потокам (расширяет окно гонки)."""
+
+    def __contains__(self, key):
+        result = super().__contains__(key)
+        time.sleep(0.001)
+        return result
+
+
+def run_threads(target, count=8):
+    """Запускает target в count потоках одновременно и возвращает результаты вызовов."""
+    barrier = threading.Barrier(count)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(target())
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == count, "поток завершился с исключением"
+    return results
+
+
+@pytest.fixture
+def slow_library(library):
+    library._reader_database = SlowDict()
+    return library
+
+
+def test_concurrent_add_reader_registers_once(lb, slow_library):
+    reader = lb.Reader("Анна", "Иванова", 1)
+    results = run_threads(lambda: slow_library.try_add_reader(reader))
+    assert sum(1 for result in results if result) == 1
+    assert [result.status for result in results].count(lb.OpStatus.DUPLICATE) == len(results) - 1
+
+
+def test_concurrent_remove_reader_removes_once(lb, slow_library):
+    reader = lb.Reader("Анна", "Иванова", 1)
+    slow_library.add_reader(reader)
+    results = run_threads(lambda: slow_library.try_remove_reader(reader))
+    assert sum(1 for result in results if result) == 1
+    assert reader.reader_id not in slow_library._reader_database
+
+
+def test_concurrent_lending_never_oversells(lb, library, make_book, due):
+    book = make_book(1, quantity=5)
+    library.add_book(book)
+    readers = [lb.Reader("Читатель", str(number), number) for number in range(16)]
+    for reader in readers:
+        library.add_reader(reader)
+    pending = iter(readers)
+    pending_lock = threading.Lock()
+
+    def lend():
+        with pending_lock:
+            reader = next(pending)
+        return library.try_lend(book, reader, due)
+
+    results = run_threads(lend, count=len(readers))
+    assert sum(1 for result in results if result) == 5
+    assert book.quantity == 0
+    assert len(library.loans) == 5
+
+
+def test_search_while_catalog_changes(lb, library, make_book):
+    tolstoy = lb.Author("Лев", "Толстой")
+    stable = make_book(0, title="Война и мир", author=tolstoy)
+    library.add_book(stable)
+    churn = [make_book(number, title=f"Война миров {number}", author=tolstoy) for number in range(1, 40)]
+    known = {id(book) for book in (stable, *churn)}
+    stop = threading.Event()
+    errors = []
+
+    def change_catalog():
+        while not stop.is_set():
+            for book in churn:
+                library.add_book(book)
+            for book in churn:
+                library.remove_book(book)
+
+    def search():
+        try:
+            for _ in range(1000):
+                found = library.search("Война", limit=len(churn) + 1, fuzzy=True)
+                assert stable in found
+                # Книга могла быть удалена сразу после поиска, но найдены только объекты каталога
+                assert all(id(book) in known for book in found)
+        except Exception as error:  # Исключение потока передается в основной поток теста
+            errors.append(error)
+
+    writer = threading.Thread(target=change_catalog)
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    writer.start()
+    try:
+        run_threads(search, count=4)
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(previous)
+    assert errors == []
@@ -0,0 +1,123 @@
+"""Тесты учета экземпляров: Book.quantity по учету экземпляров, собственные штрихкоды, сохранение состояния."""
+import pytest
+
+
+def test_copies_are_the_source_of_quantity(lb, library, make_book, due):
+    book = make_book(1, quantity=3)
+    library.add_book(book)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+    copies = library.copies_of(book)
+    barcodes = [copies.barcode(number) for number in range(3)]
+
+    # Изменение количества в обход Library не заводит и не списывает экземпляры
+    for _ in range(50):
+        book.quantity = 0
+        library.copies_of(book)
+        book.quantity = 1
+        library.copies_of(book)
+    assert copies.total == 3 and copies.available_count() == 3
+    assert [copies.barcode(number) for number in range(3)] == barcodes
+
+    book.quantity = 0
+    assert library.try_lend(book, reader, due).value.copy == 0  # Наличие проверяется по экземплярам
+    assert book.quantity == 2
+    book.quantity = 10
+    assert library.lend_many(reader, [book, book, book], due).status == lb.OpStatus.UNAVAILABLE
+    library.set_copy_damaged(barcodes[1])
+    assert book.quantity == 1 and copies.total == 3
+
+
+def test_withdrawn_copies_are_not_lent(lb, library, make_book, due):
+    book = make_book(1, quantity=2)
+    library.add_book(book)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+    library.set_copy_withdrawn(f"{book.isbn}/0")
+    assert book.quantity == 1
+    assert library.try_lend(book, reader, due).value.copy == 1
+    assert not library.try_lend(book, reader, due)
+
+    library.set_copy_withdrawn(f"{book.isbn}/1")  # Списан на руках: после возврата в наличие не попадает
+    assert library.try_return(book, reader)
+    assert book.quantity == 0 and library.copy_info(f"{book.isbn}/1")["status"] == "withdrawn"
+    library.set_copy_withdrawn(f"{book.isbn}/0", False)
+    assert book.quantity == 1 and library.copy_info(f"{book.isbn}/0")["status"] == "available"
+    with pytest.raises(lb.BookNotFound):
+        library.set_copy_withdrawn(f"{book.isbn}/5")
+
+
+def test_custom_barcodes(lb, library, make_book, due):
+    book = make_book(1, quantity=0)
+    library.add_book(book)
+    assert library.add_copies(book, 2, shelf="A-1", barcodes=["INV-1", "INV-2"]) == ["INV-1", "INV-2"]
+    assert book.quantity == 2
+
+    library.set_copy_damaged("INV-1")
+    library.move_copy("INV-2", "B-2")
+    assert library.copy_info("INV-1")["status"] == "damaged"
+    assert library.copy_info("INV-2") == {"isbn": book.isbn, "copy": 1, "barcode": "INV-2",
+                                          "status": "available", "shelf": "B-2"}
+    assert library.copy_info(f"{book.isbn}/1")["barcode"] == "INV-2"  # Штрихкод по умолчанию тоже действует
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+    loan = library.try_lend(book, reader, due).value
+    assert library.copy_info(loan.barcode)["barcode"] == "INV-2"
+
+    with pytest.raises(lb.BookError):
+        library.add_copies(book, 1, barcodes=["INV-1"])
+    with pytest.raises(lb.BookError):
+        library.add_copies(book, 2, barcodes=["INV-3"])
+    assert book.quantity == 0 and library.copies_of(book).total == 2
+
+
+def _damage_and_lend(lb, library, make_book, due):
+    """Заводит книгу с поврежденным и списанным экземплярами, собственным штрихкодом и выдачей."""
+    book = make_book(1, quantity=2)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_book(book)
+    library.add_reader(reader)
+    library.add_copies(book, 2, shelf="A-1", barcodes=["INV-1", "INV-2"])
+    library.set_copy_damaged(f"{book.isbn}/0")
+    library.set_copy_withdrawn("INV-2")
+    loan = library.try_lend(book, reader, due).value
+    return book, reader, loan
+
+
+def _assert_restored(restored, book, reader, due):
+    """Проверяет, что после восстановления экземпляры и выдача указывают на те же номера."""
+    (loan,) = restored.loans
+    assert loan.copy == 1
+    assert restored.copy_info(f"{book.isbn}/0")["status"] == "damaged"
+    assert restored.copy_info("INV-2")["status"] == "withdrawn"
+    assert restored.copy_info("INV-1") == {"isbn": book.isbn, "copy": 2, "barcode": "INV-1",
+                                           "status": "available", "shelf": "A-1"}
+    assert restored.try_return(book, reader)
+    assert restored.copy_info(f"{book.isbn}/1")["status"] == "available"
+    assert restored._catalog[book.isbn].quantity == 2
+
+
+@pytest.mark.parametrize("checkpoint", [False, True])
+def test_copy_state_survives_journal_recovery(lb, make_book, due, tmp_path, checkpoint):
+    library = lb.Library("Тестовая", "ул. Тестовая, 1")
+    library.attach_journal(lb.CirculationJournal(str(tmp_path), group_interval=None, fsync=False))
+    book, reader, loan = _damage_and_lend(lb, library, make_book, due)
+    assert loan.copy == 1
+    if checkpoint:
+        library.checkpoint()
+    library._journal.close()
+
+    restored = lb.Library.recover("Тестовая", "ул. Тестовая, 1", str(tmp_path), group_interval=None, fsync=False)
+    _assert_restored(restored, book, reader, due)
+
+
+def test_copy_state_survives_sqlite_reopen(lb, make_book, due, tmp_path):
+    path = str(tmp_path / "library.db")
+    storage = lb.SQLiteStorage(path)
+    library = lb.Library("Тестовая", "ул. Тестовая, 1", storage=storage)
+    book, reader, loan = _damage_and_lend(lb, library, make_book, due)
+    assert loan.copy == 1
+    storage.close()
+
+    restored = lb.Library("Тестовая", "ул. Тестовая, 1", storage=lb.SQLiteStorage(path))
+    _assert_restored(restored, book, reader, due)
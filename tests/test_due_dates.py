@@ -0,0 +1,57 @@
+"""Тесты индекса сроков возврата DueDateIndex и запросов просроченных выдач Library."""
+import datetime
+
+
+def _date(day):
+    return datetime.date(2030, 1, day)
+
+
+def test_due_date_index_ranges(lb, make_book):
+    reader = lb.Reader("Анна", "Иванова", 1)
+    loans = [lb.Loan(make_book(number), reader, _date(1), _date(day)) for number, day in enumerate((5, 3, 5, 9))]
+    index = lb.DueDateIndex()
+    index.add(loans[0])
+    index.add_many(loans[1:])
+
+    assert index.due_before(_date(5)) == [loans[1]]
+    assert index.due_before(_date(6)) == [loans[1], loans[0], loans[2]]
+    assert index.due_between(_date(5), _date(9)) == [loans[0], loans[2], loans[3]]
+    index.discard(loans[0])
+    index.discard_many([loans[3]])
+    assert index.due_between(_date(1), _date(31)) == [loans[1], loans[2]] and len(index) == 2
+    assert index.due_before(_date(1)) == []
+
+
+def test_library_overdue_queries(lb, library, make_book):
+    reader, other = lb.Reader("Анна", "Иванова", 1), lb.Reader("Борис", "Петров", 2)
+    books = [make_book(number, quantity=2) for number in range(3)]
+    for book in books:
+        library.add_book(book)
+    library.add_reader(reader)
+    library.add_reader(other)
+    late = library.try_lend(books[0], reader, _date(3)).value
+    later = library.try_lend(books[1], reader, _date(2)).value
+    library.try_lend(books[2], reader, _date(20))
+    others = library.try_lend(books[0], other, _date(1)).value
+
+    assert library.overdue_loans(as_of=_date(10)) == [others, later, late]
+    assert library.reader_overdue(reader, as_of=_date(10)) == [later, late]
+    assert library.loans_due_between(_date(2), _date(3)) == [later, late]
+    library.try_return(books[1], reader)
+    assert library.reader_overdue(reader, as_of=_date(10)) == [late]
+    assert library.overdue_loans(as_of=_date(10)) == [others, late]
+
+
+def test_overdue_queries_skip_returned_loans_with_equal_due_dates(lb, library, make_book):
+    reader = lb.Reader("Анна", "Иванова", 1)
+    books = [make_book(number) for number in range(3)]
+    for book in books:
+        library.add_book(book)
+    library.add_reader(reader)
+    loans = [library.try_lend(book, reader, _date(5)).value for book in books]
+
+    assert library.overdue_loans(as_of=_date(5)) == []  # Срок в день проверки - еще не просрочка
+    assert library.overdue_loans(as_of=_date(6)) == loans
+    library.try_return(books[1], reader)
+    assert library.overdue_loans(as_of=_date(6)) == [loans[0], loans[2]]
+    assert library.loans_due_between(_date(5), _date(5)) == [loans[0], loans[2]]
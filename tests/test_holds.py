@@ -0,0 +1,124 @@
+"""Тесты очередей резервирования: передача экземпляра при возврате, снятие, удаление, сохранение."""
+import pytest
+
+
+@pytest.fixture
+def queued(lb, make_book, due):
+    """Фабрика: книга с одним экземпляром на руках у первого читателя и очередью из остальных."""
+    def make(library, readers=3):
+        book = make_book(1, quantity=1)
+        library.add_book(book)
+        people = [lb.Reader(f"Имя{number}", f"Фамилия{number}", number) for number in range(1, readers + 1)]
+        for reader in people:
+            library.add_reader(reader)
+        loan = library.try_lend(book, people[0], due).value
+        for reader in people[1:]:
+            assert library.try_place_hold(book, reader)
+        return book, people, loan
+
+    return make
+
+
+def test_return_hands_copy_to_first_in_queue(lb, library, queued, due):
+    book, (first, second, third), loan = queued(library)
+    assert library.hold_position(book, third) == 2
+
+    assert library.try_return(book, first)
+    assert book.quantity == 0
+    assert library.hold_position(book, second) == 0
+    assert library.hold_position(book, third) == 1
+    assert library.try_lend(book, third, due).status is lb.OpStatus.UNAVAILABLE
+    assert library.try_lend(book, second, due).value.copy == loan.copy
+    assert library.copies_of(book).total == 1
+
+
+def test_cancel_ready_hold_passes_copy_on_then_back_to_stock(lb, library, queued):
+    book, (first, second, third), _ = queued(library)
+    assert library.try_return(book, first)
+
+    assert library.try_cancel_hold(book, second)
+    assert library.hold_position(book, second) is None
+    assert library.hold_position(book, third) == 0
+    assert library.try_cancel_hold(book, third)
+    assert library.try_cancel_hold(book, third).status is lb.OpStatus.NO_HOLD
+    assert book.quantity == 1 and library.copies_of(book).available_count() == 1
+
+
+def test_removed_reader_releases_ready_copy(lb, library, queued, due):
+    book, (first, second, third), _ = queued(library)
+    assert library.try_return(book, first)
+
+    assert library.try_remove_reader(second)
+    assert library.hold_position(book, third) == 0
+    assert library.try_remove_reader(third)
+    assert library._ready_holds == {} and library._holds == {}
+    assert book.quantity == 1
+    assert library.try_lend(book, first, due)
+
+
+def test_removed_book_returns_ready_copies(lb, library, queued):
+    book, (first, second, third), _ = queued(library)
+    assert library.try_return(book, first)
+
+    assert library.try_remove_book(book)
+    assert library._ready_holds == {} and library._holds == {}
+    assert book.quantity == 1
+
+
+def _hand_off(library, queued):
+    """Возвращает книгу так, что экземпляр откладывается для второго читателя."""
+    book, people, loan = queued(library)
+    assert library.try_return(book, people[0])
+    return book, people, loan
+
+
+def _assert_ready_copy_restored(lb, restored, book, people, loan, due):
+    """Проверяет, что отложенный экземпляр восстановлен с номером и выдается без новых экземпляров."""
+    catalog_book = restored._catalog[book.isbn]
+    assert catalog_book.quantity == 0
+    assert restored._ready_holds == {book.isbn: {people[1].reader_id: loan.copy}}
+    assert restored.holds_for(catalog_book) == [people[2].reader_id]
+    assert restored.try_lend(catalog_book, people[1], due).value.copy == loan.copy
+    assert restored.copies_of(catalog_book).total == 1
+
+
+@pytest.mark.parametrize("checkpoint", [False, True])
+def test_ready_hold_survives_journal_recovery(lb, queued, due, tmp_path, checkpoint):
+    library = lb.Library("Тестовая", "ул. Тестовая, 1")
+    library.attach_journal(lb.CirculationJournal(str(tmp_path), group_interval=None, fsync=False))
+    book, people, loan = _hand_off(library, queued)
+    if checkpoint:
+        library.checkpoint()
+    library._journal.close()
+
+    restored = lb.Library.recover("Тестовая", "ул. Тестовая, 1", str(tmp_path), group_interval=None, fsync=False)
+    _assert_ready_copy_restored(lb, restored, book, people, loan, due)
+
+
+def test_ready_hold_survives_sqlite_reopen(lb, queued, due, tmp_path):
+    path = str(tmp_path / "library.db")
+    storage = lb.SQLiteStorage(path)
+    book, people, loan = _hand_off(lb.Library("Тестовая", "ул. Тестовая, 1", storage=storage), queued)
+    storage.close()
+
+    restored = lb.Library("Тестовая", "ул. Тестовая, 1", storage=lb.SQLiteStorage(path))
+    _assert_ready_copy_restored(lb, restored, book, people, loan, due)
+
+
+def test_removed_reader_and_book_holds_are_deleted_from_journal_and_sqlite(lb, queued, tmp_path):
+    path = str(tmp_path / "library.db")
+    storage = lb.SQLiteStorage(path)
+    library = lb.Library("Тестовая", "ул. Тестовая, 1", storage=storage)
+    library.attach_journal(lb.CirculationJournal(str(tmp_path / "journal"), group_interval=None, fsync=False))
+    book, (first, second, third), _ = _hand_off(library, queued)
+    assert library.try_remove_reader(second)
+    assert library._ready_holds == {book.isbn: {third.reader_id: 0}}
+    assert library.try_remove_book(book)
+    library._journal.close()
+    storage.close()
+
+    reopened = lb.Library("Тестовая", "ул. Тестовая, 1", storage=lb.SQLiteStorage(path))
+    assert reopened._holds == {} and reopened._ready_holds == {}
+    recovered = lb.Library.recover("Тестовая", "ул. Тестовая, 1", str(tmp_path / "journal"),
+                                   group_interval=None, fsync=False)
+    assert recovered._holds == {} and recovered._ready_holds == {}
@@ -0,0 +1,63 @@
+"""Тесты потокового импорта книг (Library.import_books и ImportReport)."""
+import csv
+import json
+
+
+def _row(make_book, number, **changes):
+    """Возвращает строку импорта для книги с порядковым номером number."""
+    book = make_book(number, quantity=number)
+    row = {"title": book.title, "author_first_name": "Лев", "author_last_name": "Толстой",
+           "isbn": book.isbn, "genre": "Роман", "quantity": book.quantity}
+    row.update(changes)
+    return row
+
+
+def test_import_csv_collects_duplicates_and_invalid_rows(lb, library, make_book, tmp_path):
+    rows = [_row(make_book, 1), _row(make_book, 2), _row(make_book, 1, title="Повтор"),
+            _row(make_book, 3, quantity="много"), _row(make_book, 4, quantity=-1), _row(make_book, 5)]
+    path = tmp_path / "books.csv"
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=lb.BOOK_IMPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    report = library.import_books(str(path), batch_size=2)
+    assert report.added == 3
+    assert report.duplicates == [(3, make_book(1).isbn)]
+    assert [row_number for row_number, _ in report.invalid] == [4, 5]
+    assert str(report) == "добавлено 3, дубликатов 1, некорректных строк 2"
+    book = library._catalog[make_book(2).isbn]
+    assert (book.title, book.quantity, book.author.last_name) == ("Книга 2", 2, "Толстой")
+    assert library._catalog[make_book(1).isbn].title == "Книга 1"
+
+
+def test_import_jsonl_reports_broken_lines_and_missing_fields(lb, library, make_book, tmp_path):
+    path = tmp_path / "books.jsonl"
+    missing = _row(make_book, 3)
+    del missing["genre"]
+    path.write_text("\n".join([json.dumps(_row(make_book, 1), ensure_ascii=False), "{не json",
+                               "", json.dumps(missing, ensure_ascii=False)]) + "\n", encoding="utf-8")
+
+    report = library.import_books(path)
+    assert report.added == 1 and report.duplicates == []
+    assert [row_number for row_number, _ in report.invalid] == [2, 3]
+    assert "genre" in report.invalid[1][1]
+
+
+def test_import_iterable_updates_indexes_and_skips_existing(lb, library, make_book):
+    library.add_book(make_book(1))
+    assert library.search_index is not None and library.genre_index is not None
+    report = library.import_books(iter([make_book(1), make_book(2, genre="Роман"), _row(make_book, 3)]))
+    assert report.added == 2 and report.duplicates == [(1, make_book(1).isbn)]
+    assert {book.isbn for book in library.books_by_genre("Роман")} == {make_book(2).isbn, make_book(3).isbn}
+    assert library.search("книга 3")[0].isbn == make_book(3).isbn
+
+
+def test_import_is_journaled(lb, make_book, tmp_path):
+    library = lb.Library("Тестовая", "ул. Тестовая, 1")
+    library.attach_journal(lb.CirculationJournal(str(tmp_path), group_interval=None, fsync=False))
+    library.import_books([_row(make_book, number) for number in range(1, 6)], batch_size=2)
+    library._journal.close()
+
+    restored = lb.Library.recover("Тестовая", "ул. Тестовая, 1", str(tmp_path), group_interval=None, fsync=False)
+    assert sorted(book.quantity for book in restored._catalog.values()) == [1, 2, 3, 4, 5]
@@ -0,0 +1,120 @@
+"""Тесты индексов каталога: InventoryColumns, AttributeIndex, выборки по автору и жанру, ленивое построение."""
+import threading
+
+import pytest
+
+
+@pytest.fixture(params=["numpy", "array"])
+def columns_backend(request, lb, monkeypatch):
+    """Принудительно выбирает хранение колонок: массивы NumPy или array.array."""
+    if request.param == "numpy":
+        monkeypatch.setattr(lb, "np", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(lb, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("capacity", [0, 1, 1024])
+def test_inventory_columns_track_quantity(lb, make_book, columns_backend, capacity):
+    columns = lb.InventoryColumns(capacity)
+    first, second = make_book(1, quantity=3, genre="Роман"), make_book(2, quantity=0, genre="Поэзия")
+    columns.add(first)
+    columns.add(second)
+    assert columns.total_copies() == 3
+    assert columns.zero_stock() == [second.isbn]
+
+    first.quantity = 1
+    columns.set_quantity(first)
+    assert columns.copies_by_genre() == {"Роман": 1, "Поэзия": 0}
+
+    columns.remove(second)
+    third = make_book(3, quantity=5, genre="Роман")
+    columns.add(third)
+    assert len(columns) == 2
+    assert columns.copies_by_genre()["Роман"] == 6
+
+
+def test_inventory_columns_grow_past_capacity(lb, make_book, columns_backend):
+    columns = lb.InventoryColumns(0)
+    books = [make_book(number, quantity=number % 3, genre="Роман" if number % 2 else "Поэзия")
+             for number in range(37)]
+    for book in books:
+        columns.add(book)
+    assert len(columns) == 37
+    assert columns.total_copies() == sum(book.quantity for book in books)
+    assert sorted(columns.zero_stock()) == sorted(book.isbn for book in books if book.quantity == 0)
+    assert columns.copies_by_author() == {books[0].author: columns.total_copies()}
+
+
+def test_lazy_indexes_match_catalog_after_concurrent_lending(lb, library, make_book, due):
+    books = [make_book(number, quantity=2) for number in range(50)]
+    for book in books:
+        library.add_book(book)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+
+    def lend_and_return():
+        for _ in range(20):
+            for book in books:
+                library.try_lend(book, reader, due)
+            for book in books:
+                library.try_return(book, reader)
+            for book in books[::2]:
+                library.try_lend(book, reader, due)
+
+    worker = threading.Thread(target=lend_and_return)
+    worker.start()
+    inventory = library.inventory
+    author_index = library.author_index
+    worker.join()
+
+    assert inventory.total_copies() == sum(book.quantity for book in books)
+    author = books[0].author
+    assert author_index.isbns(author, available=True) == [book.isbn for book in books if book.quantity > 0]
+
+
+def test_attribute_index_tracks_availability(lb, make_book):
+    index = lb.AttributeIndex("genre")
+    novel, poems, empty = (make_book(1, genre="Роман"), make_book(2, genre="Поэзия"),
+                           make_book(3, quantity=0, genre="Роман"))
+    for book in (novel, poems, empty):
+        index.add(book)
+    assert index.isbns("Роман") == [novel.isbn, empty.isbn]
+    assert index.isbns("Роман", available=True) == [novel.isbn]
+    assert index.count("Роман") == 2 and index.count("Роман", available=True) == 1
+    assert index.contains("Поэзия", poems.isbn, available=True)
+
+    novel.quantity = 0
+    index.set_quantity(novel)
+    empty.quantity = 2
+    index.set_quantity(empty)
+    assert index.isbns("Роман", available=True) == [empty.isbn]
+    index.remove(poems)
+    assert index.keys() == ["Роман"] and index.count("Поэзия") == 0
+    poems.quantity = 5
+    index.set_quantity(poems)  # Удаленная книга не возвращается в индекс при изменении количества
+    assert index.isbns("Поэзия", available=True) == []
+
+
+def test_browse_by_author_and_genre_follows_circulation(lb, library, make_book, due):
+    tolstoy, chekhov = lb.Author("Лев", "Толстой"), lb.Author("Антон", "Чехов")
+    books = [make_book(1, author=tolstoy, genre="Роман"), make_book(2, author=chekhov, genre="Рассказ"),
+             make_book(3, quantity=2, author=tolstoy, genre="Рассказ")]
+    for book in books:
+        library.add_book(book)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+
+    # Равные авторы - разные объекты Author с теми же полями
+    assert library.books_by_author(lb.Author("Лев", "Толстой")) == [books[0], books[2]]
+    assert library.books_by_genre("Рассказ", available=True) == [books[1], books[2]]
+    library.try_lend(books[1], reader, due)
+    library.try_lend(books[2], reader, due)
+    assert library.books_by_genre("Рассказ", available=True) == [books[2]]
+    library.try_lend(books[2], reader, due)
+    assert library.books_by_author(tolstoy, available=True) == [books[0]]
+    library.try_return(books[1], reader)
+    library.remove_book(books[0])
+    assert library.books_by_author(tolstoy) == [books[2]]
+    assert library.books_by_genre("Рассказ", available=True) == [books[1]]
+    assert library.books_by_genre("Поэзия") == []
@@ -0,0 +1,74 @@
+"""Тесты журнала операций CirculationJournal: снимки и восстановление."""
+import pytest
+
+
+@pytest.fixture
+def journaled(lb, tmp_path):
+    """Фабрика библиотеки с журналом в tmp_path и функция ее восстановления."""
+    def open_library():
+        library = lb.Library("Тестовая", "ул. Тестовая, 1")
+        library.attach_journal(lb.CirculationJournal(str(tmp_path), group_interval=None, fsync=False))
+        return library
+
+    def recover(library):
+        library._journal.close()
+        return lb.Library.recover("Тестовая", "ул. Тестовая, 1", str(tmp_path), group_interval=None, fsync=False)
+
+    return open_library, recover
+
+
+def test_snapshot_keeps_removed_book_and_reader_out_of_catalog(lb, journaled, make_book, due):
+    open_library, recover = journaled
+    library = open_library()
+    old_book = make_book(1, quantity=2, title="Старое издание")
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_book(old_book)
+    library.add_reader(reader)
+    assert library.try_lend(old_book, reader, due)
+    library.remove_book(old_book)
+    library.remove_reader(reader)
+    new_book = make_book(1, quantity=4, title="Новое издание")
+    library.add_book(new_book)
+    library.add_reader(lb.Reader("Борис", "Петров", 1))
+    library.checkpoint()
+
+    restored = recover(library)
+    assert restored._catalog[new_book.isbn].title == "Новое издание"
+    assert restored._catalog[new_book.isbn].quantity == 4
+    assert restored._reader_database[1].first_name == "Борис"
+    (loan,) = restored.loans
+    assert loan.book.title == "Старое издание"
+    assert loan.reader.first_name == "Анна"
+
+
+def test_journal_tail_replays_after_snapshot(lb, journaled, make_book, due):
+    open_library, recover = journaled
+    library = open_library()
+    book = make_book(1, quantity=2)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_book(book)
+    library.add_reader(reader)
+    library.checkpoint()
+    assert library.try_lend(book, reader, due)
+
+    restored = recover(library)
+    assert restored._catalog[book.isbn].quantity == 1
+    assert len(restored.loans) == 1
+
+
+def test_return_many_with_integer_reader_ids_is_journaled(lb, journaled, make_book, due):
+    open_library, recover = journaled
+    library = open_library()
+    books = [make_book(number, quantity=1) for number in range(3)]
+    readers = [lb.Reader("Читатель", str(number), number) for number in range(2)]
+    for book in books:
+        library.add_book(book)
+    for reader in readers:
+        library.add_reader(reader)
+    assert library.lend_many(readers[0], books[:2], due)
+    assert library.try_lend(books[2], readers[1], due)
+
+    assert library.return_many([(books[0], readers[0]), (books[2], readers[1])])
+    restored = recover(library)
+    assert [(loan.book.isbn, loan.reader.reader_id) for loan in restored.loans] == [(books[1].isbn, 0)]
+    assert [restored._catalog[book.isbn].quantity for book in books] == [1, 0, 1]
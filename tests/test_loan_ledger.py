@@ -0,0 +1,45 @@
+"""Тесты журнала выдач LoanLedger: поиск, подсчет и удаление выдач по паре (книга, читатель)."""
+import datetime
+
+import pytest
+
+
+def _date(day):
+    return datetime.date(2030, 1, day)
+
+
+def test_ledger_indexes_loans_by_book_and_reader(lb, make_book):
+    book, other_book = make_book(1, quantity=3), make_book(2)
+    reader, other = lb.Reader("Анна", "Иванова", 1), lb.Reader("Борис", "Петров", 2)
+    first, second = lb.Loan(book, reader, _date(1), _date(10)), lb.Loan(book, reader, _date(2), _date(11))
+    third = lb.Loan(other_book, other, _date(3), _date(12))
+    ledger = lb.LoanLedger([first])
+    ledger.extend([second, third])
+
+    assert list(ledger) == [first, second, third] and len(ledger) == 3
+    assert ledger.count(book, reader) == 2 and ledger.count(book, other) == 0
+    assert ledger.find(book, reader) is first
+    assert reader.borrowed_books == {book: _date(1)}
+
+    assert ledger.pop(book, reader) is first  # Первой возвращается самая ранняя выдача
+    assert reader.borrowed_books == {book: _date(2)}
+    ledger.remove(second)
+    assert reader.borrowed_books == {}
+    assert ledger.pop(book, reader) is None and second not in ledger
+    with pytest.raises(KeyError):
+        ledger.remove(second)
+
+
+def test_return_book_closes_earliest_loan(lb, library, make_book):
+    book = make_book(1, quantity=2)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_book(book)
+    library.add_reader(reader)
+    first = library.try_lend(book, reader, _date(10)).value
+    second = library.try_lend(book, reader, _date(11)).value
+
+    assert library.try_return(book, reader).value is first
+    assert list(library.loans) == [second] and book.quantity == 1
+    assert library.try_return(book, reader).value is second
+    assert library.try_return(book, reader).status is lb.OpStatus.NOT_LENT
+    assert len(library.loans) == 0 and book.quantity == 2
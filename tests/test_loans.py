@@ -0,0 +1,43 @@
+"""Тесты индекса выдач по читателю и пределов выдач (общий и индивидуальный) при одиночной и пакетной выдаче."""
+import datetime
+
+
+def _date(day):
+    return datetime.date(2030, 1, day)
+
+
+def test_ledger_indexes_loans_by_reader(lb, make_book):
+    book, other_book = make_book(1, quantity=3), make_book(2)
+    reader, other = lb.Reader("Анна", "Иванова", 1), lb.Reader("Борис", "Петров", 2)
+    first, second = lb.Loan(book, reader, _date(1), _date(10)), lb.Loan(book, reader, _date(2), _date(11))
+    ledger = lb.LoanLedger([first, second, lb.Loan(other_book, other, _date(3), _date(12))])
+
+    assert ledger.reader_count(1) == 2 and ledger.reader_loans(1) == [first, second]
+    assert ledger.reader_count(2) == 1 and ledger.reader_count(3) == 0 and ledger.reader_loans(3) == []
+    ledger.pop(book, reader)
+    ledger.remove(second)
+    assert ledger.reader_count(1) == 0 and ledger.reader_loans(1) == []
+
+
+def test_loan_limits_apply_to_single_and_batch_lending(lb, library, make_book, due):
+    reader = lb.Reader("Анна", "Иванова", 1)
+    books = [make_book(number, quantity=1) for number in range(4)]
+    for book in books:
+        library.add_book(book)
+    library.add_reader(reader)
+    library.loan_limit = 3
+
+    assert library.lend_many(reader, books, due).status is lb.OpStatus.LIMIT_REACHED
+    assert len(library.loans) == 0 and all(book.quantity == 1 for book in books)
+    assert library.lend_many(reader, books[:2], due)
+    assert library.can_borrow(reader) and not library.can_borrow(reader, 2)
+    assert library.lend_many(reader, books[2:], due).status is lb.OpStatus.LIMIT_REACHED
+    assert library.try_lend(books[2], reader, due)
+    assert library.try_lend(books[3], reader, due).status is lb.OpStatus.LIMIT_REACHED
+
+    library.set_loan_limit(reader, None)  # Индивидуальный предел важнее общего
+    assert library.loan_limit_for(reader) is None
+    assert library.lend_many(reader, [books[3]], due)
+    library.set_loan_limit(reader, 5)
+    assert library.reader_loans(reader) == list(library.loans) and library.loan_limit_for(reader) == 5
+    assert not library.can_borrow(reader, 2)
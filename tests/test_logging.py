@@ -0,0 +1,33 @@
+"""Тесты структурированного журнала событий Library."""
+import json
+import logging
+
+
+class ListHandler(logging.Handler):
+    """Собирает записи журнала в список."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_events_carry_name_and_fields(lb, library, make_book):
+    handler = ListHandler()
+    lb.logger.addHandler(handler)
+    level = lb.logger.level
+    lb.logger.setLevel(logging.INFO)
+    try:
+        book = make_book(1)
+        library.add_book(book)
+    finally:
+        lb.logger.removeHandler(handler)
+        lb.logger.setLevel(level)
+
+    (record,) = [record for record in handler.records if getattr(record, "event", None) == "book_added"]
+    assert record.fields == {"isbn": book.isbn}
+    assert record.getMessage() == f"Книга '{book.title}' добавлена в библиотеку."
+    entry = json.loads(lb.StructuredFormatter().format(record))
+    assert entry["event"] == "book_added" and entry["isbn"] == book.isbn
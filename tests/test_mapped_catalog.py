@@ -0,0 +1,33 @@
+"""Тесты каталога только для чтения MappedCatalog и Library.export_catalog."""
+import pickle
+
+
+def test_export_and_lookup(lb, library, make_book, tmp_path):
+    books = [make_book(number, quantity=number, genre=None if number % 2 else "Роман") for number in range(20)]
+    for book in books:
+        library.add_book(book)
+    path = str(tmp_path / "catalog.bin")
+    assert library.export_catalog(path) == 20
+
+    with lb.MappedCatalog(path) as catalog:
+        assert len(catalog) == 20
+        assert [book.isbn for book in catalog.values()] == [book.isbn for book in books]
+        found = catalog[books[7].isbn]
+        assert (found.title, found.genre, found.quantity) == (books[7].title, None, 7)
+        assert catalog[books[8].isbn].genre == "Роман"
+        assert "9780000000000" not in catalog
+        assert pickle.loads(pickle.dumps(catalog))[books[3].isbn].isbn == books[3].isbn
+
+
+def test_fields_with_sentinel_length_decode(lb, make_book, tmp_path):
+    biography = "б" * (0xFFFF // 2) + "x"  # ровно 65535 байт UTF-8
+    assert len(biography.encode("utf-8")) == 0xFFFF
+    author = lb.Author("Имя", "Фамилия", biography)
+    book = make_book(1, author=author, genre="Роман")
+    path = str(tmp_path / "catalog.bin")
+    lb.MappedCatalog.write(path, [book])
+
+    with lb.MappedCatalog(path) as catalog:
+        decoded = catalog[book.isbn]
+        assert decoded.author.biography == biography
+        assert decoded.genre == "Роман"
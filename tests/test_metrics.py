@@ -0,0 +1,51 @@
+"""Тесты метрик операций LibraryMetrics и вывода в формате Prometheus."""
+import json
+
+
+def test_wrapper_counts_calls_and_errors(lb, library, make_book, due):
+    metrics = library.enable_metrics()
+    book = make_book(1, quantity=1)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_book(book)
+    library.add_reader(reader)
+    assert library.try_lend(book, reader, due)
+    assert not library.try_lend(book, reader, due)
+    assert not library.try_return(make_book(2), reader)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["lend_book"]["count"] == 2
+    assert snapshot["lend_book"]["errors"] == {"BookUnavailable": 1}
+    assert snapshot["return_book"]["errors"] == {"not_lent": 1}
+    assert snapshot["lend_book"]["buckets"][-1] == 2
+
+    library.disable_metrics()
+    library.try_return(book, reader)
+    assert metrics.snapshot()["return_book"]["count"] == 1
+
+
+def test_slow_operation_quantile_stays_finite(lb):
+    metrics = lb.LibraryMetrics()
+    buckets = [0] * (len(lb.LibraryMetrics.BUCKETS) + 1)
+    buckets[-1] = 1  # одна операция дольше последней конечной границы
+    assert metrics._quantile(buckets, 1, 0.99) == lb.LibraryMetrics.BUCKETS[-1]
+
+    slow = metrics.wrap("slow", lambda: None)
+    metrics._operations["slow"].buckets[-1] += 1
+    metrics._operations["slow"].count += 1
+    slow()
+    json.dumps(metrics.snapshot(), allow_nan=False)
+
+
+def test_prometheus_text(lb, library, make_book):
+    library.enable_metrics()
+    book = make_book(1)
+    library.add_book(book)
+    library.add_book(book)
+
+    text = lb.prometheus_text(library)
+    assert 'library_books{library="Тестовая"} 1' in text
+    assert 'library_operations_total{library="Тестовая",operation="add_book"} 2' in text
+    assert 'library_operation_errors_total{library="Тестовая",operation="add_book",error="BookError"} 1' in text
+    assert 'library_operation_duration_seconds_bucket{library="Тестовая",operation="add_book",le="+Inf"} 2' in text
+    assert 'library_operation_duration_seconds_count{library="Тестовая",operation="add_book"} 2' in text
+    assert text.endswith("\n")
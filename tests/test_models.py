@@ -0,0 +1,31 @@
+"""Тесты классов предметной области: Author, Book и интернирование."""
+import gc
+
+
+def test_book_keeps_callers_author(lb):
+    plain = lb.Author("Лев", "Толстой")
+    detailed = lb.Author("Лев", "Толстой", "Русский писатель.")
+    first = lb.Book("Война и мир", plain, "9780000000017", "Роман", 1)
+    second = lb.Book("Анна Каренина", detailed, "9780000000024", "Роман", 1)
+
+    assert first.author is plain
+    assert second.author is detailed
+    assert second.author.biography == "Русский писатель."
+
+
+def test_intern_author_shares_equal_fields_only(lb):
+    first = lb.intern_author("Лев", "Толстой", "Русский писатель.")
+    assert lb.intern_author("Лев", "Толстой", "Русский писатель.") is first
+    assert lb.intern_author("Лев", "Толстой") is not first
+
+
+def test_intern_author_releases_unused_authors(lb):
+    lb.intern_author("Временный", "Автор")
+    gc.collect()
+    assert ("Временный", "Автор", "") not in lb._author_table
+
+
+def test_intern_genre_returns_shared_string(lb):
+    genre = "".join(["Ро", "ман"])
+    assert lb.intern_genre(genre) is lb.intern_genre("Роман")
+    assert lb.intern_genre(None) is None
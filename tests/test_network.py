@@ -0,0 +1,182 @@
+"""Тесты сети филиалов: перенос книг со всем их состоянием в другой филиал, сбои и гонки при переносе."""
+import multiprocessing
+import sys
+import threading
+
+import pytest
+
+
+def _prepare(lb, library, books, readers, due):
+    """
+    Заводит книги: первую выданную (с поврежденным экземпляром и экземпляром на полке
+    с собственным штрихкодом), вторую - с отложенным экземпляром и очередью.
+    Читатели уже зарегистрированы.
+    """
+    for book in books:
+        library.add_book(book)
+    library.add_copies(books[0], 1, shelf="A-1", barcodes=["INV-1"])
+    library.set_copy_damaged(f"{books[0].isbn}/0")
+    assert library.try_lend(books[0], readers[0], due).value.copy == 1
+    assert library.try_lend(books[1], readers[0], due)
+    assert library.try_place_hold(books[1], readers[1])
+    assert library.try_place_hold(books[1], readers[2])
+    assert library.try_return(books[1], readers[0])
+
+
+def _readers(lb):
+    return [lb.Reader(f"Имя{number}", f"Фамилия{number}", number) for number in range(1, 4)]
+
+
+def _assert_moved(target, books, readers, due):
+    """Проверяет, что в филиале target книги сохранили выдачи, экземпляры и очереди."""
+    first, second = (target._catalog[book.isbn] for book in books)
+    (loan,) = target.loans
+    assert loan.copy == 1 and loan.reader.reader_id == readers[0].reader_id
+    assert target.copy_info("INV-1") == {"isbn": first.isbn, "copy": 2, "barcode": "INV-1",
+                                         "status": "available", "shelf": "A-1"}
+    assert target.copy_info(f"{first.isbn}/0")["status"] == "damaged"
+    assert first.quantity == 1 and second.quantity == 0
+    assert target._ready_holds == {second.isbn: {readers[1].reader_id: 0}}
+    assert target.holds_for(second) == [readers[2].reader_id]
+    assert target.try_lend(second, target._reader_database[readers[1].reader_id], due).value.copy == 0
+    assert target.try_return(first, target._reader_database[readers[0].reader_id])
+    assert first.quantity == 2
+
+
+def _assert_emptied(source):
+    """Проверяет, что в филиале-источнике не осталось состояния перенесенных книг."""
+    assert len(source._catalog) == 0 and len(source.loans) == 0 and len(source._copies) == 0
+    assert source._holds == {} and source._ready_holds == {}
+
+
+def test_moved_books_keep_state_and_are_journaled(lb, make_book, due, tmp_path):
+    source = lb.Library("Источник", "ул. Первая, 1")
+    source.attach_journal(lb.CirculationJournal(str(tmp_path / "source"), group_interval=None, fsync=False))
+    target = lb.Library("Приемник", "ул. Вторая, 2")
+    target.attach_journal(lb.CirculationJournal(str(tmp_path / "target"), group_interval=None, fsync=False))
+    readers = _readers(lb)
+    for reader in readers:
+        source.add_reader(reader)
+        target.add_reader(lb.Reader(reader.first_name, reader.last_name, reader.reader_id))
+    target.add_book(make_book(9))
+    target.add_copies(make_book(9), 1, shelf="Б-2")  # Коды полок приемника не совпадают с кодами источника
+    books = [make_book(1, quantity=2), make_book(2, quantity=1)]
+    _prepare(lb, source, books, readers, due)
+
+    with source._paused():
+        transfer = source._export_books(list(source._catalog.values()))
+    target._attach_books(transfer)
+    with source._paused():
+        source._drop_books(transfer[0])
+    _assert_emptied(source)
+
+    source._journal.close()
+    target._journal.close()
+    _assert_emptied(lb.Library.recover("Источник", "ул. Первая, 1", str(tmp_path / "source"),
+                                       group_interval=None, fsync=False))
+    _assert_moved(lb.Library.recover("Приемник", "ул. Вторая, 2", str(tmp_path / "target"),
+                                     group_interval=None, fsync=False), books, readers, due)
+
+
+def test_add_branch_moves_copies_and_holds(lb, network_module, make_book, due):
+    ring = network_module.HashRing(nodes=["A", "B"])
+    # Книги, которые после добавления филиала B перейдут к нему
+    books = [book for book in map(make_book, range(1, 200)) if ring.owner(book.isbn) == "B"][:2]
+    for book in books:
+        book.quantity = 2 if book is books[0] else 1
+    readers = _readers(lb)
+    with network_module.LibraryNetwork() as network:
+        network.add_branch("A", "ул. Первая, 1")
+        for reader in readers:
+            network.add_reader(reader)
+        source = network.library("A")
+        _prepare(lb, source, books, [source._reader_database[reader.reader_id] for reader in readers], due)
+
+        assert network.add_branch("B", "ул. Вторая, 2") == 2
+        _assert_emptied(source)
+        _assert_moved(network.library("B"), books, readers, due)
+
+
+def _loaded_network(network_module, lb, processes=False, context=None):
+    """Сеть из филиала A с зарегистрированным читателем."""
+    network = network_module.LibraryNetwork(processes=processes, context=context)
+    network.add_branch("A", "ул. Первая, 1")
+    network.add_reader(lb.Reader("Анна", "Иванова", 1))
+    return network
+
+
+def _fill(network, make_book, due, count=60):
+    """Добавляет в сеть книги и выдает каждую третью."""
+    books = [make_book(number, quantity=2) for number in range(count)]
+    for book in books:
+        assert network.add_book(book)
+    for book in books[::3]:
+        assert network.try_lend(book.isbn, 1, due)
+    return books
+
+
+@pytest.mark.parametrize("failing_op", ["export_moved", "attach"])
+def test_failed_add_branch_keeps_books_in_place(lb, network_module, make_book, due, monkeypatch, failing_op):
+    with _loaded_network(network_module, lb) as network:
+        books = _fill(network, make_book, due)
+        network.add_branch("B", "ул. Вторая, 2")
+        sizes = network.sizes()
+        ring = network.ring
+
+        def broken(library, *args):
+            raise RuntimeError("сбой филиала")
+
+        monkeypatch.setitem(network_module._SHARD_OPS, failing_op, broken)
+        with pytest.raises(RuntimeError):
+            network.add_branch("C", "ул. Третья, 3")
+        assert network.branches == ["A", "B"] and network.ring is ring
+        assert network.sizes() == sizes
+        assert all(found is not None for found in network.find_books(book.isbn for book in books))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="нужен запуск процессов через fork")
+def test_failed_add_branch_stops_new_process(lb, network_module, make_book, due, monkeypatch):
+    context = multiprocessing.get_context("fork")
+    with _loaded_network(network_module, lb, processes=True, context=context) as network:
+        books = _fill(network, make_book, due)
+        sizes = network.sizes()
+
+        def broken(library, *args):
+            raise RuntimeError("сбой филиала")
+
+        # Процесс нового филиала создается через fork и получает испорченную операцию
+        monkeypatch.setitem(network_module._SHARD_OPS, "attach", broken)
+        with pytest.raises(RuntimeError):
+            network.add_branch("B", "ул. Вторая, 2")
+        assert [process.name for process in multiprocessing.active_children()] == ["shard-A"]
+        assert network.sizes() == sizes
+        assert all(found is not None for found in network.find_books(book.isbn for book in books))
+
+
+def test_operations_during_add_branch_use_the_new_ring(lb, network_module, make_book, due):
+    with _loaded_network(network_module, lb) as network:
+        _fill(network, make_book, due, count=2000)  # Перенос идет дольше, чем добавление первых книг
+        books = [make_book(number, quantity=1) for number in range(2000, 2300)]
+        added = threading.Event()
+
+        def add_books():
+            for book in books:
+                assert network.add_book(book)
+                if book is books[20]:
+                    added.set()
+
+        worker = threading.Thread(target=add_books)
+        previous = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            worker.start()
+            added.wait()
+            network.add_branch("B", "ул. Вторая, 2")
+            worker.join()
+        finally:
+            sys.setswitchinterval(previous)
+        for book in books:
+            owner = network.owner(book.isbn)
+            assert network.library(owner)._catalog.get(book.isbn) is book
+            other = "A" if owner == "B" else "B"
+            assert book.isbn not in network.library(other)._catalog
@@ -0,0 +1,104 @@
+"""Тесты запросов к каталогу CatalogQuery: выбор плана, explain и результаты."""
+import pytest
+
+
+@pytest.fixture
+def catalog(lb, library, make_book):
+    """Каталог: у Толстого 3 книги, фэнтези - 30 книг (10 не в наличии), прочее - 20 книг."""
+    tolstoy = lb.Author("Лев", "Толстой")
+    tolkien = lb.Author("Джон", "Толкин")
+    books = [make_book(number, title=f"Толстой {number:02d}", author=tolstoy, genre="Роман") for number in range(3)]
+    books += [make_book(number, title=f"Фэнтези {number:02d}", author=tolkien, genre="Фэнтези",
+                        quantity=0 if number % 3 == 0 else 1) for number in range(3, 33)]
+    books += [make_book(number, title=f"Прочее {number:02d}", author=lb.Author("Имя", f"Автор{number}"),
+                        genre="Поэзия") for number in range(33, 53)]
+    for book in books:
+        library.add_book(book)
+    return library, books, tolstoy, tolkien
+
+
+def test_unknown_field_is_rejected(library):
+    with pytest.raises(ValueError):
+        library.query().where(publisher="Наука")
+
+
+def test_isbn_lookup_plan(catalog):
+    library, books, _, _ = catalog
+    query = library.query().where(isbn=books[5].isbn, genre="Фэнтези")
+    plan = query.plan()
+    assert (plan.access, plan.estimate, plan.filters) == ("isbn", 1, ["genre"])
+    assert query.all() == [books[5]]
+    assert library.query().where(isbn=books[5].isbn, genre="Роман").all() == []
+
+
+def test_planner_picks_most_selective_index_and_intersects(catalog):
+    library, books, tolstoy, tolkien = catalog
+    query = library.query().where(genre="Роман", author=tolstoy)
+    plan = query.plan()
+    assert plan.access in ("author", "genre") and plan.estimate == 3
+    assert query.all() == books[:3]
+
+    query = library.query().where(genre="Фэнтези", author=tolkien, available=True)
+    plan = query.plan()
+    assert plan.available_index and "available" not in plan.filters
+    assert plan.estimate == 20 and len(plan.probes) == 1
+    assert query.all() == [book for book in books[3:33] if book.quantity > 0]
+
+    plan = library.query().where(title="Прочее 40").plan()
+    assert (plan.access, plan.filters) == ("full_scan", ["title"])
+    assert library.query().where(title="Прочее 40").all() == [books[40]]
+
+
+def test_order_by_title_with_small_limit_scans_title_index(catalog):
+    library, books, _, _ = catalog
+    query = library.query().where(genre="Поэзия").order_by("title").limit(2)
+    plan = query.plan()
+    assert (plan.access, plan.sort, plan.probes) == ("title_scan", "index", ["genre"])
+    assert query.all() == books[33:35]
+
+    query = library.query().where(author=books[0].author).order_by("title")
+    assert query.plan().sort == "memory"
+    assert query.all() == books[:3]
+    assert library.query().order_by("title").plan().access == "title_scan"
+
+
+def test_pages_and_counts_match_brute_force(catalog):
+    library, books, _, tolkien = catalog
+    expected = sorted((book for book in books if book.author == tolkien and book.quantity > 0),
+                      key=lambda book: book.title)
+    pages = [library.query().where(author=tolkien, available=True).order_by("title").page(number, 7).all()
+             for number in range(1, 5)]
+    assert [book for page in pages for book in page] == expected
+    assert [len(page) for page in pages] == [7, 7, 6, 0]
+    assert library.query().where(genre="Фэнтези").order_by("quantity").offset(25).all() == \
+        sorted(books[3:33], key=lambda book: (book.quantity, book.isbn))[25:]
+    assert library.query().where(genre="Фэнтези", available=False).count() == 10
+
+
+def test_title_scan_is_evaluated_lazily(catalog):
+    library, books, _, _ = catalog
+
+    class CountingCatalog(dict):
+        lookups = 0
+
+        def get(self, key, default=None):
+            CountingCatalog.lookups += 1
+            return super().get(key, default)
+
+    query = library.query().where(genre="Поэзия").order_by("title").limit(5)
+    assert query.plan().access == "title_scan"
+    library._catalog = CountingCatalog(library._catalog)
+    results = iter(query)
+    assert CountingCatalog.lookups == 0
+    assert next(results) is books[33]
+    assert CountingCatalog.lookups == 1  # Книги "Прочее" идут первыми в порядке названий
+
+
+def test_explain_describes_chosen_plan(catalog):
+    library, books, tolstoy, _ = catalog
+    query = library.query().where(author=tolstoy, genre="Роман", available=True).order_by("title").limit(2)
+    explanation = query.explain()
+    assert explanation.splitlines()[0].startswith("Доступ: ")
+    assert "только в наличии" in explanation
+    assert "Порядок: title" in explanation and "лимит: 2" in explanation
+    assert "Фильтр: available" not in explanation
@@ -0,0 +1,75 @@
+"""Тесты API без исключений: статусы OpResult методов try_* и обертки над ними."""
+import pytest
+
+
+@pytest.fixture
+def stocked(lb, library, make_book):
+    """Библиотека с книгой в одном экземпляре и читателем; возвращает (книга, читатель)."""
+    book = make_book(1, quantity=1)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_book(book)
+    library.add_reader(reader)
+    return book, reader
+
+
+def test_failed_results_are_shared_and_falsy(lb):
+    for status, result in lb._FAILED_RESULTS.items():
+        assert not result and result.status is status
+    assert lb.OpResult(lb.OpStatus.OK)
+    assert lb.OpStatus.OK not in lb._FAILED_RESULTS
+
+
+def test_book_and_reader_statuses(lb, library, make_book, stocked):
+    book, reader = stocked
+    result = library.try_add_book(make_book(2))
+    assert result.status is lb.OpStatus.OK and result.value.isbn == make_book(2).isbn
+    assert library.try_add_book(make_book(1)) is lb._FAILED_RESULTS[lb.OpStatus.DUPLICATE]
+    invalid = library.try_add_book(make_book(3, quantity=-1))
+    assert invalid.status is lb.OpStatus.INVALID_DATA and "Количество" in invalid.detail
+    assert library.try_remove_book(make_book(4)).status is lb.OpStatus.BOOK_NOT_FOUND
+    assert library.try_remove_book(make_book(2)).value.isbn == make_book(2).isbn
+
+    assert library.try_add_reader(lb.Reader("Анна", "Иванова", 1)).status is lb.OpStatus.DUPLICATE
+    assert library.try_remove_reader(lb.Reader("Нет", "Такого", 99)).status is lb.OpStatus.READER_NOT_FOUND
+    assert library.try_remove_reader(reader).value is reader
+
+
+def test_circulation_statuses(lb, library, make_book, stocked, due):
+    book, reader = stocked
+    other = lb.Reader("Борис", "Петров", 2)
+    library.add_reader(other)
+    missing_reader = lb.Reader("Нет", "Такого", 99)
+
+    assert library.try_lend(make_book(9), reader, due).status is lb.OpStatus.BOOK_NOT_FOUND
+    assert library.try_lend(book, missing_reader, due).status is lb.OpStatus.READER_NOT_FOUND
+    loan = library.try_lend(book, reader, due).value
+    assert loan.book is book and loan.reader is reader and loan.due_date == due
+    assert library.try_lend(book, other, due).status is lb.OpStatus.UNAVAILABLE
+    library.set_loan_limit(other, 0)
+    library.add_copies(book, 1)
+    assert library.try_lend(book, other, due).status is lb.OpStatus.LIMIT_REACHED
+
+    assert library.try_return(book, other).status is lb.OpStatus.NOT_LENT
+    assert library.try_return(book, reader).value is loan
+    assert library.try_return(book, reader).status is lb.OpStatus.NOT_LENT
+
+    assert library.try_place_hold(make_book(9), reader).status is lb.OpStatus.BOOK_NOT_FOUND
+    assert library.try_place_hold(book, missing_reader).status is lb.OpStatus.READER_NOT_FOUND
+    assert library.try_place_hold(book, reader).value == 1
+    assert library.try_place_hold(book, reader).status is lb.OpStatus.DUPLICATE
+    assert library.try_cancel_hold(book, reader)
+    assert library.try_cancel_hold(book, reader).status is lb.OpStatus.NO_HOLD
+
+
+def test_wrappers_report_failures_without_raising(lb, library, make_book, stocked, due, capsys):
+    book, reader = stocked
+    missing_reader = lb.Reader("Нет", "Такого", 99)
+    assert library.lend_book(book, missing_reader, due) is None
+    assert library.lend_book(book, reader, due) is not None
+    assert library.lend_book(book, reader, due) is None
+    assert library.return_book(make_book(9), reader) is None
+    library.add_book(make_book(1))
+    library.remove_reader(missing_reader)
+    assert library.place_hold(make_book(9), reader) is None
+    output = capsys.readouterr().out
+    assert "не найден" in output and "недоступна" in output
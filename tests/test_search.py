@@ -0,0 +1,68 @@
+"""Тесты полнотекстового индекса TitleSearchIndex и Library.search."""
+
+
+def _books(lb, make_book):
+    """Книги с кириллическими названиями и авторами."""
+    tolstoy = lb.Author("Лев", "Толстой")
+    return [make_book(1, title="Война и мир", author=tolstoy),
+            make_book(2, title="Анна Каренина", author=tolstoy),
+            make_book(3, title="Ёлка и свадьба", author=lb.Author("Фёдор", "Достоевский")),
+            make_book(4, title="Мир глазами Толстого", author=lb.Author("Иван", "Бунин"))]
+
+
+def _isbns(results):
+    return [isbn for isbn, _ in results]
+
+
+def test_tokenize_folds_case_and_yo(lb):
+    assert lb.TitleSearchIndex.tokenize("ЁЛКА, Фёдор и War-2") == ["елка", "федор", "и", "war", "2"]
+
+
+def test_title_words_rank_above_author_words(lb, make_book):
+    index = lb.TitleSearchIndex()
+    books = _books(lb, make_book)
+    for book in books:
+        index.add(book)
+    results = _isbns(index.search("толстой"))
+    assert set(results) == {books[0].isbn, books[1].isbn}
+    assert _isbns(index.search("мир", prefix=False))[0] == books[0].isbn
+    assert _isbns(index.search("мир толстой", prefix=False))[0] == books[0].isbn
+    assert len(index.search("мир", limit=1)) == 1
+
+
+def test_prefix_and_fuzzy_matching(lb, make_book):
+    index = lb.TitleSearchIndex()
+    books = _books(lb, make_book)
+    for book in books:
+        index.add(book)
+    assert _isbns(index.search("каре")) == [books[1].isbn]
+    assert index.search("каре", prefix=False) == []
+    assert _isbns(index.search("елк")) == [books[2].isbn]  # "ё" в названии совпадает с "е" в запросе
+    assert index.search("достаевский", prefix=False) == []
+    assert _isbns(index.search("достаевский", prefix=False, fuzzy=True)) == [books[2].isbn]
+
+
+def test_add_and_remove_keep_vocabulary_consistent(lb, make_book):
+    index = lb.TitleSearchIndex()
+    books = _books(lb, make_book)
+    for book in books:
+        index.add(book)
+    index.remove(books[1])
+    assert index.search("каренина") == [] and len(index) == 3
+    assert "каренина" not in index._vocabulary and "анна" not in index._postings
+    assert all("каренина" not in words for words in index._trigrams.values())
+    renamed = make_book(1, title="Воскресение", author=books[0].author)
+    index.add(renamed)  # Повторное добавление заменяет старую запись
+    assert index.search("война") == [] and _isbns(index.search("воскрес")) == [renamed.isbn]
+    assert len(index) == 3
+
+
+def test_library_search_follows_catalog_changes(lb, library, make_book):
+    books = _books(lb, make_book)
+    for book in books[:2]:
+        library.add_book(book)
+    assert [book.isbn for book in library.search("анна")] == [books[1].isbn]
+    library.add_book(books[2])
+    library.remove_book(books[1])
+    assert library.search("анна") == []
+    assert [book.isbn for book in library.search("достаевский", fuzzy=True)] == [books[2].isbn]
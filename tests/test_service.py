@@ -0,0 +1,31 @@
+"""Тесты пакетной обработки запросов CirculationService."""
+import pytest
+
+
+@pytest.fixture
+def service(service_module):
+    return service_module.CirculationService(service_module.build_demo_library(titles=4, readers=2))
+
+
+def test_batch_answers_every_request(service):
+    responses = service._execute_batch([
+        {"op": "lookup", "isbn": "isbn-1"},
+        {"op": "lend", "isbn": "isbn-1", "reader_id": "r0"},
+        {"op": "lend"},
+        {"op": "unknown"},
+    ])
+    assert [response["ok"] for response in responses] == [True, True, False, False]
+    assert "Некорректный запрос" in responses[2]["error"]
+
+
+def test_unexpected_error_fails_only_its_request(service, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("сбой хранилища")
+
+    monkeypatch.setattr(service.library, "try_return", broken)
+    responses = service._execute_batch([
+        {"op": "return", "isbn": "isbn-1", "reader_id": "r0"},
+        {"op": "lookup", "isbn": "isbn-2"},
+    ])
+    assert responses[0] == {"ok": False, "error": "Внутренняя ошибка сервиса: сбой хранилища"}
+    assert responses[1]["ok"]
@@ -0,0 +1,62 @@
+"""Тесты колоночного снимка библиотеки (save_snapshot/load_snapshot)."""
+import threading
+
+
+def test_snapshot_round_trip(lb, library, make_book, due, tmp_path):
+    books = [make_book(number, quantity=2, genre=None if number == 3 else "Роман") for number in range(5)]
+    for book in books:
+        library.add_book(book)
+    readers = [lb.Reader("Анна", "Иванова", 1), lb.Reader("Борис", "Петров", "r-2")]
+    for reader in readers:
+        library.add_reader(reader)
+    library.set_loan_limit(readers[0], 3)
+    assert library.try_lend(books[0], readers[0], due)
+    assert library.lend_many(readers[1], [books[1], books[1]], due)
+    assert library.try_place_hold(books[1], readers[0])
+    barcode = library.add_copies(books[2], 1, shelf="A-1")[0]
+    library.set_copy_damaged(barcode)
+    assert library.try_lend(books[4], readers[1], due)
+    library.remove_book(books[4])
+
+    path = str(tmp_path / "library.snap")
+    library.save_snapshot(path)
+    restored = lb.Library.load_snapshot(path)
+
+    assert [(book.isbn, book.title, book.genre, book.quantity) for book in restored._catalog.values()] == \
+           [(book.isbn, book.title, book.genre, book.quantity) for book in library._catalog.values()]
+    assert {reader_id: reader.last_name for reader_id, reader in restored._reader_database.items()} == \
+           {1: "Иванова", "r-2": "Петров"}
+    assert [(loan.book.isbn, loan.reader.reader_id, loan.due_date, loan.copy) for loan in restored.loans] == \
+           [(loan.book.isbn, loan.reader.reader_id, loan.due_date, loan.copy) for loan in library.loans]
+    assert restored.loan_limit_for(readers[0]) == 3
+    assert restored.holds_for(books[1]) == [1]
+    assert restored.copy_info(barcode) == {"isbn": books[2].isbn, "copy": 2, "barcode": barcode,
+                                          "status": "damaged", "shelf": "A-1"}
+    removed_loan = restored.loans.find(books[4], readers[1])
+    assert removed_loan is not None and books[4].isbn not in restored._catalog
+
+
+def test_snapshot_of_empty_library(lb, library, tmp_path):
+    path = str(tmp_path / "empty.snap")
+    library.save_snapshot(path)
+    restored = lb.Library.load_snapshot(path)
+    assert len(restored.books) == 0 and len(restored.loans) == 0
+
+
+def test_snapshot_is_written_after_changes_resume(lb, library, make_book, tmp_path, monkeypatch):
+    library.add_book(make_book(1))
+    write = lb.ColumnarSnapshot.write
+    added = []
+
+    def write_while_adding(state, path):
+        # Во время кодирования и записи библиотека уже принимает изменения
+        worker = threading.Thread(target=lambda: added.append(library.try_add_book(make_book(2))))
+        worker.start()
+        worker.join(timeout=5)
+        write(state, path)
+
+    monkeypatch.setattr(lb.ColumnarSnapshot, "write", write_while_adding)
+    path = str(tmp_path / "library.snap")
+    library.save_snapshot(path)
+    assert added and added[0]
+    assert len(lb.Library.load_snapshot(path).books) == 1
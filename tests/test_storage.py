@@ -0,0 +1,44 @@
+"""Тесты SQLiteStorage и отображений каталога и читателей."""
+import pytest
+
+
+def test_mapping_requires_load_row_and_key(lb):
+    class Incomplete(lb._SQLiteMapping):
+        def _load(self, row):
+            return row
+
+    with pytest.raises(TypeError):
+        Incomplete(None)
+
+
+def test_lend_with_foreign_book_instance_changes_catalog_copy(lb, make_book, due, tmp_path):
+    storage = lb.SQLiteStorage(str(tmp_path / "library.db"))
+    library = lb.Library("Тестовая", "ул. Тестовая, 1", storage=storage)
+    library.add_book(make_book(1, quantity=2))
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+    outsider = make_book(1, quantity=2)
+
+    assert library.try_lend(outsider, reader, due)
+    assert outsider.quantity == 2
+    assert storage.catalog[outsider.isbn].quantity == 1
+    assert library.try_return(outsider, reader)
+    assert storage.catalog[outsider.isbn].quantity == 2
+
+
+def test_batch_records_are_not_split_between_transactions(lb, make_book, due, tmp_path, monkeypatch):
+    storage = lb.SQLiteStorage(str(tmp_path / "library.db"), batch_size=1)
+    library = lb.Library("Тестовая", "ул. Тестовая, 1", storage=storage)
+    books = [make_book(number, quantity=1) for number in range(3)]
+    for book in books:
+        library.add_book(book)
+    reader = lb.Reader("Анна", "Иванова", 1)
+    library.add_reader(reader)
+    commits = []
+    commit = storage.commit
+    monkeypatch.setattr(storage, "commit", lambda: (commits.append(1), commit()))
+
+    loans = library.lend_many(reader, books, due).value
+    assert len(commits) == 1
+    storage.record_returns(loans)
+    assert len(commits) == 2
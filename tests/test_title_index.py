@@ -0,0 +1,107 @@
+"""Тесты упорядоченного индекса названий TitleIndex и постраничного вывода книг."""
+import random
+import sys
+
+
+def _tied_books(make_book, count=23):
+    """Книги с повторяющимися названиями (порядок внутри названия задает ISBN), в случайном порядке."""
+    books = [make_book(number, title="Книга %d" % (number % 5)) for number in range(count)]
+    random.Random(7).shuffle(books)
+    return books
+
+
+def _pages(iterate, page_size):
+    """Собирает страницы, передавая последний элемент страницы курсором следующей."""
+    pages, cursor = [], None
+    while True:
+        page = list(iterate(cursor, page_size))
+        if not page:
+            return pages
+        pages.append(page)
+        cursor = page[-1]
+
+
+def test_blocks_split_and_keep_keys_sorted(lb, make_book):
+    index = lb.TitleIndex(load=2)
+    books = _tied_books(make_book)
+    for book in books:
+        index.add(book)
+    keys = sorted(index.key(book) for book in books)
+    assert len(index) == len(books)
+    assert len(index._blocks) > 1 and all(0 < len(block) < 4 for block in index._blocks)
+    assert index._maxes == [block[-1] for block in index._blocks]
+    assert list(index.iter_keys()) == keys
+
+
+def test_cursor_crosses_block_boundaries(lb, make_book):
+    books = _tied_books(make_book)
+    index = lb.TitleIndex(books, load=2)
+    keys = sorted(index.key(book) for book in books)
+    for position, key in enumerate(keys):
+        assert list(index.iter_keys(key)) == keys[position + 1:]
+    # Курсор между ключами и за пределами индекса
+    assert list(index.iter_keys(("Книга 0", ""))) == keys
+    assert list(index.iter_keys(("Книга 2", "999"))) == [key for key in keys if key[0] > "Книга 2"]
+    assert list(index.iter_keys(("Я", ""))) == []
+
+
+def test_remove_ignores_missing_keys(lb, make_book):
+    books = _tied_books(make_book, count=10)
+    index = lb.TitleIndex(books, load=2)
+    for missing in (make_book(100, title="А"), make_book(101, title="Книга 3"), make_book(102, title="Я")):
+        index.remove(missing)
+    assert len(index) == 10
+
+    for book in books[:7]:
+        index.remove(book)
+        index.remove(book)
+    assert len(index) == 3
+    assert list(index.iter_keys()) == sorted(index.key(book) for book in books[7:])
+    for book in books[7:]:
+        index.remove(book)
+    assert len(index) == 0 and index._blocks == [] and index._maxes == []
+    index.add(books[0])
+    assert list(index.iter_keys()) == [index.key(books[0])]
+
+
+def test_iter_books_pages_follow_catalog_changes(lb, library, make_book):
+    library._title_index = lb.TitleIndex(load=2)  # Маленькие блоки: страницы пересекают границы блоков
+    books = _tied_books(make_book)
+    for book in books:
+        library.add_book(book)
+    ordered = sorted(books, key=lb.TitleIndex.key)
+
+    pages = _pages(library.iter_books, 4)
+    assert [len(page) for page in pages] == [4, 4, 4, 4, 4, 3]
+    assert [book for page in pages for book in page] == ordered
+
+    # Курсором может быть книга, удаленная после вывода предыдущей страницы
+    cursor = ordered[9]
+    library.remove_book(cursor)
+    assert list(library.iter_books(cursor, 3)) == ordered[10:13]
+    assert list(library.iter_books(ordered[-1])) == []
+
+
+def test_display_books_pages_and_flushes_in_batches(lb, library, make_book, monkeypatch):
+    books = [make_book(number, title="Книга %04d" % number) for number in range(2500)]
+    for book in books:
+        library.add_book(book)
+    writes = []
+
+    class Recorder:
+        def write(self, text):
+            writes.append(text)
+
+        def flush(self):
+            pass
+
+    monkeypatch.setattr(sys, "stdout", Recorder())
+    library.display_books()
+    chunks = [text for text in writes if text.count("\n") > 1]
+    assert [chunk.count("\n") for chunk in chunks] == [1000, 1000, 500]
+    assert "".join(chunks) == "".join(f"{book}\n" for book in books)
+
+    writes.clear()
+    library.display_books(start_after=books[1499], limit=2)
+    assert writes[0] == "Книги в библиотеке:"
+    assert writes[-1] == f"{books[1500]}\n{books[1501]}\n"